@@ -1,35 +1,88 @@
-from django.contrib import admin
-from .models import UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment
+from django.contrib import admin, messages
+
+from core.models import UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment
+from core.paginator import EstimatedCountPaginator
+from core.services import approve_case_requests, reject_case_requests
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for tables with millions of rows
+    - Estimated counts instead of COUNT(*) on large tables
+    - No second unfiltered COUNT(*) for the "N total" link
+    - Searches use index-friendly prefix/exact lookups only
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'role', 'phone', 'city')
-    search_fields = ('user__username', 'user__email', 'phone')
-    list_filter = ('role',)
+class UserProfileAdmin(ScalableModelAdmin):
+    list_display = ['user', 'role', 'specialization', 'open_case_load', 'city', 'created_at']
+    list_filter = ['role', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['user__username__startswith']
+    autocomplete_fields = ['user']
+
 
 @admin.register(CaseRequest)
-class CaseRequestAdmin(admin.ModelAdmin):
-    list_display = ('title', 'client', 'case_type', 'status', 'amount_involved', 'created_at')
-    list_filter = ('status', 'case_type')
-    search_fields = ('title', 'description', 'client__username')
+class CaseRequestAdmin(ScalableModelAdmin):
+    list_display = ['id', 'client', 'title', 'case_type', 'status', 'assigned_lawyer', 'amount_involved', 'created_at']
+    list_filter = ['status', 'case_type', 'created_at']
+    list_select_related = ['client', 'assigned_lawyer']
+    search_fields = ['title__startswith', 'client__username__startswith']
+    autocomplete_fields = ['client', 'assigned_lawyer']
+    readonly_fields = ['created_at', 'updated_at']
+    actions = ['approve_selected', 'reject_selected']
+
+    @admin.action(description='Approve selected pending case requests')
+    def approve_selected(self, request, queryset):
+        cases = approve_case_requests(queryset, request.user)
+        self.message_user(request, f"Approved {len(cases)} case requests.", messages.SUCCESS)
+
+    @admin.action(description='Reject selected pending case requests')
+    def reject_selected(self, request, queryset):
+        rejected_cases = reject_case_requests(queryset, request.user)
+        self.message_user(request, f"Rejected {len(rejected_cases)} case requests.", messages.SUCCESS)
+
 
 @admin.register(Case)
-class CaseAdmin(admin.ModelAdmin):
-    list_display = ('case_number', 'title', 'client', 'lawyer', 'status', 'registration_fee_paid')
-    list_filter = ('status', 'registration_fee_paid')
-    search_fields = ('case_number', 'title', 'client__username', 'lawyer__username')
+class CaseAdmin(ScalableModelAdmin):
+    list_display = ['case_number', 'client', 'lawyer', 'title', 'case_type', 'status', 'registration_fee_paid', 'created_at']
+    list_filter = ['status', 'case_type', 'registration_fee_paid', 'created_at']
+    list_select_related = ['client', 'lawyer']
+    search_fields = ['case_number__startswith', 'title__startswith', 'client__username__startswith', 'lawyer__username__startswith']
+    autocomplete_fields = ['client', 'lawyer', 'assigned_lawyer']
+    readonly_fields = ['case_number', 'created_at', 'updated_at']
+
 
 @admin.register(RejectedCase)
-class RejectedCaseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'client', 'case_type', 'rejected_by', 'rejected_at')
-    search_fields = ('title', 'client__username')
+class RejectedCaseAdmin(ScalableModelAdmin):
+    list_display = ['id', 'client', 'title', 'rejected_by', 'rejected_at']
+    list_filter = ['rejected_at']
+    list_select_related = ['client', 'rejected_by']
+    search_fields = ['title__startswith', 'client__username__startswith']
+    autocomplete_fields = ['client', 'rejected_by', 'assigned_lawyer']
+    readonly_fields = ['rejected_at']
+
 
 @admin.register(CaseNote)
-class CaseNoteAdmin(admin.ModelAdmin):
-    list_display = ('case', 'author', 'created_at')
-    list_filter = ('created_at',)
+class CaseNoteAdmin(ScalableModelAdmin):
+    list_display = ['id', 'case', 'author', 'created_at']
+    list_filter = ['created_at']
+    list_select_related = ['case__client', 'author']
+    search_fields = ['case__case_number__startswith', 'author__username__startswith']
+    autocomplete_fields = ['author']
+    raw_id_fields = ['case']
+    readonly_fields = ['created_at', 'updated_at']
+
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('case', 'amount', 'status', 'created_at')
-    list_filter = ('status',)
+class PaymentAdmin(ScalableModelAdmin):
+    list_display = ['id', 'case', 'amount', 'status', 'paid_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['case__client']
+    search_fields = ['case__case_number__startswith', 'stripe_payment_intent_id__exact']
+    raw_id_fields = ['case']
+    readonly_fields = ['created_at', 'paid_at']
@@ -0,0 +1,345 @@
+"""
+Columnar analytics snapshots and the finance report computed over them.
+
+``snapshot_dataset`` streams a table into one ``.npy`` file per column
+under ``ANALYTICS_ROOT/<dataset>/<generation>/``, then points
+``meta.json`` at the new generation, so readers memory-map a consistent
+set of columns while the next one is written. Readers map every column
+when they load a snapshot, and a refresh deletes only the generations
+before the one it replaced, so a reader that has just read ``meta.json``
+still finds its generation. Refreshes of a dataset are serialized by a
+lock file, across processes. Runs after the first are
+incremental: only rows with ``updated_at`` at or after the previous
+watermark (less ``ANALYTICS_WATERMARK_OVERLAP`` seconds, to cover
+transactions that committed late) are read and merged in by id.
+
+Case requests, cases and rejected cases share one table and so one
+dataset. Rows deleted from the database, including rejected cases moved to
+the archive, stay in the snapshot until a ``full`` rebuild.
+
+Money is stored in integer cents, times as ``datetime64[us]`` UTC (NaT for
+NULL) and strings as integer codes into the dataset's ``categories``.
+"""
+import fcntl
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.lazy import lazy_import
+from core.models import CaseRequest, Payment
+
+np = lazy_import('numpy')
+
+PERCENTILES = [10, 25, 50, 75, 90, 99]
+
+
+@dataclass(frozen=True)
+class SnapshotSpec:
+    model: type
+    # (column, kind) with kind one of int, money, bool, time, category
+    columns: tuple
+
+
+DATASETS = {
+    'case-requests': SnapshotSpec(CaseRequest, (
+        ('id', 'int'),
+        ('status', 'category'),
+        ('case_type', 'category'),
+        ('amount_involved', 'money'),
+        ('registration_fee', 'money'),
+        ('registration_fee_paid', 'bool'),
+        ('created_at', 'time'),
+        ('updated_at', 'time'),
+        ('approved_at', 'time'),
+        ('rejected_at', 'time'),
+    )),
+    'payments': SnapshotSpec(Payment, (
+        ('id', 'int'),
+        ('case_id', 'int'),
+        ('status', 'category'),
+        ('amount', 'money'),
+        ('created_at', 'time'),
+        ('updated_at', 'time'),
+        ('paid_at', 'time'),
+    )),
+}
+
+
+def _naive_utc(value):
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None) if value is not None else None
+
+
+def _column_array(kind, values, categories):
+    if kind == 'int':
+        return np.array(values, dtype=np.int64)
+    if kind == 'money':
+        return np.array([int(value * 100) if value is not None else 0 for value in values], dtype=np.int64)
+    if kind == 'bool':
+        return np.array(values, dtype=np.bool_)
+    if kind == 'time':
+        return np.array([_naive_utc(value) for value in values], dtype='datetime64[us]')
+    # category: codes index the growing categories list, so earlier codes stay valid
+    codes = {value: code for code, value in enumerate(categories)}
+    for value in values:
+        if value not in codes:
+            codes[value] = len(categories)
+            categories.append(value)
+    return np.array([codes[value] for value in values], dtype=np.int32)
+
+
+class Snapshot:
+    """The current generation of a dataset, columns memory-mapped read-only"""
+
+    def __init__(self, path, meta, columns):
+        self.path = path
+        self.meta = meta
+        self.rows = meta['rows']
+        self.watermark = parse_datetime(meta['watermark']) if meta['watermark'] else None
+        self.categories = meta['categories']
+        # Mapped up front: an open map stays readable once a later refresh deletes the files
+        self._columns = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r') for column in columns}
+
+    def __getitem__(self, column):
+        return self._columns[column]
+
+    def code(self, column, value):
+        """The code ``value`` is stored as in a category column, or -1 if it never occurs"""
+        categories = self.categories[column]
+        return categories.index(value) if value in categories else -1
+
+
+def _dataset_root(dataset):
+    return os.path.join(settings.ANALYTICS_ROOT, dataset)
+
+
+def _read_meta(root):
+    try:
+        with open(os.path.join(root, 'meta.json')) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(dataset):
+    """The dataset's current snapshot, or None if none has been taken"""
+    root = _dataset_root(dataset)
+    meta = _read_meta(root)
+    if meta is None:
+        return None
+    return Snapshot(os.path.join(root, meta['generation']), meta, [column for column, _ in DATASETS[dataset].columns])
+
+
+@contextmanager
+def _refresh_lock(root):
+    """Held while refreshing the dataset under ``root``, by one process at a time"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_changes(spec, since, categories, chunk_size):
+    queryset = spec.model._base_manager.order_by()
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    names = [column for column, _ in spec.columns]
+    chunks = {column: [] for column in names}
+    rows = []
+
+    def flush():
+        for index, (column, kind) in enumerate(spec.columns):
+            column_categories = categories.setdefault(column, []) if kind == 'category' else None
+            chunks[column].append(_column_array(kind, [row[index] for row in rows], column_categories))
+        rows.clear()
+
+    for row in queryset.values_list(*names).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            flush()
+    if rows or not chunks['id']:
+        flush()
+    return {column: np.concatenate(parts) for column, parts in chunks.items()}
+
+
+def _merge(current, fresh, columns):
+    """Rows of ``current`` not in ``fresh``, plus ``fresh``, sorted by id"""
+    keep = ~np.isin(current['id'], fresh['id'])
+    merged = {column: np.concatenate([current[column][keep], fresh[column]]) for column in columns}
+    order = np.argsort(merged['id'], kind='stable')
+    return {column: values[order] for column, values in merged.items()}
+
+
+def snapshot_dataset(dataset, full=False, chunk_size=None):
+    """Refresh a dataset's snapshot, returning (rows read, rows in the snapshot)"""
+    with _refresh_lock(_dataset_root(dataset)):
+        return _snapshot_dataset(dataset, full, chunk_size)
+
+
+def _snapshot_dataset(dataset, full, chunk_size):
+    spec = DATASETS[dataset]
+    chunk_size = chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    columns = [column for column, _ in spec.columns]
+    current = None if full else load_snapshot(dataset)
+
+    since = None
+    categories = {}
+    if current is not None:
+        categories = {column: list(values) for column, values in current.categories.items()}
+        if current.watermark is not None:
+            since = current.watermark - timedelta(seconds=settings.ANALYTICS_WATERMARK_OVERLAP)
+
+    fresh = _read_changes(spec, since, categories, chunk_size)
+    if current is not None:
+        arrays = _merge(current, fresh, columns)
+    else:
+        order = np.argsort(fresh['id'], kind='stable')
+        arrays = {column: values[order] for column, values in fresh.items()}
+
+    # The newest updated_at read, not the clock, so app/database clock skew cannot skip rows
+    watermark = current.watermark if current is not None else None
+    if len(fresh['updated_at']):
+        newest = fresh['updated_at'].max().astype('datetime64[us]').item().replace(tzinfo=dt_timezone.utc)
+        watermark = max(watermark, newest) if watermark else newest
+
+    root = _dataset_root(dataset)
+    generation = f"{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(root, generation)
+    os.makedirs(path)
+    for column, values in arrays.items():
+        np.save(os.path.join(path, f"{column}.npy"), values)
+    meta = {
+        'generation': generation,
+        'rows': len(arrays['id']),
+        'watermark': watermark.isoformat() if watermark else None,
+        'categories': categories,
+        'created_at': timezone.now().isoformat(),
+    }
+    replaced = _read_meta(root)
+    with open(os.path.join(root, 'meta.json.tmp'), 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(os.path.join(root, 'meta.json.tmp'), os.path.join(root, 'meta.json'))
+
+    # The replaced generation stays for readers that read meta.json just before the swap
+    keep = {generation, replaced['generation'] if replaced else None}
+    for entry in os.listdir(root):
+        if entry not in keep and os.path.isdir(os.path.join(root, entry)):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return len(fresh['id']), meta['rows']
+
+
+def _percentiles(values):
+    if not len(values):
+        return None
+    return {f"p{pct}": round(float(value), 2) for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def _hours(durations):
+    return durations.astype('timedelta64[s]').astype(np.float64) / 3600
+
+
+def _as_datetime64(value):
+    return np.datetime64(_naive_utc(value), 'us')
+
+
+def report(since=None, until=None):
+    """
+    Finance aggregates over case requests created in [since, until), or None
+    without a case request snapshot.
+    """
+    cases = load_snapshot('case-requests')
+    if cases is None:
+        return None
+
+    created = cases['created_at']
+    mask = np.ones(cases.rows, dtype=np.bool_)
+    if since is not None:
+        mask &= created >= _as_datetime64(since)
+    if until is not None:
+        mask &= created < _as_datetime64(until)
+
+    status = cases['status'][mask]
+    case_type = cases['case_type'][mask]
+    amount = cases['amount_involved'][mask] / 100
+    fee = cases['registration_fee'][mask]
+    fee_paid = cases['registration_fee_paid'][mask]
+    approved = status == cases.code('status', 'approved')
+    rejected = status == cases.code('status', 'rejected')
+    pending = status == cases.code('status', 'pending')
+
+    approval_hours = _hours(cases['approved_at'][mask][approved] - created[mask][approved])
+    rejection_hours = _hours(cases['rejected_at'][mask][rejected] - created[mask][rejected])
+
+    type_count = len(cases.categories['case_type'])
+    requests_by_type = np.bincount(case_type, minlength=type_count)
+    approved_by_type = np.bincount(case_type[approved], minlength=type_count)
+    rejected_by_type = np.bincount(case_type[rejected], minlength=type_count)
+    paid_by_type = np.bincount(case_type[approved & fee_paid], minlength=type_count)
+
+    by_case_type = []
+    for code, name in enumerate(cases.categories['case_type']):
+        if not requests_by_type[code]:
+            continue
+        decided = approved_by_type[code] + rejected_by_type[code]
+        by_case_type.append({
+            'case_type': name,
+            'requests': int(requests_by_type[code]),
+            'approved': int(approved_by_type[code]),
+            'rejected': int(rejected_by_type[code]),
+            'approval_rate': _ratio(approved_by_type[code], decided),
+            'fee_conversion_rate': _ratio(paid_by_type[code], approved_by_type[code]),
+            'median_amount_involved': round(float(np.median(amount[case_type == code])), 2),
+        })
+    by_case_type.sort(key=lambda row: -row['requests'])
+
+    collected = 0
+    payments = load_snapshot('payments')
+    if payments is not None:
+        completed = payments['status'] == payments.code('status', 'completed')
+        in_range = np.isin(payments['case_id'], cases['id'][mask])
+        collected = int(payments['amount'][completed & in_range].sum())
+
+    decided = int(approved.sum() + rejected.sum())
+    return {
+        'case_requests': int(mask.sum()),
+        'snapshot_watermark': cases.meta['watermark'],
+        'amount_involved': {
+            'mean': round(float(amount.mean()), 2) if len(amount) else None,
+            'min': round(float(amount.min()), 2) if len(amount) else None,
+            'max': round(float(amount.max()), 2) if len(amount) else None,
+            'percentiles': _percentiles(amount),
+        },
+        'decisions': {
+            'pending': int(pending.sum()),
+            'approved': int(approved.sum()),
+            'rejected': int(rejected.sum()),
+            'approval_rate': _ratio(int(approved.sum()), decided),
+            'rejection_rate': _ratio(int(rejected.sum()), decided),
+        },
+        'registration_fees': {
+            'billed': round(int(fee[approved].sum()) / 100, 2),
+            'paid_cases': int((approved & fee_paid).sum()),
+            'conversion_rate': _ratio(int((approved & fee_paid).sum()), int(approved.sum())),
+            'collected': round(collected / 100, 2),
+        },
+        'time_to_decision_hours': {
+            'approved': _percentiles(approval_hours),
+            'rejected': _percentiles(rejection_hours),
+            'all': _percentiles(np.concatenate([approval_hours, rejection_hours])),
+        },
+        'by_case_type': by_case_type,
+    }
@@ -0,0 +1,242 @@
+"""
+Time-based archival of append-only rows to compressed cold storage.
+
+Rows older than ``ARCHIVE_AFTER_DAYS`` are read in keyset order, written to
+gzipped NDJSON segment files partitioned by day under ``ARCHIVE_ROOT`` and
+deleted from the hot table in the same transaction that records the
+segment's time range in ``ArchiveSegment``. Rows are stored in their API
+representation so archived reads can be served without the database rows.
+"""
+import gzip
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.functional import cached_property
+
+from core import changes
+from core.models import RejectedCase, CaseNote, ArchiveSegment
+from core.serializers import RejectedCaseSerializer, CaseNoteSerializer
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    model: type
+    serializer_class: type
+    time_field: str
+    select_related: tuple = ()
+
+
+ARCHIVES = {
+    'rejected-cases': ArchiveSpec(RejectedCase, RejectedCaseSerializer, 'rejected_at', ('client', 'rejected_by')),
+    'case-notes': ArchiveSpec(CaseNote, CaseNoteSerializer, 'created_at', ('author',)),
+}
+
+
+def archive_cutoff(days=None):
+    """Rows older than this belong to the archive rather than the hot window"""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def parse_timestamp(value):
+    """Parse an ISO date or datetime into an aware datetime, or None"""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _segment_path(dataset, day):
+    return os.path.join(
+        settings.ARCHIVE_ROOT, dataset, f"{day:%Y}", f"{day:%m}",
+        f"{day:%Y-%m-%d}-{uuid.uuid4().hex[:12]}.ndjson.gz",
+    )
+
+
+def _write_segment(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.partial"
+    try:
+        with open(partial, 'wb') as raw:
+            with gzip.open(raw, 'wt', encoding='utf-8') as segment:
+                for row in rows:
+                    segment.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            # Closing the gzip stream writes its trailer; only then is there a whole file to sync
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def archive_dataset(dataset, older_than_days=None, batch_size=None):
+    """Move rows older than the cutoff into segment files, returning the count moved"""
+    spec = ARCHIVES[dataset]
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = archive_cutoff(older_than_days)
+    queryset = (
+        spec.model.objects
+        .filter(**{f'{spec.time_field}__lt': cutoff})
+        .select_related(*spec.select_related)
+        .order_by(spec.time_field, 'id')
+    )
+
+    moved = 0
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            # Keyset continuation on (time, id) so each batch is an index range scan
+            last_time, last_id = last
+            page = page.filter(
+                Q(**{f'{spec.time_field}__gt': last_time}) | Q(**{spec.time_field: last_time, 'id__gt': last_id})
+            )
+        batch = list(page[:batch_size])
+        if not batch:
+            break
+        last = (getattr(batch[-1], spec.time_field), batch[-1].id)
+
+        days = {}
+        for obj in batch:
+            days.setdefault(timezone.localdate(getattr(obj, spec.time_field)), []).append(obj)
+
+        written = []
+        try:
+            for day, objs in days.items():
+                path = _segment_path(dataset, day)
+                _write_segment(path, spec.serializer_class(objs, many=True).data)
+                written.append((path, objs))
+            # Archiving is not a deletion from the users' point of view
+            with transaction.atomic(), changes.suppressed():
+                ArchiveSegment.objects.bulk_create([
+                    ArchiveSegment(
+                        dataset=dataset,
+                        path=path,
+                        start=getattr(objs[0], spec.time_field),
+                        end=getattr(objs[-1], spec.time_field),
+                        row_count=len(objs),
+                    )
+                    for path, objs in written
+                ])
+                spec.model.objects.filter(id__in=[obj.id for obj in batch]).delete()
+        except Exception:
+            for path, _ in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        moved += len(batch)
+    return moved
+
+
+def read_archive(dataset, start=None, end=None, predicate=None, oldest_first=False):
+    """
+    Yield archived rows whose timestamp falls in [start, end], newest first
+    unless ``oldest_first``.
+
+    Only segments whose time range overlaps the window are opened, one at a
+    time as the rows are consumed, so a caller that stops early (and closes
+    the generator) reads no further segments.
+    """
+    spec = ARCHIVES[dataset]
+    segments = ArchiveSegment.objects.filter(dataset=dataset)
+    if start is not None:
+        segments = segments.filter(end__gte=start)
+    if end is not None:
+        segments = segments.filter(start__lte=end)
+    segments = segments.order_by('start', 'id') if oldest_first else segments.order_by('-start', '-id')
+
+    for segment in segments:
+        rows = []
+        with gzip.open(segment.path, 'rt', encoding='utf-8') as source:
+            # Segments are written oldest first
+            for line in source:
+                row = json.loads(line)
+                timestamp = parse_datetime(row[spec.time_field])
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                if predicate is None or predicate(row):
+                    if oldest_first:
+                        yield row
+                    else:
+                        rows.append(row)
+        yield from reversed(rows)
+
+
+def _take(rows, start, stop):
+    """Items [start, stop) of the iterator ``rows``, and how many of its items were consumed"""
+    taken, consumed = [], 0
+    try:
+        for consumed, row in enumerate(rows, 1):
+            if consumed > start:
+                taken.append(row)
+            if consumed >= stop:
+                break
+    finally:
+        rows.close()
+    return taken, consumed
+
+
+class ArchivedResults:
+    """
+    Sliceable sequence of hot queryset rows and archived rows.
+
+    Hot rows come first, or the archived ones (which are older) when the
+    listing runs oldest first. Slices within the hot range hit the
+    database; slices reaching the archive read it only as far as their end.
+    There is no length: counting archived rows means reading every segment
+    in range, so archived listings are paged without a count.
+    """
+    def __init__(self, queryset, archived, oldest_first=False):
+        self.queryset = queryset
+        # Called for a fresh read_archive() generator per slice
+        self.archived = archived
+        self.oldest_first = oldest_first
+
+    @cached_property
+    def hot_count(self):
+        return self.queryset.count()
+
+    def __iter__(self):
+        return iter(self[0:None])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step not in (None, 1) or (index.start or 0) < 0:
+            raise TypeError('ArchivedResults supports forward slices only')
+        start, stop = index.start or 0, index.stop
+        if stop is not None and stop <= start:
+            return []
+        bound = float('inf') if stop is None else stop
+
+        if self.oldest_first:
+            archived, consumed = _take(self.archived(), start, bound)
+            if consumed < bound:
+                # The archive ran out at `consumed` rows; the hot rows follow
+                hot_stop = None if stop is None else stop - consumed
+                archived += list(self.queryset[max(start - consumed, 0):hot_stop])
+            return archived
+
+        hot = list(self.queryset[start:stop])
+        if stop is not None and len(hot) == stop - start:
+            return hot
+        hot_count = start + len(hot) if hot else self.hot_count
+        archived, _ = _take(self.archived(), max(start - hot_count, 0), bound - hot_count)
+        return hot + archived
@@ -0,0 +1,152 @@
+"""
+Typeahead suggestions for case numbers and titles.
+
+Each process keeps a sorted prefix index of the approved cases visible to
+each recently active user, built on their first keystroke from
+``Case.objects.for_user`` so suggestions are role-scoped like the case list.
+Case saves and deletes patch the loaded indexes once committed (see
+core.signals and core.services). Other processes only pick up a change when
+their copy expires after ``AUTOCOMPLETE_INDEX_TTL`` seconds, and at most
+``AUTOCOMPLETE_MAX_USERS`` indexes are kept, least recently used first out.
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Case
+
+
+def index_keys(case_number, title):
+    """
+    Lowercased keys a case can be found by: its case number (with and
+    without the ``CASE-`` prefix) and its title from the start of each word.
+    """
+    keys = set()
+    if case_number:
+        number = case_number.lower()
+        keys.add(number)
+        keys.add(number.partition('-')[2] or number)
+    words = (title or '').lower().split()
+    for i in range(len(words)):
+        keys.add(' '.join(words[i:]))
+    return keys
+
+
+class PrefixIndex:
+    """Sorted (key, case id) pairs for one user's cases"""
+
+    def __init__(self, rows=()):
+        self.cases = {}
+        entries = []
+        for case_id, case_number, title in rows:
+            self.cases[case_id] = (case_number, title)
+            entries.extend((key, case_id) for key in index_keys(case_number, title))
+        entries.sort()
+        self.entries = entries
+
+    def add(self, case_id, case_number, title):
+        self.remove(case_id)
+        self.cases[case_id] = (case_number, title)
+        for key in index_keys(case_number, title):
+            bisect.insort(self.entries, (key, case_id))
+
+    def remove(self, case_id):
+        if case_id not in self.cases:
+            return
+        case_number, title = self.cases.pop(case_id)
+        for key in index_keys(case_number, title):
+            position = bisect.bisect_left(self.entries, (key, case_id))
+            if position < len(self.entries) and self.entries[position] == (key, case_id):
+                del self.entries[position]
+
+    def search(self, prefix, limit):
+        """Up to ``limit`` (case id, case number, title) matches, in key order"""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        matches = []
+        seen = set()
+        position = bisect.bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(matches) < limit:
+            key, case_id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            if case_id not in seen:
+                seen.add(case_id)
+                matches.append((case_id, *self.cases[case_id]))
+            position += 1
+        return matches
+
+
+class AutocompleteIndex:
+    """This process's prefix indexes, one per recently active user"""
+
+    def __init__(self, max_users=None, ttl=None):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, user):
+        with self._lock:
+            loaded = self._indexes.get(user.pk)
+            if loaded is not None and time.monotonic() - loaded[0] < (self.ttl or settings.AUTOCOMPLETE_INDEX_TTL):
+                self._indexes.move_to_end(user.pk)
+                return loaded[1]
+
+        # Build outside the lock; a save racing the build is caught by the TTL
+        started = time.monotonic()
+        index = PrefixIndex(Case.objects.for_user(user).values_list('id', 'case_number', 'title').iterator())
+        with self._lock:
+            self._indexes[user.pk] = (started, index)
+            self._indexes.move_to_end(user.pk)
+            while len(self._indexes) > (self.max_users or settings.AUTOCOMPLETE_MAX_USERS):
+                self._indexes.popitem(last=False)
+        return index
+
+    def suggest(self, user, prefix, limit=None):
+        index = self._load(user)
+        with self._lock:
+            return index.search(prefix, limit or settings.AUTOCOMPLETE_LIMIT)
+
+    def case_changed(self, case_id, case_number, title, visible_to):
+        """Index an approved case for the users in ``visible_to`` and drop it everywhere else"""
+        with self._lock:
+            for user_id, (_, index) in self._indexes.items():
+                if user_id in visible_to:
+                    index.add(case_id, case_number, title)
+                else:
+                    index.remove(case_id)
+
+    def case_removed(self, case_id):
+        self.case_changed(case_id, None, None, ())
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def cases_changed(case_requests):
+    """Patch the loaded indexes for saved case requests once the transaction commits"""
+    changes = [
+        (case_request.pk, case_request.case_number, case_request.title,
+         {case_request.client_id, case_request.lawyer_id} if case_request.status == 'approved' else set())
+        for case_request in case_requests
+    ]
+
+    def apply():
+        for change in changes:
+            autocomplete_index.case_changed(*change)
+
+    transaction.on_commit(apply)
+
+
+def case_deleted(case_id):
+    transaction.on_commit(lambda: autocomplete_index.case_removed(case_id))
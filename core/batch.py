@@ -0,0 +1,195 @@
+"""
+Batched API requests.
+
+``POST /batch/`` runs a list of sub-requests to the other API routes in
+one round trip, authenticated once: every sub-request's view is handed the
+batch's user, with its profile already loaded, instead of decoding the
+token and fetching the user again. Consecutive safe-method sub-requests
+are independent and run concurrently on a process-wide pool of
+``BATCH_MAX_WORKERS`` threads. A write runs on its own, after the reads
+before it and before the ones after it, so later reads see it. Writes are
+not atomic as a group: each commits or fails on its own.
+
+Sub-requests bypass the middleware stack. Read routing (core.replicas) and
+the load-shedding limit of each one's route class (core.shedding) are
+applied to them here, so a batch cannot run more searches or lists than
+separate requests could; a sub-request over its class's limit gets a 503
+of its own. Their SQL is counted towards the batch. Streamed responses
+(exports, the event stream) cannot be batched and are refused before they
+run.
+"""
+import contextvars
+import io
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import Http404
+from django.urls import Resolver404, resolve, reverse
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.replicas import routed
+from core.shedding import SHED_RESPONSE, limiters
+
+logger = logging.getLogger(__name__)
+
+# Request metadata a sub-request inherits from the batch, besides its HTTP headers
+INHERITED_META = ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL')
+# Routes that stream their response, besides the viewsets' ``export`` actions
+NOT_BATCHABLE = {'batch', 'change-stream'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(settings.BATCH_MAX_WORKERS, thread_name_prefix='batch')
+    return _executor
+
+
+def _error(status_code, detail):
+    return {'status': status_code, 'headers': {}, 'body': {'detail': detail}}
+
+
+def _api_root():
+    # Where core.urls is mounted, e.g. /api/v1/
+    return reverse('batch').removesuffix('batch/')
+
+
+def _subrequest(request, method, path, query, body):
+    environ = {key: value for key, value in request.META.items()
+               if key.startswith('HTTP_') or key in INHERITED_META}
+    environ.update({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    subrequest = WSGIRequest(environ)
+    # Picked up by DRF's Request in place of its authenticators, and by the plain async views
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def _result(response):
+    if response.streaming:
+        response.close()
+        return _error(400, 'Streamed responses cannot be batched.')
+    if isinstance(response, Response):
+        body = response.data
+    elif response.get('Content-Type', '').startswith('application/json'):
+        body = json.loads(response.content) if response.content else None
+    else:
+        body = response.content.decode(response.charset, errors='replace')
+    headers = {name: value for name, value in response.items() if name != 'Content-Length'}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def _batchable(match):
+    return match.url_name not in NOT_BATCHABLE and not match.url_name.endswith('-export')
+
+
+def _call(request, match, subrequest, method, spec):
+    try:
+        with routed(subrequest, request.user.pk):
+            if iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(subrequest, *match.args, **match.kwargs)
+            else:
+                response = match.func(subrequest, *match.args, **match.kwargs)
+            return _result(response)
+    except Http404:
+        return _error(404, 'Not found.')
+    except PermissionDenied:
+        return _error(403, 'You do not have permission to perform this action.')
+    except Exception:
+        logger.exception("Batched %s %s failed", method, spec['path'])
+        return _error(500, 'Server error.')
+
+
+def dispatch(request, spec):
+    """Run one sub-request of ``request``'s batch; returns its ``{'status', 'headers', 'body'}``"""
+    method = spec['method']
+    path, _, query = spec['path'].partition('?')
+    if not path.startswith(_api_root()):
+        return _error(404, 'Not found.')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, 'Not found.')
+    if not _batchable(match):
+        return _error(400, 'This route cannot be batched.')
+
+    body = b'' if spec.get('body') is None else json.dumps(spec['body']).encode()
+    subrequest = _subrequest(request, method, path, query, body)
+    limiter = limiters.classify(subrequest) if settings.LOAD_SHEDDING_ENABLED else None
+    if limiter is None:
+        return _call(request, match, subrequest, method, spec)
+    if not limiter.try_acquire():
+        return {'status': 503, 'headers': {'Retry-After': str(settings.LOAD_SHEDDING_RETRY_AFTER)},
+                'body': SHED_RESPONSE}
+    started = time.perf_counter()
+    result = None
+    try:
+        result = _call(request, match, subrequest, method, spec)
+        return result
+    finally:
+        limiter.release(time.perf_counter() - started, failed=result is None or result['status'] >= 500)
+
+
+def _pooled(request, spec):
+    # Pool threads outlive requests, so they retire their connections as request threads do
+    close_old_connections()
+    try:
+        return dispatch(request, spec)
+    finally:
+        close_old_connections()
+
+
+def run_batch(request, specs):
+    """The responses to ``specs`` (validated BatchSerializer requests), in order"""
+    try:
+        # Loaded once for every sub-request, before threads share the user
+        request.user.profile
+    except ObjectDoesNotExist:
+        pass
+
+    responses = [None] * len(specs)
+    reads = []
+
+    def flush():
+        if len(reads) == 1:
+            index, spec = reads[0]
+            responses[index] = dispatch(request, spec)
+        elif reads:
+            # Each task runs in its own copy of this context: its query collector, its read routing
+            futures = [(index, _pool().submit(contextvars.copy_context().run, _pooled, request, spec))
+                       for index, spec in reads]
+            for index, future in futures:
+                responses[index] = future.result()
+        reads.clear()
+
+    for index, spec in enumerate(specs):
+        if spec['method'] in SAFE_METHODS:
+            reads.append((index, spec))
+        else:
+            flush()
+            responses[index] = dispatch(request, spec)
+    flush()
+    return responses
@@ -0,0 +1,31 @@
+"""
+Benchmarks runnable with ``python manage.py benchmark <name>``.
+
+Each benchmark module exposes ``add_arguments(parser)`` and
+``run(options, stdout)`` returning a dict of measurements.
+"""
+import importlib
+
+BENCHMARKS = {
+    'analytics': 'core.benchmarks.analytics',
+    'api': 'core.benchmarks.api',
+    'autocomplete': 'core.benchmarks.autocomplete',
+    'batch': 'core.benchmarks.batch',
+    'export': 'core.benchmarks.export',
+    'filters': 'core.benchmarks.filters',
+    'import': 'core.benchmarks.imports',
+    'pooling': 'core.benchmarks.pooling',
+    'replicas': 'core.benchmarks.replicas',
+    'revocation': 'core.benchmarks.revocation',
+    'routing': 'core.benchmarks.routing',
+    'search': 'core.benchmarks.search',
+    'serving': 'core.benchmarks.serving',
+    'shedding': 'core.benchmarks.shedding',
+    'singleflight': 'core.benchmarks.singleflight',
+    'sse': 'core.benchmarks.sse',
+    'startup': 'core.benchmarks.startup',
+}
+
+
+def load(name):
+    return importlib.import_module(BENCHMARKS[name])
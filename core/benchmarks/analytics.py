@@ -0,0 +1,148 @@
+"""
+Finance report: vectorized over the columnar snapshot against SQL aggregates.
+
+Seeds ``--rows`` case requests in each lifecycle state plus payments for
+half the approved cases, takes a full snapshot, then times the report
+computed by core.analytics against the same figures computed with ORM
+aggregates on the live tables. An incremental snapshot after touching
+``--changed`` rows is timed too, and the two reports' counts must agree.
+Runs in a rolled-back transaction with snapshots under a temporary
+ANALYTICS_ROOT.
+"""
+import random
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.test import override_settings
+from django.utils import timezone
+
+from core.analytics import report, snapshot_dataset, DATASETS
+from core.benchmarks import data
+from core.benchmarks.utils import rolled_back
+from core.models import CaseRequest, Case, Payment
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=300_000, help='Rows of each lifecycle state')
+    parser.add_argument('--changed', type=int, default=1000, help='Rows updated before the incremental snapshot')
+    parser.add_argument('--repeat', type=int, default=5)
+
+
+def _seed(rows):
+    clients = data.seed_users('client', 500)
+    lawyers = data.seed_users('lawyer', 50)
+    data.seed_case_requests(clients, rows)
+    data.seed_cases(clients, lawyers, rows)
+    data.seed_rejected_cases(clients, lawyers, rows)
+
+    # Decisions a few hours to weeks after filing
+    decided = list(CaseRequest.objects.filter(client__in=clients).exclude(status='pending').only(
+        'id', 'status', 'created_at'
+    ))
+    for case_request in decided:
+        delay = timedelta(seconds=random.randint(3600, 21 * 86400))
+        if case_request.status == 'approved':
+            case_request.approved_at = case_request.created_at + delay
+        else:
+            case_request.rejected_at = case_request.created_at + delay
+    CaseRequest.objects.bulk_update(decided, ['approved_at', 'rejected_at'], batch_size=5000)
+
+    paid = list(Case.objects.filter(client__in=clients).values_list('id', flat=True)[::2])
+    Payment.objects.bulk_create([
+        Payment(case_id=case_id, amount=Decimal('500.00'), status='completed', paid_at=timezone.now())
+        for case_id in paid
+    ], batch_size=5000)
+    Case.objects.filter(id__in=paid).update(registration_fee_paid=True)
+
+    # Last touched over the past month, so only rows changed afterwards are past the watermark
+    now = timezone.now()
+    for model in (CaseRequest, Payment):
+        model.objects.bulk_update([
+            model(id=pk, updated_at=now - timedelta(seconds=random.randint(86400, 30 * 86400)))
+            for pk in model._base_manager.values_list('id', flat=True)
+        ], ['updated_at'], batch_size=5000)
+    return clients
+
+
+def sql_report():
+    """The report's figures from ORM aggregates on the live tables"""
+    requests = CaseRequest.objects.all()
+    amounts = requests.aggregate(mean=Avg('amount_involved'), min=Min('amount_involved'), max=Max('amount_involved'))
+    total = requests.count()
+    # Percentiles have no portable SQL aggregate; pick them with ORDER BY/OFFSET
+    ordered = requests.order_by('amount_involved').values_list('amount_involved', flat=True)
+    percentiles = {pct: ordered[min(total - 1, int(total * pct / 100))] for pct in (10, 25, 50, 75, 90, 99)}
+
+    by_type = list(requests.values('case_type').annotate(
+        requests=Count('id'),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+        paid=Count('id', filter=Q(status='approved', registration_fee_paid=True)),
+    ).order_by())
+    fees = requests.filter(status='approved').aggregate(billed=Sum('registration_fee'))
+    collected = Payment.objects.filter(status='completed').aggregate(total=Sum('amount'))
+
+    decision_times = {}
+    for outcome, field in (('approved', 'approved_at'), ('rejected', 'rejected_at')):
+        durations = requests.filter(status=outcome).annotate(
+            took=ExpressionWrapper(F(field) - F('created_at'), output_field=DurationField())
+        ).order_by('took').values_list('took', flat=True)
+        count = durations.count()
+        decision_times[outcome] = {
+            pct: durations[min(count - 1, int(count * pct / 100))] for pct in (50, 90, 99)
+        } if count else None
+
+    return {
+        'case_requests': total, 'amounts': amounts, 'percentiles': percentiles,
+        'by_case_type': by_type, 'fees': fees, 'collected': collected, 'decision_times': decision_times,
+    }
+
+
+def _best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, round(min(timings) * 1000, 1)
+
+
+def run(options, stdout):
+    results = {'rows_per_state': options['rows']}
+
+    with tempfile.TemporaryDirectory() as root, override_settings(ANALYTICS_ROOT=root), rolled_back():
+        clients = _seed(options['rows'])
+
+        started = time.perf_counter()
+        for dataset in DATASETS:
+            snapshot_dataset(dataset, full=True)
+        results['full_snapshot_seconds'] = round(time.perf_counter() - started, 2)
+
+        changed = list(CaseRequest.objects.filter(client__in=clients, status='pending').values_list(
+            'id', flat=True
+        )[:options['changed']])
+        CaseRequest.objects.filter(id__in=changed).update(
+            status='rejected', rejected_at=timezone.now(), updated_at=timezone.now(),
+        )
+        started = time.perf_counter()
+        read = sum(snapshot_dataset(dataset)[0] for dataset in DATASETS)
+        results.update({
+            'incremental_rows_read': read,
+            'incremental_snapshot_seconds': round(time.perf_counter() - started, 2),
+        })
+
+        vectorized, results['numpy_report_ms'] = _best_of(options['repeat'], report)
+        sql, results['sql_report_ms'] = _best_of(options['repeat'], sql_report)
+        results['speedup'] = round(results['sql_report_ms'] / results['numpy_report_ms'], 1)
+
+        sql_rejected = sum(row['rejected'] for row in sql['by_case_type'])
+        results['consistent'] = (
+            vectorized['case_requests'] == sql['case_requests']
+            and vectorized['decisions']['rejected'] == sql_rejected
+        )
+        results['passed'] = results['consistent']
+
+    return results
@@ -0,0 +1,328 @@
+"""
+End-to-end latency, queries and memory of every API route.
+
+Generates a production-shaped data set with ``core.synthetic`` (committed,
+so the async views' connections see it, and purged afterwards), then sends
+``--samples`` requests to each route in ``core/urls.py`` through the full
+middleware stack as a client, a lawyer, a staff user or anonymously.
+Payments talk to a local stub of the provider, and the analytics report
+reads a snapshot taken into a temporary directory.
+
+Per route it reports p50/p99 latency, SQL queries per request (from the
+``Server-Timing`` header ``core.metrics`` sets) and the peak memory one
+request allocates, and compares them with the baseline committed for the
+database vendor in ``core/benchmarks/baselines/api.<vendor>.json`` (or
+``--baseline``; ``--no-baseline`` skips it). A route regresses when it
+runs more queries, or when its p50 grows by more than both ``--tolerance``
+(50%) and ``--slack-ms`` (5 ms); the run fails on any regression, and on
+any route that answers with an error. The p50 of repeated runs on one
+machine moves by up to a third, and the p99 of 30 samples is their
+slowest, which one pause can double, so p99 is reported but not gated and
+the tolerance is set to catch what an N+1 query or a lost index costs
+rather than noise. Baselines only compare under the data set and sample
+count they were recorded with. Query counts hold on any machine,
+latencies only on one like the baseline's: re-record it with
+``--save-baseline core/benchmarks/baselines/api.<vendor>.json`` after an
+intended change, or on new reference hardware.
+
+``changes/stream/`` never ends and is measured by ``benchmark sse``
+instead. Queries run while a streaming export is consumed are not counted,
+as the header is sent before the body.
+"""
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+import tracemalloc
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.analytics import DATASETS, snapshot_dataset
+from core.benchmarks.serving import _stub_provider
+from core.benchmarks.utils import current_rss_mb, percentile
+from core.models import Case, CaseNote, CaseRequest, Payment, RejectedCase, UserProfile
+from core.synthetic import Generator, purge
+
+PASSWORD = 'benchmark-password'
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines')
+# The options a baseline was recorded with, which a comparison must share
+COMPARABLE_OPTIONS = ('clients', 'lawyers', 'case_requests', 'samples', 'seed', 'provider_latency_ms')
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def add_arguments(parser):
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--lawyers', type=int, default=20)
+    parser.add_argument('--case-requests', type=int, default=5000)
+    parser.add_argument('--samples', type=int, default=30, help='Timed requests per route')
+    parser.add_argument('--route', action='append', help='Only routes whose name starts with this (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--provider-latency-ms', type=int, default=0)
+    parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to PATH as the new baseline')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='Compare against the baseline stored in PATH instead of the committed one')
+    parser.add_argument('--no-baseline', action='store_true', help='Do not compare against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed relative p50 growth over the baseline')
+    parser.add_argument('--slack-ms', type=float, default=5.0,
+                        help='p50 growth always allowed, so millisecond routes do not flap')
+
+
+class Scenario:
+    """The seeded users and rows, and the request each route sends for sample ``i``"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        # The client with the most cases and the lawyer with the most pending requests
+        self.client = User.objects.filter(username__startswith=f"{prefix}-client-").annotate(
+            cases=Count('case_requests')
+        ).order_by('-cases').first()
+        self.lawyer = User.objects.filter(username__startswith=f"{prefix}-lawyer-").annotate(
+            pending=Count('assigned_case_requests')
+        ).order_by('-pending').first()
+        self.staff = User.objects.create_user(f"{prefix}-staff", password=PASSWORD, is_staff=True)
+        UserProfile.objects.create(user=self.staff, role='client')
+
+        self.case_request = CaseRequest.objects.filter(client=self.client).order_by('id').first()
+        self.case = Case.objects.filter(client=self.client, payment__isnull=False).order_by('id').first()
+        if self.case is None:
+            self.case = Case.objects.filter(client=self.client).order_by('id').first()
+            Payment.objects.create(case=self.case, amount=self.case.registration_fee)
+        self.payment = self.case.payment
+        self.note = CaseNote.objects.create(case=self.case, author=self.client, content='Benchmark note')
+        self.rejected = RejectedCase.objects.filter(rejected_by=self.lawyer).order_by('id').first()
+        self.lawyer_profile = UserProfile.objects.get(user=self.lawyer)
+        # Approving and rejecting consume a pending request per call
+        self.pending = iter(CaseRequest.objects.filter(
+            client__username__startswith=f"{prefix}-", status='pending'
+        ).order_by('id').values_list('id', flat=True))
+        self.registered = count()
+
+        self.clients = {'anonymous': Client()}
+        for role, user in (('client', self.client), ('lawyer', self.lawyer), ('staff', self.staff)):
+            self.clients[role] = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    def next_pending(self):
+        pending = next(self.pending, None)
+        if pending is None:
+            raise CommandError('Ran out of pending case requests; generate more with --case-requests')
+        return pending
+
+    def routes(self):
+        """(name, role, method, path or path factory, body factory or None, content type)"""
+        case, note, payment = self.case.pk, self.note.pk, self.payment.pk
+        json_type = 'application/json'
+        return [
+            ('auth.register', 'anonymous', 'post', '/api/v1/auth/register/', lambda i: {
+                'username': f"{self.prefix}-registered-{next(self.registered)}", 'email': 'new@example.com',
+                'password': PASSWORD, 'password_confirm': PASSWORD, 'role': 'client',
+            }, json_type),
+            ('auth.token', 'anonymous', 'post', '/api/v1/auth/token/',
+             lambda i: {'username': self.staff.username, 'password': PASSWORD}, json_type),
+            ('auth.token.refresh', 'anonymous', 'post', '/api/v1/auth/token/refresh/',
+             lambda i: {'refresh': str(RefreshToken.for_user(self.client))}, json_type),
+            ('profile', 'client', 'get', '/api/v1/profile/', None, None),
+            ('profile.update', 'client', 'patch', '/api/v1/profile/', lambda i: {'phone': f"+91 98{i:08d}"}, json_type),
+            ('case-requests.list', 'client', 'get', '/api/v1/case-requests/', None, None),
+            ('case-requests.list.filtered', 'client', 'get',
+             '/api/v1/case-requests/?status=approved&ordering=-amount_involved', None, None),
+            ('case-requests.inbox', 'lawyer', 'get', '/api/v1/case-requests/', None, None),
+            ('case-requests.create', 'client', 'post', '/api/v1/case-requests/', lambda i: {
+                'title': f"Benchmark request {i}", 'description': 'Filed by the API benchmark',
+                'case_type': 'Civil', 'amount_involved': '25000.00', 'requested_lawyer_type': 'Civil',
+            }, json_type),
+            ('case-requests.detail', 'client', 'get', f"/api/v1/case-requests/{self.case_request.pk}/", None, None),
+            ('case-requests.my_cases', 'client', 'get', '/api/v1/case-requests/my_cases/', None, None),
+            ('case-requests.export', 'client', 'get', '/api/v1/case-requests/export/?export_format=csv', None, None),
+            ('case-requests.import', 'client', 'post', '/api/v1/case-requests/import/', self._import_file, None),
+            ('cases.list', 'client', 'get', '/api/v1/cases/', None, None),
+            ('cases.list.search', 'lawyer', 'get', '/api/v1/cases/?search=dispute', None, None),
+            ('cases.detail', 'client', 'get', f"/api/v1/cases/{case}/", None, None),
+            ('cases.autocomplete', 'lawyer', 'get', '/api/v1/cases/autocomplete/?q=CASE-', None, None),
+            ('cases.export', 'lawyer', 'get', '/api/v1/cases/export/?export_format=ndjson', None, None),
+            ('cases.approve', 'lawyer', 'post', lambda i: f"/api/v1/cases/{self.next_pending()}/approve_case/",
+             lambda i: {'registration_fee': '500.00'}, json_type),
+            ('cases.reject', 'lawyer', 'post', lambda i: f"/api/v1/cases/{self.next_pending()}/reject_case/",
+             lambda i: {'rejection_reason': 'Benchmark rejection'}, json_type),
+            ('rejected-cases.list', 'lawyer', 'get', '/api/v1/rejected-cases/', None, None),
+            ('rejected-cases.detail', 'lawyer', 'get', f"/api/v1/rejected-cases/{self.rejected.pk}/", None, None),
+            ('rejected-cases.export', 'lawyer', 'get', '/api/v1/rejected-cases/export/?export_format=csv', None, None),
+            ('notes.list', 'client', 'get', f"/api/v1/cases/{case}/notes/", None, None),
+            ('notes.create', 'client', 'post', f"/api/v1/cases/{case}/notes/",
+             lambda i: {'content': f"Benchmark note {i}"}, json_type),
+            ('notes.bulk', 'client', 'post', f"/api/v1/cases/{case}/notes/bulk/",
+             lambda i: [{'content': f"Benchmark note {i}.{n}"} for n in range(10)], json_type),
+            ('notes.detail', 'client', 'get', f"/api/v1/cases/{case}/notes/{note}/", None, None),
+            ('notes.update', 'client', 'patch', f"/api/v1/cases/{case}/notes/{note}/",
+             lambda i: {'content': f"Edited {i}"}, json_type),
+            ('payments.list', 'client', 'get', '/api/v1/payments/', None, None),
+            ('payments.detail', 'client', 'get', f"/api/v1/payments/{payment}/", None, None),
+            ('payments.create_payment_intent', 'client', 'post',
+             f"/api/v1/payments/{payment}/create_payment_intent/", None, None),
+            ('payments.confirm_payment', 'client', 'post', f"/api/v1/payments/{payment}/confirm_payment/", None, None),
+            ('lawyers.list', 'client', 'get', f"/api/v1/lawyers/?state={self.lawyer_profile.state}", None, None),
+            ('lawyers.facets', 'client', 'get', '/api/v1/lawyers/facets/', None, None),
+            ('lawyers.detail', 'client', 'get', f"/api/v1/lawyers/{self.lawyer_profile.pk}/", None, None),
+            ('changes', 'lawyer', 'get', '/api/v1/changes/', None, None),
+            ('reports.analytics', 'staff', 'get', '/api/v1/reports/analytics/', None, None),
+            ('schema', 'anonymous', 'get', '/api/v1/schema/', None, None),
+            ('docs', 'anonymous', 'get', '/api/v1/docs/', None, None),
+            ('metrics', 'anonymous', 'get', '/metrics', None, None),
+        ]
+
+    def _import_file(self, i):
+        rows = ''.join(
+            f"Imported {i}.{n},Filed by the API benchmark,Civil,1000.00\n" for n in range(20)
+        )
+        upload = io.BytesIO(f"title,description,case_type,amount_involved\n{rows}".encode())
+        upload.name = 'requests.csv'
+        return {'file': upload}
+
+
+def _send(client, method, path, body, content_type):
+    """Send one request and read its whole body; returns (seconds, status, queries)"""
+    kwargs = {}
+    if body is not None:
+        kwargs['data'] = json.dumps(body) if content_type else body
+        if content_type:
+            kwargs['content_type'] = content_type
+    started = time.perf_counter()
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    seconds = time.perf_counter() - started
+    queries = QUERIES.search(response.get('Server-Timing', ''))
+    return seconds, response.status_code, int(queries.group(1)) if queries else None
+
+
+def _measure(scenario, route, samples):
+    name, role, method, path, body, content_type = route
+    client = scenario.clients[role]
+
+    def request(i):
+        return _send(client, method, path(i) if callable(path) else path, body(i) if body else None, content_type)
+
+    # One untimed request warms caches and lazily imported modules
+    request(0)
+    latencies, queries, errors = [], [], 0
+    for i in range(1, samples + 1):
+        seconds, status_code, query_count = request(i)
+        latencies.append(seconds)
+        queries.append(query_count)
+        errors += status_code >= 400
+
+    tracemalloc.start()
+    try:
+        request(samples + 1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    measured = [query_count for query_count in queries if query_count is not None]
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries': max(measured) if measured else None,
+        'peak_kb': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+def _compare(routes, baseline, tolerance, slack_ms):
+    """Names of the routes slower or chattier than the baseline, with the reason"""
+    regressions = {}
+    for name, result in routes.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        reasons = []
+        if result['p50_ms'] > max(before['p50_ms'] * (1 + tolerance), before['p50_ms'] + slack_ms):
+            reasons.append(f"p50 {before['p50_ms']} -> {result['p50_ms']} ms")
+        if result['queries'] is not None and before['queries'] is not None and result['queries'] > before['queries']:
+            reasons.append(f"queries {before['queries']} -> {result['queries']}")
+        if reasons:
+            regressions[name] = '; '.join(reasons)
+    return regressions
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _load_baseline(options):
+    path = options['baseline'] or os.path.join(BASELINES, f"api.{connection.vendor}.json")
+    if options['no_baseline'] or (not options['baseline'] and not os.path.exists(path)):
+        return None, None
+    with open(path) as fh:
+        baseline = json.load(fh)
+    differing = [name for name in COMPARABLE_OPTIONS if baseline['options'][name] != options[name]]
+    if differing:
+        raise CommandError(
+            f"{path} was recorded with " + ', '.join(f"--{name.replace('_', '-')} {baseline['options'][name]}"
+                                                    for name in differing)
+            + '; run with those, or with --no-baseline'
+        )
+    return path, baseline
+
+
+def run(options, stdout):
+    baseline_path, baseline = _load_baseline(options)
+
+    generator = Generator(prefix=f"bench-api-{options['seed']}-{int(time.time())}", seed=options['seed'],
+                          password=PASSWORD)
+    analytics_root = tempfile.mkdtemp()
+    port = _free_port()
+    provider = _stub_provider(port, options['provider_latency_ms'] / 1000)
+    results = {'vendor': connection.vendor, 'rss_mb_before': round(current_rss_mb(), 1)}
+    try:
+        stdout.write(f"Generating {options['case_requests']} case requests...")
+        results['rows'] = generator.generate(options['clients'], options['lawyers'], options['case_requests'])
+        scenario = Scenario(generator.prefix)
+        routes = [
+            route for route in scenario.routes()
+            if not options['route'] or any(route[0].startswith(prefix) for prefix in options['route'])
+        ]
+        with override_settings(ANALYTICS_ROOT=analytics_root, STRIPE_API_BASE=f"http://127.0.0.1:{port}",
+                               ALLOWED_HOSTS=['testserver']):
+            for dataset in DATASETS:
+                snapshot_dataset(dataset)
+            results['routes'] = {}
+            for route in routes:
+                stdout.write(f"{route[0]}...")
+                results['routes'][route[0]] = _measure(scenario, route, options['samples'])
+    finally:
+        provider.shutdown()
+        shutil.rmtree(analytics_root, ignore_errors=True)
+        purge(generator.prefix)
+    results['rss_mb_after'] = round(current_rss_mb(), 1)
+
+    errors = [name for name, result in results['routes'].items() if result['errors']]
+    results['errors'] = errors
+    if options['save_baseline']:
+        with open(options['save_baseline'], 'w') as fh:
+            json.dump({
+                'vendor': connection.vendor,
+                'options': {name: options[name] for name in COMPARABLE_OPTIONS},
+                'routes': results['routes'],
+            }, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+    if baseline is not None:
+        results['baseline'] = baseline_path
+        results['regressions'] = _compare(
+            results['routes'], baseline['routes'], options['tolerance'], options['slack_ms']
+        )
+        results['unbaselined'] = sorted(set(results['routes']) - set(baseline['routes']))
+    results['passed'] = not errors and not results.get('regressions')
+    return results
@@ -0,0 +1,79 @@
+"""
+Case typeahead: in-memory prefix index against icontains queries.
+
+Seeds ``--cases`` approved cases spread over ``--lawyers`` lawyers, then
+times suggestions for random case number and title prefixes through the
+prefix index (after a first, building, request) and through the
+``icontains`` lookup the case search used to run on every keystroke.
+Everything runs in a rolled-back transaction.
+"""
+import random
+import time
+
+from django.db.models import Q
+
+from core.autocomplete import AutocompleteIndex
+from core.benchmarks import data
+from core.benchmarks.utils import percentile, rolled_back
+from core.models import Case
+
+
+def add_arguments(parser):
+    parser.add_argument('--cases', type=int, default=200_000)
+    parser.add_argument('--lawyers', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=500, help='Prefixes to time per strategy')
+    parser.add_argument('--limit', type=int, default=10)
+
+
+def _latencies(run, prefixes):
+    latencies = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        run(prefix)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def run(options, stdout):
+    results = {'cases': options['cases'], 'lawyers': options['lawyers']}
+    limit = options['limit']
+
+    with rolled_back():
+        clients = data.seed_users('client', 100)
+        lawyers = data.seed_users('lawyer', options['lawyers'])
+        data.seed_cases(clients, lawyers, options['cases'])
+        lawyer = lawyers[0]
+        visible = list(Case.objects.for_user(lawyer).values_list('case_number', 'title'))
+        results['cases_per_lawyer'] = len(visible)
+
+        # Partial case numbers (with and without CASE-) and title fragments, as typed
+        prefixes = []
+        for case_number, title in random.sample(visible, min(options['samples'], len(visible))):
+            prefixes.append(random.choice([
+                case_number[:random.randint(6, 9)],
+                case_number[5:5 + random.randint(2, 4)],
+                title[:random.randint(3, len(title))],
+            ]))
+
+        index = AutocompleteIndex()
+        started = time.perf_counter()
+        index.suggest(lawyer, 'warm-up', limit)
+        results['index_build_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        cases = Case.objects.for_user(lawyer)
+        strategies = {
+            'prefix_index': lambda prefix: index.suggest(lawyer, prefix, limit),
+            'icontains': lambda prefix: list(
+                cases.filter(Q(title__icontains=prefix) | Q(case_number__icontains=prefix))
+                .values_list('id', 'case_number', 'title')[:limit]
+            ),
+        }
+        for name, strategy in strategies.items():
+            latencies = _latencies(strategy, prefixes)
+            results.update({
+                f"{name}_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                f"{name}_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            })
+
+    return results
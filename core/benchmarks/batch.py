@@ -0,0 +1,166 @@
+"""
+The mobile home screen as separate calls and as one batch.
+
+Seeds a client with ``--cases`` cases (with payments) and rejected cases,
+then loads the home screen ``--samples`` times: once as five separate
+requests to the profile, cases, my_cases, rejected cases and payments
+routes, and once as a single ``/batch/`` request. Each HTTP call is
+charged ``--rtt-ms`` of simulated network round trip on top of its server
+time. Reports the wall time per screen, the server time (wall time less
+the simulated round trips), the SQL statements run (from
+``Server-Timing``) and the break-even round trip: the one above which the
+batch loads the screen faster, as it saves four round trips but may spend
+longer on the server than the five requests together.
+
+Passes when the batch ran fewer statements, broke even at a round trip of
+at most ``--max-break-even-ms`` (mobile networks rarely do better than
+20 ms), every batched response matched its separate one, a read after a
+write in the same batch saw the write, oversized batches, too many
+writes, nested batches and streamed routes were refused before running,
+and a sub-request over its route class's concurrency limit was shed.
+"""
+import re
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile
+from core.models import Case, CaseRequest, Payment
+from core.shedding import limiters
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+BATCH_PATH = '/api/v1/batch/'
+HOME_SCREEN = [
+    '/api/v1/profile/',
+    '/api/v1/cases/',
+    '/api/v1/case-requests/my_cases/',
+    '/api/v1/rejected-cases/',
+    '/api/v1/payments/',
+]
+
+
+def add_arguments(parser):
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--cases', type=int, default=40)
+    parser.add_argument('--rtt-ms', type=float, default=50.0, help='Simulated network round trip per HTTP call')
+    parser.add_argument('--max-break-even-ms', type=float, default=20.0,
+                        help='Highest round trip at which the batch may still be no faster')
+
+
+def _queries(response):
+    match = QUERIES.search(response.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def _batch(client, requests):
+    return client.post(BATCH_PATH, {'requests': requests}, content_type='application/json')
+
+
+def _separate(client, rtt):
+    """Returns (bodies, SQL statements, simulated round trips)"""
+    bodies, queries = [], 0
+    for path in HOME_SCREEN:
+        time.sleep(rtt)
+        response = client.get(path)
+        bodies.append((response.status_code, response.json()))
+        queries += _queries(response)
+    return bodies, queries, len(HOME_SCREEN)
+
+
+def _batched(client, rtt):
+    time.sleep(rtt)
+    response = _batch(client, [{'method': 'GET', 'path': path} for path in HOME_SCREEN])
+    bodies = [(item['status'], item['body']) for item in response.json()['responses']]
+    return bodies, _queries(response), 1
+
+
+def _screen(load, client, samples, rtt):
+    timings, server_timings, queries, bodies = [], [], 0, None
+    for _ in range(samples):
+        started = time.perf_counter()
+        bodies, statements, round_trips = load(client, rtt)
+        timings.append(time.perf_counter() - started)
+        server_timings.append(timings[-1] - round_trips * rtt)
+        queries += statements
+    timings.sort()
+    server_timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 50) * 1000, 1),
+        'p99_ms': round(percentile(timings, 99) * 1000, 1),
+        'server_p50_ms': round(percentile(server_timings, 50) * 1000, 1),
+        'queries': round(queries / samples, 1),
+    }, bodies
+
+
+def _checks(client):
+    results = {}
+    phone = '+91 9800000001'
+    responses = _batch(client, [
+        {'method': 'PATCH', 'path': '/api/v1/profile/', 'body': {'phone': phone}},
+        {'method': 'GET', 'path': '/api/v1/profile/'},
+    ]).json()['responses']
+    results['read_after_write'] = responses[0]['status'] == 200 and responses[1]['body'].get('phone') == phone
+
+    too_many = [{'path': '/api/v1/profile/'}] * (settings.BATCH_MAX_REQUESTS + 1)
+    results['too_many_requests'] = _batch(client, too_many).status_code
+    too_many_writes = [{'method': 'PATCH', 'path': '/api/v1/profile/', 'body': {}}] * (settings.BATCH_MAX_WRITES + 1)
+    results['too_many_writes'] = _batch(client, too_many_writes).status_code
+    refused = _batch(client, [
+        {'method': 'POST', 'path': BATCH_PATH, 'body': {'requests': [{'path': '/api/v1/profile/'}]}},
+        {'path': '/api/v1/case-requests/export/?export_format=csv'},
+        {'path': '/admin/'},
+    ]).json()['responses']
+    results['refused'] = [item['status'] for item in refused]
+
+    # A list route with its class's limit taken sheds within the batch; the profile is in another class
+    lists = next(limiter for limiter in limiters.all if limiter.name == 'list')
+    lists.in_flight += lists.max_limit
+    try:
+        shed = _batch(client, [{'path': '/api/v1/rejected-cases/'}, {'path': '/api/v1/profile/'}]).json()['responses']
+    finally:
+        lists.in_flight -= lists.max_limit
+    results['shed'] = [item['status'] for item in shed]
+    results['passed'] = (results['read_after_write'] and results['too_many_requests'] == 400
+                         and results['too_many_writes'] == 400 and results['refused'] == [400, 400, 404]
+                         and results['shed'] == [503, 200])
+    return results
+
+
+def run(options, stdout):
+    client_user = data.seed_users('client', 1)[0]
+    lawyer = data.seed_users('lawyer', 1)[0]
+    results = {'rtt_ms': options['rtt_ms'], 'max_break_even_ms': options['max_break_even_ms']}
+    try:
+        data.seed_cases([client_user], [lawyer], options['cases'])
+        data.seed_rejected_cases([client_user], [lawyer], options['cases'])
+        Payment.objects.bulk_create(
+            Payment(case=case, amount=Decimal('500.00')) for case in Case.objects.filter(client=client_user)
+        )
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(client_user)}")
+        rtt = options['rtt_ms'] / 1000
+
+        stdout.write('Separate requests...')
+        results['separate'], separate = _screen(_separate, client, options['samples'], rtt)
+        stdout.write('One batch...')
+        results['batch'], batched = _screen(_batched, client, options['samples'], rtt)
+        saved_round_trips = len(HOME_SCREEN) - 1
+        extra_server_ms = results['batch']['server_p50_ms'] - results['separate']['server_p50_ms']
+        results['break_even_rtt_ms'] = round(max(extra_server_ms, 0) / saved_round_trips, 1)
+        results['matching'] = [path for path, a, b in zip(HOME_SCREEN, separate, batched) if a == b]
+        results['checks'] = _checks(client)
+    finally:
+        CaseRequest.objects.filter(client=client_user).delete()
+        User.objects.filter(pk__in=[client_user.pk, lawyer.pk]).delete()
+
+    results['passed'] = (
+        results['batch']['queries'] < results['separate']['queries']
+        and results['break_even_rtt_ms'] <= options['max_break_even_ms']
+        and len(results['matching']) == len(HOME_SCREEN)
+        and results['checks']['passed']
+    )
+    return results
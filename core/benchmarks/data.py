@@ -0,0 +1,92 @@
+"""Helpers that bulk-insert synthetic rows for benchmarks"""
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from core.models import UserProfile, CaseRequest
+
+CASE_TYPES = ['Civil', 'Criminal', 'Corporate', 'Family', 'Property', 'Tax']
+
+
+def seed_users(role, count, prefix=None, batch_size=1000):
+    """Create ``count`` users with the given role and return them"""
+    prefix = prefix or f"bench-{role}-{uuid.uuid4().hex[:6]}"
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}-{i}", email=f"{prefix}-{i}@example.com") for i in range(count)],
+        batch_size=batch_size,
+    )
+    # bulk_create only returns primary keys on backends that support RETURNING
+    users = list(User.objects.filter(username__startswith=f"{prefix}-").order_by('id'))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user, role=role) for user in users],
+        batch_size=batch_size,
+    )
+    return users
+
+
+def _case_request(client, index):
+    return CaseRequest(
+        client=client,
+        title=f"Case request {index}",
+        description=f"Synthetic description for case request {index}. " * 4,
+        case_type=random.choice(CASE_TYPES),
+        amount_involved=Decimal(random.randint(1000, 10_000_000)) / 100,
+    )
+
+
+def seed_case_requests(clients, count, batch_size=5000, lawyer_types=None, vocabulary=None):
+    """
+    Insert ``count`` pending case requests spread across ``clients``, with
+    titles and descriptions drawn from ``vocabulary`` if given
+    """
+    for start in range(0, count, batch_size):
+        requests = [_case_request(clients[i % len(clients)], i) for i in range(start, min(count, start + batch_size))]
+        for case_request in requests:
+            if lawyer_types:
+                case_request.requested_lawyer_type = random.choice(lawyer_types)
+            if vocabulary:
+                case_request.title = ' '.join(random.choices(vocabulary, k=6))
+                case_request.description = ' '.join(random.choices(vocabulary, k=60))
+        CaseRequest.objects.bulk_create(requests)
+
+
+def assign_specializations(lawyers, specializations):
+    """Give the lawyers' profiles round-robin specializations"""
+    profiles = list(UserProfile.objects.filter(user__in=lawyers).order_by('user_id'))
+    for i, profile in enumerate(profiles):
+        profile.specialization = specializations[i % len(specializations)].lower()
+    UserProfile.objects.bulk_update(profiles, ['specialization'], batch_size=1000)
+
+
+def seed_cases(clients, lawyers, count, batch_size=5000):
+    """Insert ``count`` approved cases"""
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        requests = []
+        for i in range(start, min(count, start + batch_size)):
+            case_request = _case_request(clients[i % len(clients)], i)
+            case_request.status = 'approved'
+            case_request.lawyer = lawyers[i % len(lawyers)]
+            case_request.case_number = f"CASE-{uuid.uuid4().hex[:12].upper()}"
+            case_request.registration_fee = Decimal('500.00')
+            case_request.approved_at = now
+            requests.append(case_request)
+        CaseRequest.objects.bulk_create(requests)
+
+
+def seed_rejected_cases(clients, lawyers, count, batch_size=5000):
+    """Insert ``count`` rejected cases"""
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        requests = []
+        for i in range(start, min(count, start + batch_size)):
+            case_request = _case_request(clients[i % len(clients)], i)
+            case_request.status = 'rejected'
+            case_request.rejected_by = lawyers[i % len(lawyers)]
+            case_request.rejection_reason = 'Synthetic rejection'
+            case_request.rejected_at = now
+            requests.append(case_request)
+        CaseRequest.objects.bulk_create(requests)
@@ -0,0 +1,60 @@
+"""
+Export throughput and memory benchmark.
+
+Seeds ``--rows`` rows inside a transaction that is rolled back afterwards,
+streams them through the export pipeline and samples RSS every chunk so the
+peak growth during the export can be checked against ``--max-rss-mb``.
+"""
+import gc
+import time
+
+from core.benchmarks import data
+from core.benchmarks.utils import current_rss_mb, rolled_back
+from core.exports import EXPORTS, stream_export
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--model', choices=sorted(EXPORTS), default='cases')
+    parser.add_argument('--format', dest='export_format', choices=['csv', 'ndjson'], default='ndjson')
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--max-rss-mb', type=float, default=None,
+                        help='Fail if RSS grows by more than this during the export')
+
+
+def run(options, stdout):
+    model, columns = EXPORTS[options['model']]
+    rows = options['rows']
+
+    with rolled_back():
+        clients = data.seed_users('client', 100)
+        lawyers = data.seed_users('lawyer', 20)
+        if options['model'] == 'cases':
+            data.seed_cases(clients, lawyers, rows)
+        elif options['model'] == 'rejected-cases':
+            data.seed_rejected_cases(clients, lawyers, rows)
+        else:
+            data.seed_case_requests(clients, rows)
+        del clients, lawyers
+        gc.collect()
+
+        baseline = peak = current_rss_mb()
+        exported = 0
+        started = time.perf_counter()
+        for line in stream_export(model.objects.all(), columns, options['export_format'], options['chunk_size']):
+            exported += 1
+            if exported % options['chunk_size'] == 0:
+                peak = max(peak, current_rss_mb())
+        elapsed = time.perf_counter() - started
+        peak = max(peak, current_rss_mb())
+
+    results = {
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed) if elapsed else None,
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_growth_mb': round(peak - baseline, 1),
+    }
+    if options['max_rss_mb'] is not None:
+        results['passed'] = results['peak_rss_growth_mb'] <= options['max_rss_mb']
+    return results
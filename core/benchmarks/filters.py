@@ -0,0 +1,124 @@
+"""
+Query plans and latency of the core.filters range and list filters.
+
+Seeds clients, lawyers, pending requests, cases, rejected cases and
+payments, refreshes the planner statistics, then runs each filter over the
+role-scoped queryset its endpoint uses. A filter passes when the plan uses
+one of its expected indexes. Everything runs in a rolled-back transaction.
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile, rolled_back
+from core.filters import CaseRequestFilter, CaseFilter, RejectedCaseFilter, PaymentFilter
+from core.models import CaseRequest, Case, RejectedCase, Payment
+
+
+def add_arguments(parser):
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--lawyers', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=200_000, help='Rows of each lifecycle state')
+    parser.add_argument('--samples', type=int, default=50, help='Timed queries per filter')
+
+
+def _spread_dates(queryset, field, days=365):
+    """Spread a timestamp column over the past ``days`` so ranges are selective"""
+    now = timezone.now()
+    rows = list(queryset.only('id'))
+    for row in rows:
+        setattr(row, field, now - timedelta(seconds=random.randint(0, days * 86400)))
+    queryset.model.objects.bulk_update(rows, [field], batch_size=5000)
+
+
+def _seed(options):
+    clients = data.seed_users('client', options['clients'])
+    lawyers = data.seed_users('lawyer', options['lawyers'])
+    data.seed_case_requests(clients, options['rows'])
+    data.seed_cases(clients, lawyers, options['rows'])
+    data.seed_rejected_cases(clients, lawyers, options['rows'])
+    CaseRequest.objects.filter(client__in=clients, status='pending').update(assigned_lawyer=lawyers[0])
+    _spread_dates(CaseRequest.objects.filter(client__in=clients), 'created_at')
+    _spread_dates(RejectedCase.objects.filter(client__in=clients), 'rejected_at')
+
+    cases = list(Case.objects.filter(client__in=clients).only('id').order_by('id'))
+    Payment.objects.bulk_create([
+        Payment(case=case, amount=Decimal('500.00'), status='completed', paid_at=timezone.now())
+        for case in cases[::2]
+    ], batch_size=5000)
+    _spread_dates(Payment.objects.filter(case__client__in=clients), 'paid_at')
+    Case.objects.filter(client__in=clients, payment__isnull=False).update(registration_fee_paid=True)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return clients, lawyers
+
+
+def plan_checks(client, lawyer):
+    """(name, filterset class, scoped queryset, params, expected index names) per filter"""
+    month_ago = (timezone.now() - timedelta(days=30)).isoformat()
+    week_ago = (timezone.now() - timedelta(days=7)).isoformat()
+    return [
+        ('case-requests client created_at', CaseRequestFilter, CaseRequest.objects.for_user(client),
+         {'created_at_after': month_ago}, ['caserequest_client_created_idx']),
+        ('case-requests lawyer created_at', CaseRequestFilter, CaseRequest.objects.for_user(lawyer),
+         {'created_at_after': week_ago}, ['caserequest_inbox_idx']),
+        ('cases lawyer created_at', CaseFilter, Case.objects.for_user(lawyer),
+         {'created_at_after': month_ago, 'created_at_before': week_ago}, ['caserequest_lawyer_created_idx']),
+        ('cases lawyer case_type', CaseFilter, Case.objects.for_user(lawyer),
+         {'case_type': f"{data.CASE_TYPES[0]},{data.CASE_TYPES[1]}"}, ['caserequest_lawyer_created_idx']),
+        ('cases lawyer amount_involved', CaseFilter, Case.objects.for_user(lawyer),
+         {'amount_involved_min': '1000', 'amount_involved_max': '5000'}, ['caserequest_lawyer_amount_idx']),
+        ('cases lawyer registration_fee_paid', CaseFilter, Case.objects.for_user(lawyer),
+         {'registration_fee_paid': 'false'}, ['caserequest_lawyer_created_idx']),
+        ('cases client lawyer list', CaseFilter, Case.objects.for_user(client),
+         {'lawyer': str(lawyer.pk)}, ['caserequest_client_created_idx', 'caserequest_lawyer_created_idx']),
+        ('rejected lawyer rejected_at', RejectedCaseFilter, RejectedCase.objects.for_user(lawyer),
+         {'rejected_at_after': month_ago}, ['caserequest_rejected_idx']),
+        ('rejected client created_at', RejectedCaseFilter, RejectedCase.objects.for_user(client),
+         {'created_at_after': month_ago}, ['caserequest_client_created_idx']),
+        ('payments paid_at', PaymentFilter, Payment.objects.filter(case__lawyer=lawyer),
+         {'paid_at_after': week_ago}, ['caserequest_lawyer_created_idx', 'caserequest_lawyer_amount_idx']),
+    ]
+
+
+def run(options, stdout):
+    results = {'rows': options['rows'], 'vendor': connection.vendor}
+    failures = []
+
+    with rolled_back():
+        clients, lawyers = _seed(options)
+        for name, filterset_class, scoped, params, expected in plan_checks(clients[0], lawyers[1]):
+            filterset = filterset_class(params, queryset=scoped)
+            if not filterset.is_valid():
+                failures.append(name)
+                results[name] = {'errors': filterset.errors}
+                continue
+            queryset = filterset.qs
+            plan = queryset.explain()
+            uses_index = any(index in plan for index in expected)
+            if not uses_index:
+                failures.append(name)
+
+            latencies = []
+            for _ in range(options['samples']):
+                started = time.perf_counter()
+                list(queryset[:20])
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            results[name] = {
+                'uses_index': uses_index,
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            }
+            if not uses_index or options['verbosity'] > 1:
+                results[name]['plan'] = plan
+
+    results['failures'] = failures
+    results['passed'] = not failures
+    return results
@@ -0,0 +1,73 @@
+"""
+Case request import throughput benchmark.
+
+Generates ``--rows`` NDJSON records and imports them through the batched
+pipeline, optionally comparing against saving each row through the
+serializer one at a time. Everything runs in a rolled-back transaction.
+"""
+import io
+import json
+import random
+import time
+
+from core.benchmarks import data
+from core.benchmarks.utils import rolled_back
+from core.imports import read_records, import_case_requests
+from core.serializers import CaseRequestSerializer
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--invalid-ratio', type=float, default=0.01)
+    parser.add_argument('--compare', action='store_true', help='Also time per-row serializer saves')
+
+
+def _ndjson(clients, rows, invalid_ratio):
+    buffer = io.StringIO()
+    for i in range(rows):
+        record = {
+            'client': clients[i % len(clients)].username,
+            'title': f"Imported case {i}",
+            'description': f"Imported description {i}",
+            'case_type': random.choice(data.CASE_TYPES),
+            'amount_involved': f"{random.randint(100, 1_000_000)}.00",
+        }
+        if random.random() < invalid_ratio:
+            record['amount_involved'] = '-1'
+        buffer.write(json.dumps(record) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def run(options, stdout):
+    rows = options['rows']
+    results = {'rows': rows}
+
+    with rolled_back():
+        clients = data.seed_users('client', 100)
+        source = _ndjson(clients, rows, options['invalid_ratio'])
+
+        started = time.perf_counter()
+        result = import_case_requests(read_records(source, 'ndjson'), batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        results.update({
+            'created': result['created'],
+            'failed': result['failed'],
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed) if elapsed else None,
+        })
+
+        if options['compare']:
+            source.seek(0)
+            clients_by_name = {client.username: client for client in clients}
+            started = time.perf_counter()
+            for _, record in read_records(source, 'ndjson'):
+                serializer = CaseRequestSerializer(data=record)
+                if serializer.is_valid():
+                    serializer.save(client=clients_by_name[record['client']])
+            elapsed = time.perf_counter() - started
+            results['per_row_seconds'] = round(elapsed, 3)
+            results['per_row_rows_per_second'] = round(rows / elapsed) if elapsed else None
+
+    return results
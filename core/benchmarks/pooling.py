@@ -0,0 +1,158 @@
+"""
+Requests per second with and without connection reuse (PostgreSQL only).
+
+Each mode registers its own database alias and runs ``--requests``
+simulated requests over ``--concurrency`` threads. A request goes through
+Django's request lifecycle for that alias (``close_if_unusable_or_obsolete``
+before and after, as the request_started/request_finished handlers do) and
+runs a representative page query in between. Modes:
+
+* ``no-reuse``: ``CONN_MAX_AGE = 0``, a new connection per request
+* ``persistent``: ``CONN_MAX_AGE = 60`` with health checks, as for WSGI
+* ``pool``: the core.db.postgresql psycopg_pool backend, as for ASGI
+
+``--thread-per-request`` starts a thread per request, like ASGI's
+per-request sync thread, where thread-local persistent connections are
+never reused. The peak number of server connections is sampled from
+``pg_stat_activity``.
+"""
+import queue
+import threading
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection, connections
+
+from core.benchmarks.utils import percentile
+from core.models import Case
+
+MODES = {
+    'no-reuse': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+    'pool': {'ENGINE': 'core.db.postgresql', 'CONN_MAX_AGE': 0},
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per mode')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--pool-size', type=int, default=16)
+    parser.add_argument('--thread-per-request', action='store_true')
+
+
+def _request(db):
+    db.close_if_unusable_or_obsolete()
+    started = time.perf_counter()
+    list(Case.objects.using(db.alias).order_by('-created_at').values('id', 'case_number', 'status')[:20])
+    elapsed = time.perf_counter() - started
+    db.close_if_unusable_or_obsolete()
+    return elapsed
+
+
+def _server_connections():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+class PeakConnections(threading.Thread):
+    """Samples the database's server connection count until stopped"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                self.peak = max(self.peak, _server_connections())
+                self.stopped.wait(self.interval)
+        finally:
+            connection.close()
+
+
+def _run_mode(alias, options):
+    latencies = []
+    lock = threading.Lock()
+
+    def serve():
+        elapsed = _request(connections[alias])
+        with lock:
+            latencies.append(elapsed)
+
+    def serve_once():
+        serve()
+        # What becomes of a thread's connection when the thread ends
+        connections[alias].close()
+
+    baseline = _server_connections()
+    sampler = PeakConnections()
+    sampler.start()
+    started = time.perf_counter()
+    if options['thread_per_request']:
+        pending = list(range(options['requests']))
+        while pending:
+            batch = [threading.Thread(target=serve_once) for _ in pending[:options['concurrency']]]
+            del pending[:options['concurrency']]
+            for thread in batch:
+                thread.start()
+            for thread in batch:
+                thread.join()
+    else:
+        work = queue.Queue()
+        for _ in range(options['requests']):
+            work.put(None)
+
+        def worker():
+            while True:
+                try:
+                    work.get_nowait()
+                except queue.Empty:
+                    connections[alias].close()
+                    return
+                serve()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - started
+    sampler.stopped.set()
+    sampler.join()
+    latencies.sort()
+    return {
+        'requests_per_second': round(len(latencies) / seconds, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        # Less the sampler's own connection
+        'peak_server_connections': sampler.peak - baseline - 1,
+    }
+
+
+def run(options, stdout):
+    if connection.vendor != 'postgresql':
+        raise CommandError("The pooling benchmark needs a PostgreSQL database")
+    results = {'requests': options['requests'], 'concurrency': options['concurrency'],
+               'thread_per_request': options['thread_per_request']}
+
+    for mode, overrides in MODES.items():
+        alias = f"pooling-{mode}"
+        settings_dict = {**connection.settings_dict, 'OPTIONS': dict(connection.settings_dict['OPTIONS']), **overrides}
+        if mode == 'pool':
+            settings_dict['OPTIONS']['pool'] = {'min_size': options['pool_size'], 'max_size': options['pool_size']}
+        connections.settings[alias] = settings_dict
+        try:
+            results[mode] = _run_mode(alias, options)
+        finally:
+            if mode == 'pool':
+                connections[alias].close_pool()
+            del connections.settings[alias]
+
+    baseline = results['no-reuse']['requests_per_second']
+    for mode in ('persistent', 'pool'):
+        results[mode]['speedup'] = round(results[mode]['requests_per_second'] / baseline, 2)
+    results['passed'] = results['pool']['requests_per_second'] >= baseline
+    return results
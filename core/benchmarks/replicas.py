@@ -0,0 +1,112 @@
+"""
+Read-replica routing and read-your-writes stickiness (SQLite only).
+
+Copies the database to a file that plays a replica frozen at that moment,
+registers it as the only replica, and walks a client through the API:
+
+* a list read is served by the replica, so a row written since is missing,
+* after the client creates a case request, its reads stay on the primary
+  and include both rows,
+* once the pin expires it reads the stale replica again,
+* with the replica lagging past ``REPLICA_MAX_LAG_SECONDS`` reads fall
+  back to the primary.
+
+Also times list reads through the replica middleware on both paths. The
+seeded rows are committed, so the API's own connections see them, and
+deleted afterwards.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile
+from core.models import CaseRequest
+from core.replicas import lag_monitor
+
+ALIAS = 'replica_benchmark'
+LIST_URL = '/api/v1/case-requests/'
+
+
+def add_arguments(parser):
+    parser.add_argument('--samples', type=int, default=200, help='Timed list reads per path')
+
+
+def _listed_titles(client):
+    response = client.get(LIST_URL)
+    body = response.json()
+    rows = body['results'] if isinstance(body, dict) else body
+    return {row['title'] for row in rows}
+
+
+def _timed(client, samples):
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        client.get(LIST_URL)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {'p50_ms': round(percentile(latencies, 50) * 1000, 2), 'p99_ms': round(percentile(latencies, 99) * 1000, 2)}
+
+
+def run(options, stdout):
+    if connection.vendor != 'sqlite':
+        raise CommandError("The replicas benchmark snapshots the database file and needs SQLite")
+    results = {}
+    users = data.seed_users('client', 1)
+    user = users[0]
+    replica_path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+    try:
+        CaseRequest.objects.create(client=user, title='Before snapshot', description='x', case_type=data.CASE_TYPES[0],
+                                   amount_involved=Decimal('100.00'))
+        connection.ensure_connection()
+        with sqlite3.connect(replica_path) as replica:
+            connection.connection.backup(replica)
+        CaseRequest.objects.create(client=user, title='After snapshot', description='x', case_type=data.CASE_TYPES[0],
+                                   amount_involved=Decimal('100.00'))
+
+        connections.settings[ALIAS] = {**connection.settings_dict, 'NAME': replica_path}
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        with override_settings(DATABASE_REPLICAS=[ALIAS], REPLICA_STICKY_SECONDS=60):
+            lag_monitor.reset()
+            titles = _listed_titles(client)
+            results['reads_replica'] = titles == {'Before snapshot'}
+            results['replica_list'] = _timed(client, options['samples'])
+
+            response = client.post(LIST_URL, {
+                'title': 'Written by the client', 'description': 'x', 'case_type': data.CASE_TYPES[0],
+                'amount_involved': '100.00',
+            }, content_type='application/json')
+            titles = _listed_titles(client)
+            results['read_your_writes'] = (
+                response.status_code == 201 and {'After snapshot', 'Written by the client'} <= titles
+            )
+            results['pinned_list'] = _timed(client, options['samples'])
+
+            cache.delete(f"replica-pin:{user.pk}")
+            results['unpinned_reads_replica'] = _listed_titles(client) == {'Before snapshot'}
+
+            with override_settings(REPLICA_MAX_LAG_SECONDS=-1):
+                lag_monitor.reset()
+                results['lag_falls_back'] = 'After snapshot' in _listed_titles(client)
+    finally:
+        lag_monitor.reset()
+        if ALIAS in connections.settings:
+            connections[ALIAS].close()
+            del connections.settings[ALIAS]
+        cache.delete(f"replica-pin:{user.pk}")
+        CaseRequest.objects.filter(client=user).delete()
+        user.delete()
+        os.remove(replica_path)
+
+    results['passed'] = all(results[check] for check in
+                            ('reads_replica', 'read_your_writes', 'unpinned_reads_replica', 'lag_falls_back'))
+    return results
@@ -0,0 +1,176 @@
+"""
+Refresh-token revocation: ``/auth/token/refresh/`` throughput.
+
+Seeds ``--revoked`` unexpired revoked tokens, then chains ``--refreshes``
+refreshes through the endpoint, each with the refresh token the previous
+one rotated in, once checking every token against the table
+(``TOKEN_REVOCATION_FILTER`` off) and once through the Bloom filter.
+Reports refreshes per second, latency and the SQL statements per refresh
+(from ``Server-Timing``).
+
+Passes when the filter saved a statement per refresh, a rotated token
+replayed, a token revoked at logout and a token revoked by another process
+(with the filter synced, and still stale) were all refused, a filter
+filled to capacity answered false positives within twice its configured
+rate, and purging deleted expired rows and a rebuilt filter dropped them.
+"""
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile
+from core.models import RevokedToken
+from core.revocation import BloomFilter, purge_revoked_tokens, revocations
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+REFRESH_PATH = '/api/v1/auth/token/refresh/'
+BLACKLIST_PATH = '/api/v1/auth/token/blacklist/'
+PREFIX = 'benchmark-'
+
+
+def add_arguments(parser):
+    parser.add_argument('--refreshes', type=int, default=500)
+    parser.add_argument('--revoked', type=int, default=100000, help='Unexpired revoked tokens in the table')
+    parser.add_argument('--probes', type=int, default=100000, help='Lookups when measuring false positives')
+
+
+def _refresh(client, token):
+    response = client.post(REFRESH_PATH, {'refresh': token}, content_type='application/json')
+    queries = QUERIES.search(response.get('Server-Timing', ''))
+    return response, int(queries.group(1)) if queries else 0
+
+
+def _chain(client, user, count, filtered):
+    """``count`` refreshes, each with the token the last one rotated in; returns (stats, first token)"""
+    revocations.reset()
+    first = token = str(RefreshToken.for_user(user))
+    latencies, queries, errors = [], 0, 0
+    with override_settings(TOKEN_REVOCATION_FILTER=filtered):
+        # Built outside the measured loop, as it would be by a process's first refresh
+        _refresh(client, str(RefreshToken.for_user(user)))
+        started = time.perf_counter()
+        for _ in range(count):
+            sent = time.perf_counter()
+            response, statements = _refresh(client, token)
+            latencies.append(time.perf_counter() - sent)
+            queries += statements
+            if response.status_code != 200:
+                errors += 1
+                break
+            token = response.json()['refresh']
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'refreshes_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_refresh': round(queries / len(latencies), 2),
+        'errors': errors,
+        'checks': dict(revocations.checks),
+    }, first
+
+
+def _refused(client, user):
+    """Tokens revoked by rotation, at logout and by another process are refused"""
+    results = {}
+    revocations.reset()
+    token = str(RefreshToken.for_user(user))
+    _refresh(client, token)
+    results['replayed'] = _refresh(client, token)[0].status_code
+
+    token = str(RefreshToken.for_user(user))
+    client.post(BLACKLIST_PATH, {'refresh': token}, content_type='application/json')
+    results['logged_out'] = _refresh(client, token)[0].status_code
+
+    for name, interval in (('other_process_synced', 0), ('other_process_stale', 3600)):
+        with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=interval):
+            revocations.reset()
+            _refresh(client, str(RefreshToken.for_user(user)))
+            token = RefreshToken.for_user(user)
+            # Inserted directly, as another process's revocation would be, unseen by this filter
+            RevokedToken.objects.create(jti=token['jti'], expires_at=timezone.now() + timedelta(days=1))
+            results[name] = _refresh(client, str(token))[0].status_code
+    results['passed'] = all(status == 401 for status in results.values())
+    return results
+
+
+def _false_positives(probes):
+    error_rate = settings.TOKEN_REVOCATION_FILTER_ERROR_RATE
+    bloom = BloomFilter(settings.TOKEN_REVOCATION_FILTER_CAPACITY, error_rate)
+    for _ in range(bloom.capacity):
+        bloom.add(uuid.uuid4().hex)
+    hits = sum(1 for _ in range(probes) if uuid.uuid4().hex in bloom)
+    return {
+        'capacity': bloom.capacity,
+        'bits': bloom.size,
+        'hashes': bloom.hashes,
+        'rate': hits / probes,
+        'passed': hits / probes <= 2 * error_rate,
+    }
+
+
+def _purge():
+    """Purging deletes tokens once expired, and a rebuilt filter no longer holds them"""
+    expiring = [f"{PREFIX}expiring-{i}" for i in range(100)]
+    RevokedToken.objects.bulk_create(
+        RevokedToken(jti=jti, expires_at=timezone.now() + timedelta(seconds=1)) for jti in expiring
+    )
+    revocations.reset()
+    revocations.sync()
+    before = sum(1 for jti in expiring if jti in revocations._bloom)
+    time.sleep(1.5)
+    purged = purge_revoked_tokens()
+    revocations.reset()
+    revocations.sync()
+    after = sum(1 for jti in expiring if jti in revocations._bloom)
+    remaining = RevokedToken.objects.filter(jti__in=expiring).count()
+    return {'purged': purged, 'in_filter_before': before, 'in_filter_after': after,
+            'passed': purged >= len(expiring) and not remaining and before == len(expiring) and not after}
+
+
+def run(options, stdout):
+    user = data.seed_users('client', 1)[0]
+    client = Client()
+    results = {}
+    started = timezone.now()
+    try:
+        stdout.write(f"Seeding {options['revoked']} revoked tokens...")
+        expires_at = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            (RevokedToken(jti=f"{PREFIX}{uuid.uuid4().hex}", expires_at=expires_at) for _ in range(options['revoked'])),
+            batch_size=5000,
+        )
+
+        stdout.write('Checking the table on every refresh...')
+        results['table'], replayed_table = _chain(client, user, options['refreshes'], filtered=False)
+        stdout.write('Checking the Bloom filter first...')
+        results['filter'], replayed_filter = _chain(client, user, options['refreshes'], filtered=True)
+        results['refused'] = _refused(client, user)
+        results['replayed_chain_start'] = [_refresh(client, token)[0].status_code
+                                           for token in (replayed_table, replayed_filter)]
+        results['false_positives'] = _false_positives(options['probes'])
+        results['purge'] = _purge()
+    finally:
+        revocations.reset()
+        # The seeded tokens and the ones the run revoked
+        RevokedToken.objects.filter(Q(jti__startswith=PREFIX) | Q(revoked_at__gte=started)).delete()
+        User.objects.filter(pk=user.pk).delete()
+
+    results['passed'] = (
+        not results['table']['errors'] and not results['filter']['errors']
+        and results['filter']['queries_per_refresh'] < results['table']['queries_per_refresh']
+        and results['refused']['passed']
+        and results['replayed_chain_start'] == [401, 401]
+        and results['false_positives']['passed']
+        and results['purge']['passed']
+    )
+    return results
@@ -0,0 +1,86 @@
+"""
+Lawyer routing simulation.
+
+Seeds ``--lawyers`` lawyers with round-robin specializations and
+``--requests`` pending case requests (a share of them asking for a lawyer
+type nobody has), routes them all in batches and reports throughput, how
+evenly the load ended up spread, and the latency of a lawyer's first inbox
+page against the old shared pending pool. Everything runs in a rolled-back
+transaction.
+"""
+import random
+import statistics
+import time
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile, rolled_back
+from core.models import CaseRequest, UserProfile
+from core.routing import recompute_loads, route_unassigned
+
+
+def add_arguments(parser):
+    parser.add_argument('--lawyers', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--unmatched-types', type=int, default=1,
+                        help='Requested lawyer types no lawyer specializes in')
+    parser.add_argument('--samples', type=int, default=200, help='Inbox queries to time')
+
+
+def _page_latencies(querysets, page_size=20):
+    """Time COUNT plus the first page, as a paginated list view does"""
+    latencies = []
+    for queryset in querysets:
+        started = time.perf_counter()
+        queryset.count()
+        list(queryset[:page_size])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def run(options, stdout):
+    results = {'lawyers': options['lawyers'], 'requests': options['requests']}
+    specializations = data.CASE_TYPES
+    requested_types = specializations + [f"Unmatched {i}" for i in range(options['unmatched_types'])]
+
+    with rolled_back():
+        clients = data.seed_users('client', 100)
+        lawyers = data.seed_users('lawyer', options['lawyers'])
+        data.assign_specializations(lawyers, specializations)
+        data.seed_case_requests(clients, options['requests'], lawyer_types=requested_types)
+
+        started = time.perf_counter()
+        routed = route_unassigned(options['batch_size'])
+        elapsed = time.perf_counter() - started
+        results.update({
+            'routed': routed,
+            'routing_seconds': round(elapsed, 3),
+            'routed_per_second': round(routed / elapsed) if elapsed else None,
+        })
+
+        loads = list(UserProfile.objects.filter(user__in=lawyers).values_list('open_case_load', flat=True))
+        results.update({
+            'load_min': min(loads),
+            'load_max': max(loads),
+            'load_mean': round(statistics.mean(loads), 1),
+            'load_stdev': round(statistics.pstdev(loads), 2),
+            'loads_consistent': recompute_loads(lawyers) == 0,
+        })
+
+        sample = random.sample(lawyers, min(options['samples'], len(lawyers)))
+        inbox = _page_latencies(
+            CaseRequest.objects.filter(status='pending', assigned_lawyer=lawyer).order_by('-created_at')
+            for lawyer in sample
+        )
+        pool = _page_latencies(
+            CaseRequest.objects.filter(status='pending').order_by('-created_at') for _ in sample
+        )
+        results.update({
+            'inbox_p50_ms': round(percentile(inbox, 50) * 1000, 2),
+            'inbox_p99_ms': round(percentile(inbox, 99) * 1000, 2),
+            'shared_pool_p50_ms': round(percentile(pool, 50) * 1000, 2),
+            'shared_pool_p99_ms': round(percentile(pool, 99) * 1000, 2),
+        })
+
+    return results
@@ -0,0 +1,89 @@
+"""
+Case search: full-text index against substring scans.
+
+Seeds ``--rows`` case requests whose titles and descriptions are drawn from
+a Zipf-like vocabulary, then times searches for random one- and two-word
+queries (COUNT plus the first page, as the list views run them) through
+``search_queryset`` and through the ``icontains`` filter SearchFilter used
+to build. Everything runs in a rolled-back transaction.
+"""
+import random
+import string
+import time
+
+from django.db import connection
+from django.db.models import Q
+
+from core.benchmarks import data
+from core.benchmarks.routing import _page_latencies
+from core.benchmarks.utils import percentile, rolled_back
+from core.models import CaseRequest
+from core.search import search_queryset
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vocabulary', type=int, default=20_000, help='Distinct words in the seeded text')
+    parser.add_argument('--samples', type=int, default=100, help='Queries to time per strategy')
+    parser.add_argument('--skip-scan', action='store_true', help='Only time the full-text index')
+
+
+def _vocabulary(size):
+    words = {''.join(random.choices(string.ascii_lowercase, k=random.randint(4, 10))) for _ in range(size * 2)}
+    return sorted(words)[:size]
+
+
+def _icontains(terms):
+    queryset = CaseRequest.objects.all()
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+    return queryset.order_by('-created_at')
+
+
+def _full_text(terms):
+    return search_queryset(CaseRequest.objects.all(), terms).order_by('-search_rank', '-created_at')
+
+
+def run(options, stdout):
+    if search_queryset(CaseRequest.objects.none(), ['x']) is None:
+        return {'passed': False, 'error': f"No full-text index on {connection.vendor}"}
+
+    results = {'rows': options['rows'], 'vendor': connection.vendor}
+    vocabulary = _vocabulary(options['vocabulary'])
+    # Word frequency falls off with rank, like natural text
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    seeded = random.choices(vocabulary, weights=weights, k=options['rows'] * 10)
+
+    with rolled_back():
+        clients = data.seed_users('client', 100)
+        started = time.perf_counter()
+        data.seed_case_requests(clients, options['rows'], vocabulary=seeded)
+        results['seed_and_index_seconds'] = round(time.perf_counter() - started, 1)
+
+        queries = [
+            random.sample(vocabulary[:2000], random.randint(1, 2))
+            for _ in range(options['samples'])
+        ]
+        strategies = {'full_text': _full_text}
+        if not options['skip_scan']:
+            strategies['icontains'] = _icontains
+        for name, build in strategies.items():
+            stdout.write(f"{name}...")
+            latencies = _page_latencies(build(terms) for terms in queries)
+            results.update({
+                f"{name}_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                f"{name}_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            })
+
+        # The index must stay in step with writes
+        case_request = CaseRequest.objects.order_by('id').first()
+        case_request_id = case_request.id
+        case_request.title = 'zzbenchmarkmarker'
+        case_request.save()
+        found = list(search_queryset(CaseRequest.objects.all(), ['zzbenchmarkmarker']).values_list('id', flat=True))
+        case_request.delete()
+        gone = not search_queryset(CaseRequest.objects.all(), ['zzbenchmarkmarker']).exists()
+        results['index_consistent'] = found == [case_request_id] and gone
+        results['passed'] = results['index_consistent']
+
+    return results
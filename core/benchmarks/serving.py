@@ -0,0 +1,141 @@
+"""
+Concurrency and tail latency of running deployments (ASGI vs WSGI).
+
+Seeds a client with cases and a payment, then drives each ``--target``
+with ``--concurrency`` simultaneous requests per endpoint and reports
+throughput and p50/p99 latency. The seeded rows are committed so the
+servers can see them, and deleted afterwards.
+
+Start the deployments against the same database first, pointing the
+payment provider at the stub this benchmark serves, e.g.::
+
+    STRIPE_API_BASE=http://127.0.0.1:12111 uvicorn lawsuitapp.asgi:application --port 8000
+    STRIPE_API_BASE=http://127.0.0.1:12111 gunicorn lawsuitapp.wsgi --threads 16 --bind :8001
+    python manage.py benchmark serving --stub-provider-port 12111 \\
+        --target asgi=http://127.0.0.1:8000 --target wsgi=http://127.0.0.1:8001
+"""
+import asyncio
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile
+from core.models import Case, Payment
+
+ENDPOINTS = {
+    'profile': ('GET', '/api/v1/profile/'),
+    'cases': ('GET', '/api/v1/cases/'),
+    'payment-intent': ('POST', '/api/v1/payments/{payment}/create_payment_intent/'),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='Deployment to load, e.g. asgi=http://127.0.0.1:8000 (repeatable)')
+    parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                        help='Endpoint to load (repeatable, default all)')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and target')
+    parser.add_argument('--stub-provider-port', type=int, default=None,
+                        help='Serve a stub payment provider on this port while the benchmark runs')
+    parser.add_argument('--provider-latency-ms', type=int, default=200)
+
+
+def _stub_provider(port, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            time.sleep(latency)
+            body = json.dumps({'id': 'pi_benchmark', 'client_secret': 'pi_benchmark_secret', 'status': 'succeeded'})
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        do_GET = do_POST = _respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _load(base_url, method, path, token, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={'Authorization': f"Bearer {token}"}, limits=limits, timeout=60
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests_per_second': round(total / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'errors': errors,
+    }
+
+
+def _seed():
+    client = data.seed_users('client', 1)[0]
+    lawyer = data.seed_users('lawyer', 1)[0]
+    data.seed_cases([client], [lawyer], 20)
+    case = Case.objects.filter(client=client).order_by('id').first()
+    payment = Payment.objects.create(case=case, amount=Decimal('500.00'))
+    return client, lawyer, payment
+
+
+def run(options, stdout):
+    targets = dict(target.split('=', 1) for target in options['target'])
+    endpoints = options['endpoint'] or sorted(ENDPOINTS)
+    provider = None
+    if options['stub_provider_port']:
+        provider = _stub_provider(options['stub_provider_port'], options['provider_latency_ms'] / 1000)
+
+    client, lawyer, payment = _seed()
+    token = str(AccessToken.for_user(client))
+    results = {'concurrency': options['concurrency'], 'requests': options['requests']}
+    try:
+        for name, base_url in targets.items():
+            for endpoint in endpoints:
+                method, path = ENDPOINTS[endpoint]
+                stdout.write(f"{name} {endpoint}...")
+                results[f"{name}:{endpoint}"] = asyncio.run(_load(
+                    base_url, method, path.format(payment=payment.pk), token,
+                    options['concurrency'], options['requests'],
+                ))
+    finally:
+        User.objects.filter(pk__in=[client.pk, lawyer.pk]).delete()
+        if provider is not None:
+            provider.shutdown()
+    return results
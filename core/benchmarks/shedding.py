@@ -0,0 +1,175 @@
+"""
+Load shedding of a slow route class under overload (simulated).
+
+Drives ``LoadSheddingMiddleware`` around a stand-in view with a fixed pool
+of ``--threads`` worker threads, like a threaded WSGI worker, at an open
+arrival rate. List requests model a saturated database: each takes
+``--slow-ms`` while at most ``--capacity`` run at once and proportionally
+longer beyond that. Token requests take a few milliseconds. Arrivals are
+offered faster than the list requests can be served.
+
+Runs once with shedding disabled, where list requests pile up in the
+pool's queue and token requests wait behind them, and once with the
+configured ``LOAD_SHEDDING_CLASSES``. Latency is from arrival, so it
+includes waiting for a thread. Passes when, with shedding, token requests
+are never shed and their p99 stays under ``--max-token-p99-ms``, served
+list requests stay within twice their class's target latency instead of
+queueing, and the same middleware holds its limits in an async stack and
+frees a streamed response's slot only once it is sent.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+
+from core.benchmarks.utils import percentile
+from core.shedding import LoadSheddingMiddleware, limiters
+
+LIST_PATH = '/api/v1/case-requests/'
+TOKEN_PATH = '/api/v1/auth/token/'
+EXPORT_PATH = '/api/v1/cases/export/'
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, default=16, help='Worker threads, as in gunicorn --threads')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Length of the arrival schedule')
+    parser.add_argument('--list-rate', type=float, default=40.0, help='List requests per second')
+    parser.add_argument('--token-rate', type=float, default=20.0, help='Token requests per second')
+    parser.add_argument('--slow-ms', type=float, default=200.0)
+    parser.add_argument('--capacity', type=int, default=4, help='List requests the database serves at full speed')
+    parser.add_argument('--max-token-p99-ms', type=float, default=250.0)
+
+
+class SlowDatabase:
+    """Stand-in view: list requests slow down past ``capacity`` concurrent ones"""
+
+    def __init__(self, slow, capacity):
+        self.slow = slow
+        self.capacity = capacity
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.path != LIST_PATH:
+            time.sleep(0.005)
+            return HttpResponse(status=200)
+        with self._lock:
+            self.active += 1
+            active = self.active
+        try:
+            time.sleep(self.slow * max(1.0, active / self.capacity))
+        finally:
+            with self._lock:
+                self.active -= 1
+        return HttpResponse(status=200)
+
+
+def _schedule(options):
+    """(offset in seconds, path) of every arrival, in order"""
+    arrivals = []
+    for path, rate in ((LIST_PATH, options['list_rate']), (TOKEN_PATH, options['token_rate'])):
+        count = int(rate * options['seconds'])
+        arrivals.extend((i / rate, path) for i in range(count))
+    return sorted(arrivals)
+
+
+def _drive(options, enabled):
+    limiters.reset()
+    middleware = LoadSheddingMiddleware(SlowDatabase(options['slow_ms'] / 1000, options['capacity']))
+    factory = RequestFactory()
+    outcomes = {LIST_PATH: [], TOKEN_PATH: []}
+    lock = threading.Lock()
+
+    def handle(path, arrived):
+        response = middleware(factory.get(path))
+        with lock:
+            outcomes[path].append((time.perf_counter() - arrived, response.status_code))
+
+    with override_settings(LOAD_SHEDDING_ENABLED=enabled), ThreadPoolExecutor(options['threads']) as pool:
+        started = time.perf_counter()
+        for offset, path in _schedule(options):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(handle, path, time.perf_counter())
+
+    results = {}
+    for name, path in (('list', LIST_PATH), ('token', TOKEN_PATH)):
+        served = sorted(seconds for seconds, status in outcomes[path] if status == 200)
+        results[name] = {
+            'requests': len(outcomes[path]),
+            'shed': sum(1 for _, status in outcomes[path] if status == 503),
+            'p50_ms': round(percentile(served, 50) * 1000, 1),
+            'p99_ms': round(percentile(served, 99) * 1000, 1),
+        }
+    results['limits'] = {limiter.name: round(limiter.limit, 2) for limiter in limiters.all if limiter.max_limit}
+    return results
+
+
+def _async_check():
+    """Concurrent list requests through an async stack never exceed the limit, and all release"""
+    limiters.reset()
+    limiter = next(limiter for limiter in limiters.all if limiter.name == 'list')
+    peak = 0
+
+    async def view(request):
+        nonlocal peak
+        peak = max(peak, limiter.in_flight)
+        await asyncio.sleep(0.05)
+        return HttpResponse(status=200)
+
+    async def burst():
+        middleware = LoadSheddingMiddleware(view)
+        factory = RequestFactory()
+        return await asyncio.gather(*(middleware(factory.get(LIST_PATH)) for _ in range(limiter.max_limit * 2)))
+
+    ceiling = int(limiter.limit)
+    responses = asyncio.run(burst())
+    shed = [response for response in responses if response.status_code == 503]
+    return {
+        'peak_in_flight': peak,
+        'limit': ceiling,
+        'shed': len(shed),
+        'passed': peak <= ceiling and len(shed) == len(responses) - ceiling and limiter.in_flight == 0
+                  and all(response['Retry-After'] for response in shed),
+    }
+
+
+def _streaming_check():
+    """A streamed export holds its slot until its body has been sent"""
+    limiters.reset()
+    limiter = next(limiter for limiter in limiters.all if limiter.name == 'export')
+    middleware = LoadSheddingMiddleware(lambda request: StreamingHttpResponse(iter([b'a', b'b'])))
+    response = middleware(RequestFactory().get(EXPORT_PATH))
+    held = limiter.in_flight
+    b''.join(response)
+    response.close()
+    return {'held_while_streaming': held, 'passed': held == 1 and limiter.in_flight == 0}
+
+
+def run(options, stdout):
+    results = {}
+    try:
+        stdout.write('Without load shedding...')
+        results['disabled'] = _drive(options, enabled=False)
+        stdout.write('With load shedding...')
+        results['enabled'] = _drive(options, enabled=True)
+        results['async'] = _async_check()
+        results['streaming'] = _streaming_check()
+    finally:
+        limiters.reset()
+
+    enabled = results['enabled']
+    target = next(spec for spec in settings.LOAD_SHEDDING_CLASSES if spec['name'] == 'list')['target_latency']
+    results['passed'] = (
+        enabled['token']['shed'] == 0
+        and enabled['token']['p99_ms'] <= options['max_token_p99_ms']
+        and enabled['list']['p99_ms'] <= 2000 * target
+        and results['async']['passed']
+        and results['streaming']['passed']
+    )
+    return results
@@ -0,0 +1,153 @@
+"""
+Request coalescing of identical concurrent reads.
+
+Seeds two lawyers with the same number of pending requests routed to them
+and fires ``--concurrency`` identical inbox requests at once, from as many
+threads, through both the filtered (sync viewset) and the plain (async
+view) list, with load shedding off. Each round runs with single-flight off
+and on and reports the SQL statements executed (from ``Server-Timing``),
+the latency, and the requests that were coalesced.
+
+Passes when coalescing cut the statements run, every response matched the
+uncoalesced one, the second lawyer's concurrent inbox was never handed the
+first's, and two leaders racing for the same key through a shared cache
+(as two processes would) computed it once. The seeded rows are committed,
+so the async views' connections see them, and deleted afterwards.
+"""
+import re
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client, override_settings
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.benchmarks import data
+from core.benchmarks.utils import percentile
+from core.models import CaseRequest
+from core.singleflight import _lead, flights
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+PATHS = {
+    'filtered': '/api/v1/case-requests/?ordering=-amount_involved',
+    'async': '/api/v1/case-requests/',
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--pending', type=int, default=2000, help='Pending requests in each lawyer inbox')
+
+
+def _burst(tokens, path):
+    """Send one request per token at the same moment; returns [(token, seconds, status, queries, body)]"""
+    barrier = threading.Barrier(len(tokens))
+    results = []
+    lock = threading.Lock()
+
+    def send(token):
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        try:
+            barrier.wait()
+            started = time.perf_counter()
+            response = client.get(path)
+            seconds = time.perf_counter() - started
+            queries = QUERIES.search(response.get('Server-Timing', ''))
+            with lock:
+                results.append((token, seconds, response.status_code,
+                                int(queries.group(1)) if queries else 0, response.content))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=send, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _round(tokens, path, enabled):
+    flights.reset()
+    # The burst is far over the list class's concurrency limit, which would shed most of it
+    with override_settings(SINGLE_FLIGHT_ENABLED=enabled, LOAD_SHEDDING_ENABLED=False):
+        results = _burst(tokens, path)
+    latencies = sorted(seconds for _, seconds, _, _, _ in results)
+    return results, {
+        'queries': sum(queries for _, _, _, queries, _ in results),
+        'errors': sum(1 for _, _, status, _, _ in results if status != 200),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'coalesced': sum(value for (_, outcome), value in flights.outcomes.items() if outcome == 'coalesced'),
+    }
+
+
+def _cross_process_check():
+    """Two leaders sharing a cache lock: one computes, the other receives its result"""
+    computed = []
+    outcomes = []
+    barrier = threading.Barrier(2)
+
+    def compute():
+        computed.append(1)
+        time.sleep(0.2)
+        return Response({'answer': 42})
+
+    def lead():
+        barrier.wait()
+        response, outcome = _lead('benchmark-cross-process', compute)
+        outcomes.append((outcome, response.data))
+
+    with override_settings(SINGLE_FLIGHT_CACHE='default'):
+        threads = [threading.Thread(target=lead) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {
+        'computed': len(computed),
+        'outcomes': sorted(outcome for outcome, _ in outcomes),
+        'passed': len(computed) == 1 and sorted(outcome for outcome, _ in outcomes) == ['leader', 'remote']
+                  and all(result == {'answer': 42} for _, result in outcomes),
+    }
+
+
+def run(options, stdout):
+    client = data.seed_users('client', 1)[0]
+    lawyers = data.seed_users('lawyer', 2)
+    results = {'concurrency': options['concurrency']}
+    try:
+        data.seed_case_requests([client], options['pending'] * 2)
+        pending = list(CaseRequest.objects.filter(client=client).order_by('id').values_list('id', flat=True))
+        for lawyer, ids in zip(lawyers, (pending[::2], pending[1::2])):
+            CaseRequest.objects.filter(id__in=ids).update(assigned_lawyer=lawyer)
+        first, second = (str(AccessToken.for_user(lawyer)) for lawyer in lawyers)
+
+        checks = []
+        for name, path in PATHS.items():
+            stdout.write(f"{name} inbox...")
+            baseline, results[f"{name}:off"] = _round([first] * options['concurrency'], path, enabled=False)
+            coalesced, results[f"{name}:on"] = _round([first] * options['concurrency'], path, enabled=True)
+            expected = baseline[0][4]
+            checks.append(results[f"{name}:on"]['queries'] < results[f"{name}:off"]['queries'])
+            checks.append(all(body == expected for _, _, _, _, body in baseline + coalesced))
+            checks.append(not results[f"{name}:off"]['errors'] and not results[f"{name}:on"]['errors'])
+
+            # Half the burst from another lawyer: identical paths, different scopes
+            mixed, _ = _round([first, second] * (options['concurrency'] // 2), path, enabled=True)
+            results[f"{name}:isolated"] = all(
+                (body == expected) == (token == first) for token, _, _, _, body in mixed
+            )
+            checks.append(results[f"{name}:isolated"])
+
+        results['cross_process'] = _cross_process_check()
+        checks.append(results['cross_process']['passed'])
+    finally:
+        flights.reset()
+        CaseRequest.objects.filter(client=client).delete()
+        User.objects.filter(pk__in=[client.pk, *(lawyer.pk for lawyer in lawyers)]).delete()
+
+    results['passed'] = all(checks)
+    return results
@@ -0,0 +1,91 @@
+"""
+Idle server-sent event stream benchmark.
+
+Opens ``--connections`` event streams against an in-process hub, each
+driven by its own task exactly as the ASGI server would drive the response
+iterator, and reports the memory held per idle connection. One event is
+then published to every stream to time the fan-out. No sockets or database
+rows are involved, so the numbers cover the hub and stream state only.
+"""
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from core.benchmarks.utils import current_rss_mb, percentile
+from core.events import InProcessHub, event_stream
+
+
+def add_arguments(parser):
+    parser.add_argument('--connections', type=int, default=10_000)
+    parser.add_argument('--heartbeat', type=int, default=15, help='Seconds between heartbeats')
+    parser.add_argument('--max-kb-per-connection', type=float, default=None,
+                        help='Fail if idle connections hold more than this much traced memory each')
+
+
+async def _consume(stream, ready, received, latencies):
+    async for frame in stream:
+        if frame.startswith('retry:'):
+            ready.release()
+        elif frame.startswith('id:'):
+            latencies.append(time.perf_counter() - received['published_at'])
+            if len(latencies) == received['expected']:
+                received['done'].set()
+
+
+async def _run(connections, heartbeat):
+    hub = InProcessHub()
+    ready = asyncio.Semaphore(0)
+    latencies = []
+    received = {'expected': connections, 'done': asyncio.Event(), 'published_at': 0.0}
+
+    gc.collect()
+    rss_before = current_rss_mb()
+    tracemalloc.start()
+    traced_before = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_consume(event_stream(user_id, hub=hub, heartbeat=heartbeat), ready, received, latencies))
+        for user_id in range(1, connections + 1)
+    ]
+    for _ in range(connections):
+        await ready.acquire()
+    open_seconds = time.perf_counter() - started
+
+    gc.collect()
+    traced_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss_after = current_rss_mb()
+
+    payload = {'id': 1, 'event': 'case_request.approved', 'data': '{}'}
+    received['published_at'] = time.perf_counter()
+    for user_id in range(1, connections + 1):
+        hub.publish(user_id, payload)
+    await received['done'].wait()
+    fanout_seconds = time.perf_counter() - received['published_at']
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        'connections': connections,
+        'open_seconds': round(open_seconds, 3),
+        'rss_delta_mb': round(rss_after - rss_before, 1),
+        'rss_kb_per_connection': round((rss_after - rss_before) * 1024 / connections, 2),
+        'traced_kb_per_connection': round((traced_after - traced_before) / 1024 / connections, 2),
+        'fanout_seconds': round(fanout_seconds, 3),
+        'delivery_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'delivery_p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'open_after_close': hub.connection_count(),
+    }
+
+
+def run(options, stdout):
+    results = asyncio.run(_run(options['connections'], options['heartbeat']))
+    limit = options['max_kb_per_connection']
+    if limit is not None:
+        results['passed'] = results['traced_kb_per_connection'] <= limit
+    return results
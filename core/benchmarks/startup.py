@@ -0,0 +1,45 @@
+"""
+Cold start of ``manage.py check``, a WSGI worker and a Celery worker.
+
+Starts each target ``--runs`` times in a fresh interpreter and reports the
+median and best wall time, plus one ``-X importtime`` run's module count.
+A target fails when its median exceeds its ``--max-<target>-ms`` budget or
+when it imports any of the modules deferred to first use
+(``core.startup.DEFERRED_MODULES``), which catches a stray top-level
+import on any machine regardless of its speed.
+"""
+import statistics
+
+from core.startup import DEFERRED_MODULES, TARGETS, parse_importtime, run_target
+
+BUDGETS_MS = {'check': 1500, 'wsgi': 1500, 'celery': 1000}
+
+
+def add_arguments(parser):
+    parser.add_argument('--runs', type=int, default=5)
+    for target, budget in BUDGETS_MS.items():
+        parser.add_argument(f'--max-{target}-ms', type=float, default=budget)
+
+
+def run(options, stdout):
+    results = {'runs': options['runs']}
+    failures = []
+    for target in TARGETS:
+        timings = sorted(run_target(target)[0] * 1000 for _ in range(options['runs']))
+        records = parse_importtime(run_target(target, importtime=True)[1])
+        imported = {record.module for record in records}
+        deferred = [module for module in DEFERRED_MODULES if module in imported]
+        median = statistics.median(timings)
+        budget = options[f'max_{target}_ms']
+        results[target] = {
+            'median_ms': round(median, 1),
+            'best_ms': round(timings[0], 1),
+            'budget_ms': budget,
+            'modules': len(records),
+            'deferred_modules_imported': deferred,
+        }
+        if median > budget or deferred:
+            failures.append(target)
+    results['failures'] = failures
+    results['passed'] = not failures
+    return results
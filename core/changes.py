@@ -0,0 +1,126 @@
+"""
+Per-user change feed for incremental client sync.
+
+Every mutation that a client or lawyer should learn about appends one
+``ChangeEvent`` per recipient with a compact delta of the changed fields.
+Clients poll ``/changes/?after=<seq>`` and apply the deltas in order.
+Old events are merged per object (compaction) and eventually purged.
+"""
+import contextlib
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.events import publish_events
+from core.models import ChangeEvent
+
+CASE_REQUEST_DELTA_FIELDS = ['status', 'title', 'case_type', 'amount_involved', 'requested_lawyer_type']
+
+_suppressed = ContextVar('change_events_suppressed', default=False)
+
+
+@contextlib.contextmanager
+def suppressed():
+    """Record no events inside the block, e.g. while archiving rows"""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def record_changes(kind, entries):
+    """
+    Append events of one kind.
+
+    ``entries`` is an iterable of (object id, recipient user ids, delta)
+    tuples; recipients that are None are skipped.
+    """
+    if _suppressed.get():
+        return []
+    object_type = kind.split('.')[0]
+    events = [
+        ChangeEvent(user_id=user_id, kind=kind, object_type=object_type, object_id=object_id, data=data)
+        for object_id, user_ids, data in entries
+        for user_id in {user_id for user_id in user_ids if user_id}
+    ]
+    if events:
+        ChangeEvent.objects.bulk_create(events)
+        # Live streams only ever see committed events
+        transaction.on_commit(lambda: publish_events(events))
+    return events
+
+
+def record_change(kind, object_id, user_ids, data=None):
+    return record_changes(kind, [(object_id, user_ids, data or {})])
+
+
+def case_request_delta(case_request, fields=None):
+    fields = fields or CASE_REQUEST_DELTA_FIELDS
+    return {field: getattr(case_request, field) for field in fields}
+
+
+def note_delta(note):
+    return {
+        'case': note.case_id,
+        'author': note.author_id,
+        'content': note.content,
+        'created_at': note.created_at,
+    }
+
+
+def purge_events(retention_days=None, batch_size=10000):
+    """Delete events older than the retention window, returning the count deleted"""
+    days = settings.CHANGE_EVENT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        seqs = list(ChangeEvent.objects.filter(created_at__lt=cutoff).values_list('seq', flat=True)[:batch_size])
+        if not seqs:
+            return deleted
+        deleted += ChangeEvent.objects.filter(seq__in=seqs).delete()[0]
+
+
+def compact_events(older_than_hours=None):
+    """
+    Merge each object's old events for a user into its latest event.
+
+    Deltas are applied oldest first so the surviving event carries the
+    combined change; a trailing delete event replaces everything before it.
+    Returns the number of events removed.
+    """
+    hours = settings.CHANGE_EVENT_COMPACT_AFTER_HOURS if older_than_hours is None else older_than_hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    old_events = ChangeEvent.objects.filter(created_at__lt=cutoff)
+    groups = (
+        old_events.values('user_id', 'object_type', 'object_id')
+        .annotate(events=Count('seq'))
+        .filter(events__gt=1)
+        .order_by()
+    )
+
+    removed = 0
+    for group in groups.iterator():
+        events = list(old_events.filter(
+            user_id=group['user_id'], object_type=group['object_type'], object_id=group['object_id']
+        ).order_by('seq'))
+        latest = events[-1]
+        if not latest.kind.endswith('.deleted'):
+            merged = {}
+            for event in events:
+                merged.update(event.data)
+            latest.data = merged
+        with transaction.atomic():
+            latest.save(update_fields=['data'])
+            removed += ChangeEvent.objects.filter(seq__in=[event.seq for event in events[:-1]]).delete()[0]
+    return removed
+
+
+def resync_required(after):
+    """True if events after ``after`` may already have been purged"""
+    oldest = ChangeEvent.objects.order_by('seq').values_list('seq', flat=True).first()
+    return after > 0 and oldest is not None and after < oldest - 1
@@ -0,0 +1,27 @@
+"""
+System checks for the deployment settings the code relies on.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries only the process that set them can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Read-your-writes pins (core.replicas) live in the default cache, so every process must see it"""
+    if not settings.DATABASE_REPLICAS:
+        return []
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Error(
+            "DATABASE_REPLICAS is set but the default cache is local to each process, so a user's "
+            "writes only pin their reads to the primary in the process that served the write.",
+            hint="Set CACHE_URL to a shared cache (redis://...), or silence core.E001 if a single process "
+                 "serves every request.",
+            id='core.E001',
+        )]
+    return []
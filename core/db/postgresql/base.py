@@ -0,0 +1,92 @@
+"""
+PostgreSQL backend whose connections come from a psycopg_pool pool.
+
+Enabled with ``OPTIONS['pool']`` (``True`` or ``ConnectionPool`` keyword
+arguments such as ``min_size``, ``max_size`` and ``timeout``). Closing a
+Django connection returns it to the pool rather than disconnecting, so
+threads that are created per request, as under ASGI where each request's
+sync code runs on its own thread, reuse warm connections and the process
+never holds more than ``max_size``. Pooled connections are checked before
+being handed out. ``CONN_MAX_AGE`` must be 0: the pool does the persisting.
+
+Without ``OPTIONS['pool']`` this is the stock backend.
+"""
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg import IsolationLevel
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # One pool per process and database, shared by every thread's wrapper
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured("Pooled connections require CONN_MAX_AGE = 0")
+        return {} if options is True else dict(options)
+
+    @property
+    def pool(self):
+        pool_options = self.pool_options
+        if pool_options is None:
+            return None
+        # Keyed by pid too: a pool inherited through fork has no maintenance threads
+        key = (os.getpid(), self.alias, self.settings_dict['NAME'])
+        with self._pools_lock:
+            if key not in self._pools:
+                from psycopg_pool import ConnectionPool
+
+                self._pools[key] = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    check=ConnectionPool.check_connection,
+                    name=f"{self.alias}-{os.getpid()}",
+                    open=True,
+                    **pool_options,
+                )
+            return self._pools[key]
+
+    def close_pool(self):
+        """Close this process's pool for the database, e.g. when tearing down"""
+        key = (os.getpid(), self.alias, self.settings_dict['NAME'])
+        with self._pools_lock:
+            pool = self._pools.pop(key, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} specified. "
+                f"Use one of the psycopg.IsolationLevel values."
+            )
+        connection = pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        self._pool_pid = os.getpid()
+        return connection
+
+    def _close(self):
+        if self.connection is not None and getattr(self, '_pool_pid', None) == os.getpid():
+            with self.wrap_database_errors:
+                # The pool rolls back anything left open before reusing it
+                return self.pool.putconn(self.connection)
+        return super()._close()
@@ -0,0 +1,85 @@
+"""
+Lawyer directory filters and facet counts.
+
+Directory filters map onto the (role, state, city, id), (role, zipcode) and
+(role, specialization, ...) profile indexes. Zipcode prefixes are rewritten
+as a range so they can use the index whatever the database collation.
+
+Facet counts by state and city are kept in ``LawyerLocationCount``, adjusted
+by profile signals as lawyers join, move or leave, and cached, so reading
+them never runs a GROUP BY over profiles. Bulk updates bypass the signals;
+``rebuild_location_counts`` recounts from scratch.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from core.models import LawyerLocationCount, UserProfile
+
+FACETS_CACHE_KEY = 'lawyer-directory-facets'
+
+
+def prefix_range(prefix):
+    """(lower, upper) bounds such that lower <= value < upper iff value starts with prefix"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def location_key(profile):
+    """The (state, city) facet a profile counts towards, or None if it is not a lawyer"""
+    if profile.role != 'lawyer':
+        return None
+    return profile.state or '', profile.city or ''
+
+
+def adjust_location_counts(deltas):
+    """Apply a {(state, city): change} mapping to the facet counts"""
+    changed = False
+    for (state, city), delta in deltas.items():
+        if not delta:
+            continue
+        LawyerLocationCount.objects.get_or_create(state=state, city=city)
+        LawyerLocationCount.objects.filter(state=state, city=city).update(count=F('count') + delta)
+        changed = True
+    if changed:
+        transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY))
+
+
+def rebuild_location_counts():
+    """Recount the facets from the profiles table, returning the number of locations"""
+    counts = Counter()
+    locations = (
+        UserProfile.objects.filter(role='lawyer', user__is_active=True)
+        .values('state', 'city').annotate(count=Count('id')).order_by()
+        .values_list('state', 'city', 'count')
+    )
+    for state, city, count in locations:
+        # NULL and blank both count as ''
+        counts[state or '', city or ''] += count
+    with transaction.atomic():
+        LawyerLocationCount.objects.all().delete()
+        LawyerLocationCount.objects.bulk_create([
+            LawyerLocationCount(state=state, city=city, count=count)
+            for (state, city), count in counts.items()
+        ])
+    cache.delete(FACETS_CACHE_KEY)
+    return len(counts)
+
+
+def facet_counts():
+    """Lawyer counts by state, each with its cities, largest first"""
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        states = {}
+        locations = LawyerLocationCount.objects.filter(count__gt=0).values_list('state', 'city', 'count')
+        for state, city, count in locations:
+            entry = states.setdefault(state, {'state': state, 'count': 0, 'cities': []})
+            entry['count'] += count
+            entry['cities'].append({'city': city, 'count': count})
+        for entry in states.values():
+            entry['cities'].sort(key=lambda city: (-city['count'], city['city']))
+        facets = {'states': sorted(states.values(), key=lambda state: (-state['count'], state['state']))}
+        cache.set(FACETS_CACHE_KEY, facets, settings.DIRECTORY_FACETS_CACHE_SECONDS)
+    return facets
@@ -0,0 +1,206 @@
+"""
+Live delivery of change-feed events over server-sent events (SSE).
+
+Committed ``ChangeEvent`` rows of the kinds in ``STREAMED_KINDS`` are
+published to a hub, which hands them to the open streams of the recipient.
+``InProcessHub`` only reaches streams served by the same process; with
+several ASGI workers or nodes use ``RedisHub`` so events published anywhere
+(including Celery workers) fan out through Redis pub/sub.
+
+Each stream has a bounded buffer. A stream that falls behind is closed and
+the client reconnects with ``Last-Event-ID``, replaying what it missed from
+the change feed instead of holding an unbounded backlog in memory.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from core.models import ChangeEvent
+
+STREAMED_KINDS = [
+    'case_request.assigned', 'case_request.approved', 'case_request.rejected', 'payment.completed', 'note.created'
+]
+
+
+def event_payload(event):
+    """Wire form of a ChangeEvent as published to the hub"""
+    return {
+        'id': event.seq,
+        'event': event.kind,
+        'data': json.dumps({
+            'seq': event.seq,
+            'kind': event.kind,
+            'object_type': event.object_type,
+            'object_id': event.object_id,
+            'data': event.data,
+            'created_at': event.created_at,
+        }, cls=DjangoJSONEncoder),
+    }
+
+
+def format_event(payload):
+    return f"id: {payload['id']}\nevent: {payload['event']}\ndata: {payload['data']}\n\n"
+
+
+class Subscription:
+    """One open stream's bounded buffer, bound to the event loop serving it"""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, payload):
+        # Runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class InProcessHub:
+    """Delivers events to the streams open in this process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, maxsize=None):
+        subscription = Subscription(user_id, maxsize or settings.SSE_BUFFER_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, payload):
+        """Publish an event to a user's streams; safe to call from any thread"""
+        self.deliver(user_id, payload)
+
+    def deliver(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.put, payload)
+
+
+class RedisHub(InProcessHub):
+    """
+    Fans events out through Redis pub/sub so every process receives them.
+
+    Each process runs one pattern subscription and delivers the messages to
+    its local streams, so Redis sees one connection per process rather than
+    one per stream.
+    """
+
+    def __init__(self, url=None, channel_prefix='changes:'):
+        super().__init__()
+        self.url = url or settings.EVENT_HUB_REDIS_URL
+        self.channel_prefix = channel_prefix
+        self._client = None
+        self._listener = None
+
+    def publish(self, user_id, payload):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(f"{self.channel_prefix}{user_id}", json.dumps(payload))
+
+    def subscribe(self, user_id, maxsize=None):
+        subscription = super().subscribe(user_id, maxsize)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        async with client.pubsub() as pubsub:
+            await pubsub.psubscribe(f"{self.channel_prefix}*")
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                user_id = int(message['channel'].decode()[len(self.channel_prefix):])
+                self.deliver(user_id, json.loads(message['data']))
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    return import_string(settings.EVENT_HUB_BACKEND)()
+
+
+def publish_events(events):
+    """Publish committed change events of the streamed kinds"""
+    hub = get_hub()
+    for event in events:
+        if event.kind in STREAMED_KINDS:
+            hub.publish(event.user_id, event_payload(event))
+
+
+def missed_events(user_id, after, limit):
+    events = ChangeEvent.objects.filter(user_id=user_id, seq__gt=after, kind__in=STREAMED_KINDS).order_by('seq')
+    return [event_payload(event) for event in events[:limit]]
+
+
+async def event_stream(user_id, last_event_id=None, hub=None, heartbeat=None, max_seconds=None):
+    """
+    Async iterator of SSE frames for one user.
+
+    The subscription is opened before replaying events after
+    ``last_event_id`` so nothing committed in between is lost; replayed and
+    live events are de-duplicated by sequence number.
+    """
+    hub = hub or get_hub()
+    heartbeat = heartbeat or settings.SSE_HEARTBEAT_SECONDS
+    max_seconds = max_seconds or settings.SSE_MAX_STREAM_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    subscription = hub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+
+        last_seq = last_event_id or 0
+        if last_event_id is not None:
+            while True:
+                replay = await sync_to_async(missed_events)(user_id, last_seq, settings.CHANGE_FEED_PAGE_SIZE)
+                for payload in replay:
+                    last_seq = payload['id']
+                    yield format_event(payload)
+                if len(replay) < settings.CHANGE_FEED_PAGE_SIZE:
+                    break
+
+        while not subscription.overflowed:
+            timeout = min(heartbeat, deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                payload = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if payload['id'] > last_seq:
+                last_seq = payload['id']
+                yield format_event(payload)
+    finally:
+        hub.unsubscribe(subscription)
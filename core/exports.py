@@ -0,0 +1,111 @@
+"""
+Streaming CSV / NDJSON exports for case requests, cases and rejected cases.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` so related
+usernames come from a single JOIN and memory stays constant regardless of
+how many rows are exported.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from core.models import CaseRequest, Case, RejectedCase
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# (column name, ORM lookup) pairs for each exportable model
+EXPORTS = {
+    'case-requests': (CaseRequest, [
+        ('id', 'id'),
+        ('client', 'client__username'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('case_type', 'case_type'),
+        ('status', 'status'),
+        ('documents', 'documents'),
+        ('amount_involved', 'amount_involved'),
+        ('requested_lawyer_type', 'requested_lawyer_type'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'cases': (Case, [
+        ('id', 'id'),
+        ('case_number', 'case_number'),
+        ('client', 'client__username'),
+        ('lawyer', 'lawyer__username'),
+        ('case_request', 'id'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('case_type', 'case_type'),
+        ('status', 'status'),
+        ('documents', 'documents'),
+        ('amount_involved', 'amount_involved'),
+        ('registration_fee', 'registration_fee'),
+        ('registration_fee_paid', 'registration_fee_paid'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'rejected-cases': (RejectedCase, [
+        ('id', 'id'),
+        ('client', 'client__username'),
+        ('case_request', 'id'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('case_type', 'case_type'),
+        ('rejection_reason', 'rejection_reason'),
+        ('rejected_by', 'rejected_by__username'),
+        ('rejected_at', 'rejected_at'),
+    ]),
+}
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, columns, chunk_size=None):
+    """Yield export rows as tuples, reading the queryset in chunks"""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    lookups = [lookup for _, lookup in columns]
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(queryset, columns, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in iter_rows(queryset, columns, chunk_size):
+        yield writer.writerow(row)
+
+
+def stream_ndjson(queryset, columns, chunk_size=None):
+    names = [name for name, _ in columns]
+    for row in iter_rows(queryset, columns, chunk_size):
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(queryset, columns, export_format, chunk_size=None):
+    """Return an iterator of encoded lines for the given format"""
+    if export_format == 'csv':
+        return stream_csv(queryset, columns, chunk_size)
+    elif export_format == 'ndjson':
+        return stream_ndjson(queryset, columns, chunk_size)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def export_response(queryset, name, export_format):
+    """Build a StreamingHttpResponse exporting the queryset"""
+    _, columns = EXPORTS[name]
+    response = StreamingHttpResponse(
+        stream_export(queryset, columns, export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+    return response
@@ -0,0 +1,64 @@
+"""
+FilterSets for the case and payment list endpoints.
+
+Ranges use django-filter's suffixes: ``amount_involved_min``/``_max`` and
+``<date field>_after``/``_before`` (the same ``_after`` parameter the
+archive reads honor). List filters take comma-separated values, e.g.
+``case_type=Civil,Family``.
+
+Every filter runs on a role-scoped queryset, so its index leads with the
+scoping column (see the CaseRequest Meta indexes). Time ranges and amounts
+get a (scope, column) index; low-cardinality filters (``case_type``,
+``registration_fee_paid``, ``status``) and payments ride on the scope's
+(scope, -created_at) index, which also serves the default ordering.
+``plan_checks`` in core.benchmarks.filters lists the index each filter is
+expected to use; the tests check the plans on SQLite and PostgreSQL, and
+``python manage.py benchmark filters`` at scale.
+"""
+from django_filters import rest_framework as filters
+
+from core.models import CaseRequest, Case, RejectedCase, Payment
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class CaseRequestFilter(filters.FilterSet):
+    case_type = CharInFilter()
+    amount_involved = filters.RangeFilter()
+    created_at = filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = CaseRequest
+        fields = ['status', 'case_type', 'amount_involved', 'created_at']
+
+
+class CaseFilter(CaseRequestFilter):
+    lawyer = NumberInFilter()
+
+    class Meta:
+        model = Case
+        # No status: every Case is approved
+        fields = ['case_type', 'amount_involved', 'created_at', 'lawyer', 'registration_fee_paid']
+
+
+class RejectedCaseFilter(CaseRequestFilter):
+    rejected_at = filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = RejectedCase
+        fields = ['case_type', 'amount_involved', 'created_at', 'rejected_at']
+
+
+class PaymentFilter(filters.FilterSet):
+    paid_at = filters.DateTimeFromToRangeFilter()
+    created_at = filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Payment
+        fields = ['status', 'paid_at', 'created_at']
@@ -0,0 +1,126 @@
+"""
+Bulk import of case requests from CSV or NDJSON files.
+
+Files are read line by line and processed in batches: each row is validated
+with ``CaseRequestSerializer`` rules, client usernames for the batch are
+resolved with one query and valid rows are inserted with ``bulk_create``.
+Invalid rows are reported individually without aborting the import.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.serializers import ValidationError, as_serializer_error
+
+from core.changes import record_changes, case_request_delta
+from core.models import CaseRequest
+from core.routing import route_case_requests
+from core.serializers import CaseRequestSerializer
+
+IMPORT_FORMATS = ['csv', 'ndjson']
+
+# Columns that are never taken from the file: intake always starts pending
+IGNORED_COLUMNS = ['id', 'status', 'documents', 'created_at', 'updated_at']
+
+
+def guess_format(filename):
+    return 'ndjson' if filename and filename.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_records(fileobj, import_format):
+    """Yield (row number, record) pairs from a binary or text file"""
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+
+    if import_format == 'csv':
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, record
+    elif import_format == 'ndjson':
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {'__error__': f"Invalid JSON: {e}"}
+            if not isinstance(record, dict):
+                record = {'__error__': 'Each line must be a JSON object'}
+            yield number, record
+    else:
+        raise ValueError(f"Unsupported import format: {import_format}")
+
+
+def _batches(records, batch_size):
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _import_batch(batch, client):
+    """Validate and insert one batch, returning (created count, errors)"""
+    errors = []
+    clients = {}
+    if client is None:
+        usernames = {record.get('client') for _, record in batch if record.get('client')}
+        clients = {
+            user.username: user
+            for user in User.objects.filter(username__in=usernames, profile__role='client')
+        }
+
+    # One serializer per batch: building its fields is far costlier than validating a row
+    serializer = CaseRequestSerializer()
+    objects = []
+    for number, record in batch:
+        if '__error__' in record:
+            errors.append({'row': number, 'errors': {'non_field_errors': [record['__error__']]}})
+            continue
+
+        owner = client
+        if owner is None:
+            owner = clients.get(record.get('client'))
+            if owner is None:
+                errors.append({'row': number, 'errors': {'client': ['Unknown client username']}})
+                continue
+
+        data = {key: value for key, value in record.items() if key not in IGNORED_COLUMNS and key != 'client'}
+        try:
+            validated_data = serializer.run_validation(data)
+        except ValidationError as e:
+            errors.append({'row': number, 'errors': as_serializer_error(e)})
+            continue
+        objects.append(CaseRequest(client=owner, **validated_data))
+
+    with transaction.atomic():
+        CaseRequest.objects.bulk_create(objects)
+        record_changes('case_request.created', [
+            (obj.pk, [obj.client_id], case_request_delta(obj)) for obj in objects
+        ])
+        route_case_requests(objects)
+    return len(objects), errors
+
+
+def import_case_requests(records, client=None, batch_size=None):
+    """
+    Import (row number, record) pairs produced by ``read_records``.
+
+    When ``client`` is given every row is filed for that user, otherwise
+    each record names its client by username in a ``client`` column.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    for batch in _batches(records, batch_size):
+        created, errors = _import_batch(batch, client)
+        result['created'] += created
+        result['failed'] += len(errors)
+        result['errors'].extend(errors)
+    return result
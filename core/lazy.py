@@ -0,0 +1,58 @@
+"""
+Deferred imports of heavy dependencies.
+
+Web workers, Celery workers and management commands import the whole
+URLconf and task graph at startup, but most of them never touch numpy,
+httpx or the schema generator. ``lazy_import`` returns a module that is
+only executed on first attribute access, and ``lazy_view`` a view whose
+module is only imported on the first request, so the cost moves to the
+code paths that use them. ``python manage.py import_profile`` shows what a
+cold start still imports.
+
+Celery workers load no more of DRF than its app config: they import
+core.tasks and core.signals, and through them core.metrics, none of which
+serve requests. Those modules import what builds on DRF or simplejwt
+(serializers, the search filter backend, token revocation) inside the
+tasks, handlers and views that use it rather than at module level, keeping
+it off the workers' import graph.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+
+from django.utils.module_loading import import_string
+
+_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """The module ``name``, executed on first attribute access"""
+    with _lock:
+        if name in sys.modules:
+            return sys.modules[name]
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ImportError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """``<dotted_path>.as_view(**initkwargs)``, imported on the first request"""
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    # Class-based DRF views are csrf-exempt, and the flag is read before the first call
+    dispatch.csrf_exempt = True
+    dispatch.__name__ = dotted_path.rsplit('.', 1)[-1]
+    return dispatch
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analytics import report
+from core.archive import parse_timestamp
+
+
+class Command(BaseCommand):
+    help = 'Print the finance report computed from the analytics snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only case requests created at or after this date/datetime')
+        parser.add_argument('--until', help='Only case requests created before this date/datetime')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                bounds[name] = parse_timestamp(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"--{name} must be a date or datetime")
+        results = report(**bounds)
+        if results is None:
+            raise CommandError('No analytics snapshot yet; run analytics_snapshot first')
+        self.stdout.write(json.dumps(results, indent=2))
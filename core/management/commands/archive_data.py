@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVES, archive_dataset
+
+
+class Command(BaseCommand):
+    help = 'Move old rejected cases and case notes into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datasets', nargs='*', choices=sorted(ARCHIVES), help='Defaults to all datasets')
+        parser.add_argument('--older-than-days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        for dataset in options['datasets'] or sorted(ARCHIVES):
+            started = time.perf_counter()
+            moved = archive_dataset(dataset, options['older_than_days'], options['batch_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Archived {moved} {dataset} rows in {elapsed:.2f}s")
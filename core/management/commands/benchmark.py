@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run one of the performance benchmarks in core/benchmarks'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name in sorted(benchmarks.BENCHMARKS):
+            module = benchmarks.load(name)
+            subparser = subparsers.add_parser(name, help=(module.__doc__ or '').strip().splitlines()[0])
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        module = benchmarks.load(options['benchmark'])
+        results = module.run(options, self.stdout)
+        self.stdout.write(json.dumps(results, indent=2, default=str))
+        if results.get('passed') is False:
+            raise CommandError(f"Benchmark '{options['benchmark']}' exceeded its threshold")
@@ -0,0 +1,80 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from kombu.exceptions import ChannelError, OperationalError
+
+from lawsuitapp.celery import app
+
+
+def _known_queues():
+    queues = {app.conf.task_default_queue}
+    queues.update(queue.name for queue in app.conf.task_queues or ())
+    routes = app.conf.task_routes
+    if isinstance(routes, dict):
+        queues.update(route['queue'] for route in routes.values() if isinstance(route, dict) and 'queue' in route)
+    return queues
+
+
+def _oldest_enqueued_at(channel, queue):
+    """Publish time of the next message the Redis transport will deliver from ``queue``"""
+    oldest = None
+    for priority in channel.priority_steps:
+        # Messages are pushed on the left and consumed from the right
+        raw = channel.client.lindex(channel._q_for_pri(queue, priority), -1)
+        if raw is None:
+            continue
+        enqueued_at = json.loads(raw).get('headers', {}).get('enqueued_at')
+        if enqueued_at is not None:
+            oldest = enqueued_at if oldest is None else min(oldest, enqueued_at)
+    return oldest
+
+
+class Command(BaseCommand):
+    help = 'Summarize the Celery backlog: messages waiting per queue and tasks held by each worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', default=[],
+                            help='Queue to report besides the configured ones (repeatable)')
+        parser.add_argument('--timeout', type=float, default=1.0,
+                            help='Seconds to wait for workers to answer the inspect broadcast')
+        parser.add_argument('--no-workers', action='store_true', help='Skip the worker inspect broadcast')
+
+    def handle(self, *args, **options):
+        queues = sorted(_known_queues() | set(options['queue']))
+        try:
+            with app.connection_for_read() as connection:
+                channel = connection.default_channel
+                self.stdout.write(f"{'queue':<30} {'waiting':>8} {'oldest':>10}")
+                for queue in queues:
+                    try:
+                        waiting = channel.queue_declare(queue=queue, passive=True).message_count
+                    except ChannelError:
+                        # Brokers drop empty queues (Redis deletes the empty list)
+                        waiting = 0
+                    oldest = '-'
+                    if waiting and hasattr(channel, 'priority_steps'):
+                        enqueued_at = _oldest_enqueued_at(channel, queue)
+                        if enqueued_at is not None:
+                            oldest = f"{time.time() - enqueued_at:.0f}s"
+                    self.stdout.write(f"{queue:<30} {waiting:>8} {oldest:>10}")
+        except OperationalError as exc:
+            raise CommandError(f"Cannot reach the broker: {exc}")
+
+        if options['no_workers']:
+            return
+        inspect = app.control.inspect(timeout=options['timeout'])
+        held = {
+            'active': inspect.active() or {},
+            'reserved': inspect.reserved() or {},
+            'scheduled': inspect.scheduled() or {},
+        }
+        workers = sorted(set().union(*held.values()))
+        if not workers:
+            self.stdout.write("No workers answered")
+            return
+        self.stdout.write('')
+        self.stdout.write(f"{'worker':<40} {'active':>8} {'reserved':>8} {'scheduled':>9}")
+        for worker in workers:
+            active, reserved, scheduled = (len(held[kind].get(worker, ())) for kind in held)
+            self.stdout.write(f"{worker:<40} {active:>8} {reserved:>8} {scheduled:>9}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.changes import compact_events, purge_events
+
+
+class Command(BaseCommand):
+    help = 'Purge change events past retention and merge older events per object'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None)
+        parser.add_argument('--compact-after-hours', type=int, default=None)
+
+    def handle(self, *args, **options):
+        purged = purge_events(options['retention_days'])
+        compacted = compact_events(options['compact_after_hours'])
+        self.stdout.write(f"Purged {purged} change events, compacted away {compacted}")
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import Generator, purge
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic clients, lawyers, case requests, cases, notes and payments for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--lawyers', type=int, default=100)
+        parser.add_argument('--case-requests', type=int, default=10000)
+        parser.add_argument('--approved-ratio', type=float, default=0.4)
+        parser.add_argument('--rejected-ratio', type=float, default=0.2)
+        parser.add_argument('--notes-per-case', type=float, default=3.0, help='Mean notes on an approved case')
+        parser.add_argument('--paid-ratio', type=float, default=0.7, help='Share of approved cases with a payment')
+        parser.add_argument('--days', type=int, default=365, help='Spread filings over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help='Seed the generator for a repeatable data set')
+        parser.add_argument('--prefix', default=None, help='Username prefix (default synthetic-<random>)')
+        parser.add_argument('--password', default='synthetic-password', help='Password of every generated user')
+        parser.add_argument('--purge', action='store_true', help='Delete the data generated with --prefix instead')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            if not options['prefix']:
+                raise CommandError('--purge needs the --prefix the data was generated with')
+            deleted = purge(options['prefix'])
+            self.stdout.write(f"Deleted {deleted} users with prefix {options['prefix']} and their rows")
+            return
+        if options['approved_ratio'] + options['rejected_ratio'] > 1:
+            raise CommandError('--approved-ratio and --rejected-ratio add up to more than 1')
+        if options['clients'] < 1 or options['lawyers'] < 1:
+            raise CommandError('Generate at least one client and one lawyer')
+
+        generator = Generator(
+            prefix=options['prefix'], seed=options['seed'], days=options['days'],
+            batch_size=options['batch_size'], password=options['password'],
+            approved_ratio=options['approved_ratio'], rejected_ratio=options['rejected_ratio'],
+            notes_per_case=options['notes_per_case'], paid_ratio=options['paid_ratio'],
+        )
+        started = time.perf_counter()
+
+        def progress(counts):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{counts['case_requests']}/{options['case_requests']} case requests "
+                f"({counts['case_requests'] / elapsed:.0f} rows/s)"
+            )
+
+        counts = generator.generate(options['clients'], options['lawyers'], options['case_requests'], progress)
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(
+            f"Generated {rows} rows with prefix {generator.prefix} in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s): "
+            + ', '.join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        )
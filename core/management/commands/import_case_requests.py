@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import IMPORT_FORMATS, guess_format, read_records, import_case_requests
+
+
+class Command(BaseCommand):
+    help = 'Bulk import case requests from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS, default=None)
+        parser.add_argument('--client', help='File every row for this client instead of a per-row client column')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--errors', help='Write per-row errors to this NDJSON file')
+
+    def handle(self, *args, **options):
+        client = None
+        if options['client']:
+            try:
+                client = User.objects.get(username=options['client'], profile__role='client')
+            except User.DoesNotExist:
+                raise CommandError(f"Client '{options['client']}' does not exist")
+
+        import_format = options['import_format'] or guess_format(options['path'])
+        started = time.perf_counter()
+        with open(options['path'], encoding='utf-8', newline='') as source:
+            result = import_case_requests(
+                read_records(source, import_format), client=client, batch_size=options['batch_size']
+            )
+        elapsed = time.perf_counter() - started
+
+        if options['errors']:
+            with open(options['errors'], 'w') as errors_file:
+                for error in result['errors']:
+                    errors_file.write(json.dumps(error) + '\n')
+        else:
+            for error in result['errors'][:20]:
+                self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        total = result['created'] + result['failed']
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Imported {result['created']} case requests, {result['failed']} failed "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import DEFERRED_MODULES, TARGETS, parse_importtime, run_target
+
+
+class Command(BaseCommand):
+    help = 'Profile the imports of a cold start with -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=sorted(TARGETS), help='Process to start')
+        parser.add_argument('--top', type=int, default=20, help='Modules to list')
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--why', action='append', default=[], metavar='MODULE',
+                            help='Show the import chain that loaded MODULE (repeatable)')
+
+    def handle(self, *args, **options):
+        try:
+            seconds, stderr = run_target(options['target'], importtime=True)
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        records = parse_importtime(stderr)
+        by_module = {record.module: record for record in records}
+        self.stdout.write(
+            f"{options['target']}: {seconds * 1000:.0f} ms wall, {len(records)} modules, "
+            f"{sum(record.self_us for record in records) / 1000:.0f} ms importing"
+        )
+
+        key = 'cumulative_us' if options['sort'] == 'cumulative' else 'self_us'
+        # Cumulative times nest, so list only where each chain enters the project's imports
+        candidates = records if key == 'self_us' else [record for record in records if record.depth <= 1]
+        self.stdout.write(f"\n{'self ms':>9} {'cumul ms':>9}  module")
+        for record in sorted(candidates, key=lambda record: -getattr(record, key))[:options['top']]:
+            self.stdout.write(f"{record.self_us / 1000:>9.1f} {record.cumulative_us / 1000:>9.1f}  {record.module}")
+
+        loaded = [module for module in DEFERRED_MODULES if module in by_module]
+        if loaded:
+            self.stdout.write(f"\nDeferred modules imported at startup: {', '.join(loaded)}")
+        for module in [*loaded, *options['why']]:
+            record = by_module.get(module)
+            if record is None:
+                self.stdout.write(f"\n{module} is not imported")
+                continue
+            self.stdout.write(f"\n{module} ({record.cumulative_us / 1000:.1f} ms) imported via:")
+            for depth, name in enumerate(record.chain()):
+                self.stdout.write(f"{'  ' * depth}{name}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core.revocation import purge_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired anyway'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Purged {purge_revoked_tokens()} expired revoked tokens")
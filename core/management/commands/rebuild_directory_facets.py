@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.directory import rebuild_location_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the lawyer directory facet counts by state and city'
+
+    def handle(self, *args, **options):
+        locations = rebuild_location_counts()
+        self.stdout.write(f"Rebuilt facet counts for {locations} locations")
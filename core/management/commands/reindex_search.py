@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.search import reindex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the case full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        reindex(connections[options['database']])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Rebuilt the search index in {elapsed:.2f}s")
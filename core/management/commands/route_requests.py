@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.routing import recompute_loads, route_unassigned
+
+
+class Command(BaseCommand):
+    help = 'Assign unassigned pending case requests to lawyers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute-loads', action='store_true',
+                            help="Recount every lawyer's open case load first")
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['recompute_loads']:
+            corrected = recompute_loads()
+            self.stdout.write(f"Corrected the open case load of {corrected} lawyers")
+        routed = route_unassigned(options['batch_size'])
+        self.stdout.write(f"Routed {routed} case requests")
@@ -0,0 +1,380 @@
+"""
+Per-request performance instrumentation.
+
+``PerformanceMiddleware`` times each request and, through a query wrapper
+installed on every database connection as it is created, counts and times
+the SQL it runs. Statements repeated at least
+``METRICS_DUPLICATE_QUERY_THRESHOLD`` times in one request are logged as a
+likely N+1. Each response gets a ``Server-Timing`` header, and per-route
+latency histograms and query counters are exposed in the Prometheus text
+format by ``metrics_view``.
+
+The current request's collector lives in a context variable rather than
+on the connection, so queries run by async views through sync_to_async (on
+another thread and connection) are still attributed to the request.
+Request metrics are kept per process; scrape every web worker.
+
+Celery tasks are timed through the task signals (see core.signals): run
+time by task and final state, time spent waiting in the broker (from the
+``enqueued_at`` header stamped at publish), retries, failures, and SMTP
+send time. They are held by ``TASK_METRICS_BACKEND``: ``LocalTaskMetrics``
+keeps them in the process, which covers eager tasks; ``RedisTaskMetrics``
+aggregates every worker's into a Redis hash, so the web tier's
+``metrics_view`` reports the whole pipeline. It also reports the
+load-shedding limits of core.shedding, the requests coalesced by
+core.singleflight and the token revocation checks of core.revocation.
+"""
+import logging
+import threading
+import json
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.module_loading import import_string
+
+from core.shedding import limiters
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+TASK_HISTOGRAMS = {
+    'celery_task_duration_seconds': 'Task run time by task and final state',
+    'celery_task_queue_wait_seconds': 'Time from publish to start by task and queue',
+    'celery_smtp_send_seconds': 'SMTP send time by task and outcome',
+}
+TASK_COUNTERS = {
+    'celery_task_retries_total': 'Task retries by task',
+    'celery_task_failures_total': 'Task failures by task and exception',
+}
+
+_collector = ContextVar('query_collector', default=None)
+
+
+class QueryCollector:
+    """SQL executed on behalf of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, sql, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            # Parameters are bound separately, so one statement in a loop has one shape
+            self.shapes[sql] += 1
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.shapes.items() if count >= threshold]
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper feeding the current request's collector, if any"""
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record(sql, time.perf_counter() - started)
+
+
+def install_query_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """This process's request metrics, labelled by route, method and status"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)
+        self.queries = Counter()
+        self.query_seconds = Counter()
+        self.repeated_queries = Counter()
+
+    def observe(self, route, method, status, seconds, collector, repeated):
+        with self._lock:
+            self.latency[route, method, str(status)].observe(seconds)
+            self.queries[route, method] += collector.count
+            self.query_seconds[route, method] += collector.seconds
+            self.repeated_queries[route, method] += sum(count - 1 for _, count in repeated)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by route',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (route, method, status), histogram in sorted(self.latency.items()):
+                labels = f'route="{_escape(route)}",method="{method}",status="{status}"'
+                lines.extend(histogram_lines('http_request_duration_seconds', labels, histogram.buckets,
+                                             histogram.counts, histogram.count, histogram.sum))
+
+            counters = [
+                ('db_queries_total', 'SQL statements executed by route', self.queries, '{}'),
+                ('db_query_duration_seconds_total', 'Time spent in SQL by route', self.query_seconds, '{:.6f}'),
+                ('db_repeated_queries_total', 'Repeats of statements flagged as N+1 by route',
+                 self.repeated_queries, '{}'),
+            ]
+            for name, help_text, values, value_format in counters:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for (route, method), value in sorted(values.items()):
+                    labels = f'route="{_escape(route)}",method="{method}"'
+                    lines.append(f'{name}{{{labels}}} {value_format.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            for values in (self.latency, self.queries, self.query_seconds, self.repeated_queries):
+                values.clear()
+
+
+def histogram_lines(name, labels, buckets, counts, count, total):
+    """Exposition lines of one histogram series from its per-bucket (not cumulative) counts"""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+    return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    # Route patterns, not paths, keep the label set bounded
+    return match.route.replace('^', '').replace('$', '') if match is not None else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """Times requests and their SQL; works in both sync and async stacks"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, collector, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, collector, time.perf_counter() - started)
+
+    def _finish(self, request, response, collector, seconds):
+        route = _route(request)
+        repeated = collector.repeated(settings.METRICS_DUPLICATE_QUERY_THRESHOLD)
+        for sql, count in repeated:
+            logger.warning("Likely N+1 on %s %s: %d executions of %s", request.method, route, count, sql[:300])
+        registry.observe(route, request.method, response.status_code, seconds, collector, repeated)
+
+        timings = [
+            f'app;dur={seconds * 1000:.1f}',
+            f'db;dur={collector.seconds * 1000:.1f};desc="{collector.count} queries"',
+        ]
+        if repeated:
+            timings.append(f'db-repeated;desc="{len(repeated)} statements repeated"')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+class LocalTaskMetrics:
+    """Task metrics of this process only; series are keyed by (name, labels tuple)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = defaultdict(lambda: Histogram(TASK_BUCKETS))
+        self.counters = Counter()
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            self.histograms[name, labels].observe(seconds)
+
+    def increment(self, name, labels):
+        with self._lock:
+            self.counters[name, labels] += 1
+
+    def collect(self):
+        """({(name, labels): (bucket counts, count, sum)}, {(name, labels): value})"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.count, h.sum) for key, h in self.histograms.items()}
+            return histograms, dict(self.counters)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+class RedisTaskMetrics:
+    """
+    Task metrics summed across processes in one Redis hash.
+
+    Fields are ``<name>|<labels as JSON>|<bucket index, count or sum>``;
+    each observation is one pipelined round trip of HINCRBY/HINCRBYFLOAT.
+    """
+
+    def __init__(self, url=None, key='task-metrics'):
+        self.url = url or settings.TASK_METRICS_REDIS_URL
+        self.key = key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def _field(self, name, labels, part):
+        return f"{name}|{json.dumps(labels)}|{part}"
+
+    def observe(self, name, labels, seconds):
+        pipe = self.client.pipeline(transaction=False)
+        for i, bound in enumerate(TASK_BUCKETS):
+            if seconds <= bound:
+                pipe.hincrby(self.key, self._field(name, labels, i), 1)
+                break
+        pipe.hincrby(self.key, self._field(name, labels, 'count'), 1)
+        pipe.hincrbyfloat(self.key, self._field(name, labels, 'sum'), seconds)
+        pipe.execute()
+
+    def increment(self, name, labels):
+        self.client.hincrby(self.key, self._field(name, labels, 'count'), 1)
+
+    def collect(self):
+        histograms, counters = {}, {}
+        for field, value in self.client.hgetall(self.key).items():
+            name, labels, part = field.decode().split('|')
+            key = (name, tuple(tuple(pair) for pair in json.loads(labels)))
+            if name in TASK_COUNTERS:
+                counters[key] = int(value)
+                continue
+            counts, count, total = histograms.get(key, ([0] * len(TASK_BUCKETS), 0, 0.0))
+            if part == 'count':
+                count = int(value)
+            elif part == 'sum':
+                total = float(value)
+            else:
+                counts[int(part)] = int(value)
+            histograms[key] = (counts, count, total)
+        return histograms, counters
+
+    def reset(self):
+        self.client.delete(self.key)
+
+
+@lru_cache(maxsize=None)
+def get_task_metrics():
+    return import_string(settings.TASK_METRICS_BACKEND)()
+
+
+def observe_task(name, seconds, **labels):
+    """Record a task histogram observation; metrics never fail the task"""
+    try:
+        get_task_metrics().observe(name, tuple(sorted(labels.items())), seconds)
+    except Exception:
+        logger.exception("Could not record %s", name)
+
+
+def count_task(name, **labels):
+    try:
+        get_task_metrics().increment(name, tuple(sorted(labels.items())))
+    except Exception:
+        logger.exception("Could not record %s", name)
+
+
+def _labels(labels):
+    return ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels)
+
+
+def render_task_metrics():
+    """The task metrics in the Prometheus text exposition format"""
+    try:
+        histograms, counters = get_task_metrics().collect()
+    except Exception:
+        logger.exception("Could not read task metrics")
+        return ''
+    lines = []
+    for name, help_text in TASK_HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series, labels), (counts, count, total) in sorted(histograms.items()):
+            if series == name:
+                lines.extend(histogram_lines(name, _labels(labels), TASK_BUCKETS, counts, count, total))
+    for name, help_text in TASK_COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (series, labels), value in sorted(counters.items()):
+            if series == name:
+                lines.append(f'{name}{{{_labels(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, restricted to METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    # Both build on DRF (see core.lazy); only the web process serves this view
+    from core.revocation import revocations
+    from core.singleflight import flights
+    body = (registry.render() + render_task_metrics() + limiters.render() + flights.render()
+            + revocations.render())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
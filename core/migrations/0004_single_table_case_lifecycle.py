@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_decisions(apps, schema_editor):
+    """Fold Case and RejectedCase rows into their CaseRequest rows and repoint notes/payments"""
+    CaseRequest = apps.get_model('core', 'CaseRequest')
+    Case = apps.get_model('core', 'Case')
+    RejectedCase = apps.get_model('core', 'RejectedCase')
+    CaseNote = apps.get_model('core', 'CaseNote')
+    Payment = apps.get_model('core', 'Payment')
+
+    case_to_request = {}
+    for case in Case.objects.iterator(chunk_size=2000):
+        case_to_request[case.id] = case.case_request_id
+        CaseRequest.objects.filter(pk=case.case_request_id).update(
+            status='approved',
+            lawyer_id=case.lawyer_id,
+            case_number=case.case_number,
+            registration_fee=case.registration_fee,
+            registration_fee_paid=case.registration_fee_paid,
+            approved_at=case.created_at,
+        )
+
+    for rejected_case in RejectedCase.objects.iterator(chunk_size=2000):
+        CaseRequest.objects.filter(pk=rejected_case.case_request_id).update(
+            status='rejected',
+            rejected_by_id=rejected_case.rejected_by_id,
+            rejection_reason=rejected_case.rejection_reason,
+            rejected_at=rejected_case.rejected_at,
+        )
+
+    # Each note/payment is read once, in id order, before it is repointed,
+    # so an id that is both an old case id and a request id is never remapped twice
+    for model in (CaseNote, Payment):
+        last_id = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by('id')[:2000])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for obj in batch:
+                obj.case_id = case_to_request[obj.case_id]
+            model.objects.bulk_update(batch, ['case'])
+
+
+class Migration(migrations.Migration):
+    # On PostgreSQL the FK constraints are deferred, so rows rewritten by merge_decisions leave
+    # trigger events pending until commit, and the ALTER TABLEs after it would fail inside the
+    # same transaction. Only the data step runs in a transaction of its own.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_archive_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caserequest',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='case_number',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='lawyer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='registration_fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='registration_fee_paid',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='rejected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='rejected_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='caserequest',
+            name='rejection_reason',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(merge_decisions, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='casenote',
+            name='case',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='core.caserequest'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='case',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment', to='core.caserequest'),
+        ),
+        migrations.DeleteModel(
+            name='Case',
+        ),
+        migrations.DeleteModel(
+            name='RejectedCase',
+        ),
+        migrations.AlterField(
+            model_name='caserequest',
+            name='lawyer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cases_as_lawyer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='caserequest',
+            name='rejected_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rejected_cases_as_lawyer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='Case',
+            fields=[
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('core.caserequest',),
+        ),
+        migrations.CreateModel(
+            name='RejectedCase',
+            fields=[
+            ],
+            options={
+                'ordering': ['-rejected_at'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('core.caserequest',),
+        ),
+        migrations.AlterField(
+            model_name='casenote',
+            name='case',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='core.case'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='case',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment', to='core.case'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['status', '-created_at'], name='caserequest_status_created_idx'),
+        ),
+    ]
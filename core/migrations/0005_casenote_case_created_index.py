@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_single_table_case_lifecycle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casenote',
+            index=models.Index(fields=['case', 'created_at'], name='casenote_case_created_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:59
+
+from django.db import migrations, models
+
+
+def count_lawyer_locations(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    LawyerLocationCount = apps.get_model('core', 'LawyerLocationCount')
+    counts = (
+        UserProfile.objects.filter(role='lawyer', user__is_active=True)
+        .values('state', 'city').annotate(count=models.Count('id')).order_by()
+    )
+    merged = {}
+    for row in counts:
+        key = (row['state'] or '', row['city'] or '')
+        merged[key] = merged.get(key, 0) + row['count']
+    LawyerLocationCount.objects.bulk_create([
+        LawyerLocationCount(state=state, city=city, count=count) for (state, city), count in merged.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_lawyer_routing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LawyerLocationCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(blank=True, default='', max_length=100)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'state', 'city', 'id'], name='profile_directory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'zipcode'], name='profile_zipcode_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lawyerlocationcount',
+            constraint=models.UniqueConstraint(fields=('state', 'city'), name='lawyer_location_unique'),
+        ),
+        migrations.RunPython(count_lawyer_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# The SQL as of this migration, kept here rather than imported from core.search
+# so that later changes to the runtime module cannot change what this migration did
+
+POSTGRESQL_INSTALL = [
+    """
+    ALTER TABLE core_caserequest ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(case_number, '') || ' ' || title), 'A') ||
+        setweight(to_tsvector('english'::regconfig, description), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX caserequest_search_idx ON core_caserequest USING gin (search_vector)",
+]
+POSTGRESQL_UNINSTALL = [
+    "DROP INDEX IF EXISTS caserequest_search_idx",
+    "ALTER TABLE core_caserequest DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE core_caserequest_fts USING fts5(
+        case_number, title, description, content='core_caserequest', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_caserequest_fts_ai AFTER INSERT ON core_caserequest BEGIN
+        INSERT INTO core_caserequest_fts(rowid, case_number, title, description)
+        VALUES (new.id, new.case_number, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_caserequest_fts_ad AFTER DELETE ON core_caserequest BEGIN
+        INSERT INTO core_caserequest_fts(core_caserequest_fts, rowid, case_number, title, description)
+        VALUES ('delete', old.id, old.case_number, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_caserequest_fts_au AFTER UPDATE OF case_number, title, description
+    ON core_caserequest BEGIN
+        INSERT INTO core_caserequest_fts(core_caserequest_fts, rowid, case_number, title, description)
+        VALUES ('delete', old.id, old.case_number, old.title, old.description);
+        INSERT INTO core_caserequest_fts(rowid, case_number, title, description)
+        VALUES (new.id, new.case_number, new.title, new.description);
+    END
+    """,
+    "INSERT INTO core_caserequest_fts(core_caserequest_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS core_caserequest_fts_ai",
+    "DROP TRIGGER IF EXISTS core_caserequest_fts_ad",
+    "DROP TRIGGER IF EXISTS core_caserequest_fts_au",
+    "DROP TABLE IF EXISTS core_caserequest_fts",
+]
+
+
+def _run(schema_editor, statements):
+    statements = statements.get(schema_editor.connection.vendor, [])
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRESQL_INSTALL, 'sqlite': SQLITE_INSTALL})
+
+
+def uninstall(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRESQL_UNINSTALL, 'sqlite': SQLITE_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index over case requests, maintained by the database: a
+    generated tsvector column with a GIN index on PostgreSQL, an FTS5 table
+    kept in sync by triggers on SQLite. Nothing on other databases.
+    """
+
+    dependencies = [
+        ('core', '0008_lawyer_directory'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
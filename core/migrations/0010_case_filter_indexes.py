@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0009_case_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='caserequest',
+            name='client',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='case_requests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='caserequest',
+            name='lawyer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cases_as_lawyer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='caserequest',
+            name='rejected_by',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rejected_cases_as_lawyer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['client', '-created_at'], name='caserequest_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['lawyer', '-created_at'], name='caserequest_lawyer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['lawyer', 'amount_involved'], name='caserequest_lawyer_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['rejected_by', '-rejected_at'], name='caserequest_rejected_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:40
+
+from django.db import migrations, models
+import django.db.models.functions
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    Payment = apps.get_model('core', 'Payment')
+    Payment.objects.update(updated_at=django.db.models.functions.Coalesce('paid_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_case_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['updated_at'], name='caserequest_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+import heapq
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def _least_loaded(heap, loads):
+    """Pop the least-loaded lawyer, skipping entries made stale by assignments through another heap"""
+    while True:
+        load, user_id = heapq.heappop(heap)
+        if load == loads[user_id]:
+            return user_id
+        heapq.heappush(heap, (loads[user_id], user_id))
+
+
+def route_existing_requests(apps, schema_editor):
+    """
+    Seed the lawyers' open case loads and route the pending requests filed
+    before routing existed, which lawyers' inboxes would otherwise never show
+    """
+    CaseRequest = apps.get_model('core', 'CaseRequest')
+    UserProfile = apps.get_model('core', 'UserProfile')
+
+    loads = Counter(dict(
+        CaseRequest.objects.filter(status='pending', assigned_lawyer__isnull=False)
+        .values('assigned_lawyer').annotate(count=Count('id')).order_by().values_list('assigned_lawyer', 'count')
+    ))
+    loads.update(dict(
+        CaseRequest.objects.filter(status='approved', lawyer__isnull=False)
+        .values('lawyer').annotate(count=Count('id')).order_by().values_list('lawyer', 'count')
+    ))
+
+    lawyers = list(UserProfile.objects.filter(role='lawyer', user__is_active=True).values_list('user_id', 'specialization'))
+    if lawyers:
+        everyone = [(loads[user_id], user_id) for user_id, _ in lawyers]
+        by_specialization = {}
+        for user_id, specialization in lawyers:
+            if specialization:
+                by_specialization.setdefault(specialization, []).append((loads[user_id], user_id))
+        heapq.heapify(everyone)
+        for heap in by_specialization.values():
+            heapq.heapify(heap)
+
+        now = timezone.now()
+        unassigned = CaseRequest.objects.filter(status='pending', assigned_lawyer__isnull=True).order_by('pk')
+        last_id = 0
+        while True:
+            batch = list(unassigned.filter(pk__gt=last_id).only('id', 'requested_lawyer_type')[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for case_request in batch:
+                specialization = (case_request.requested_lawyer_type or '').strip().lower()
+                heap = by_specialization.get(specialization, everyone)
+                user_id = _least_loaded(heap, loads)
+                loads[user_id] += 1
+                heapq.heappush(heap, (loads[user_id], user_id))
+                case_request.assigned_lawyer_id = user_id
+                case_request.assigned_at = now
+            CaseRequest.objects.bulk_update(batch, ['assigned_lawyer', 'assigned_at'])
+
+    for user_id, load in list(UserProfile.objects.filter(role='lawyer').values_list('user_id', 'open_case_load')):
+        if loads[user_id] != load:
+            UserProfile.objects.filter(user_id=user_id).update(open_case_load=loads[user_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_revoked_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(route_existing_requests, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 
 # User Roles
@@ -16,6 +17,41 @@ CASE_STATUS_CHOICES = [
 ]
 
 
+class CaseRequestQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Case requests visible to the given user"""
+        role = getattr(getattr(user, 'profile', None), 'role', None)
+        if role == 'client':
+            # Clients see only their own case requests
+            return self.filter(client=user)
+        elif role == 'lawyer':
+            # Lawyers see the pending requests routed to their inbox
+            return self.filter(status='pending', assigned_lawyer=user)
+        return self.none()
+
+
+class CaseQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Cases visible to the given user"""
+        role = getattr(getattr(user, 'profile', None), 'role', None)
+        if role == 'client':
+            return self.filter(client=user)
+        elif role == 'lawyer':
+            return self.filter(lawyer=user)
+        return self.none()
+
+
+class RejectedCaseQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Rejected cases visible to the given user"""
+        role = getattr(getattr(user, 'profile', None), 'role', None)
+        if role == 'client':
+            return self.filter(client=user)
+        elif role == 'lawyer':
+            return self.filter(rejected_by=user)
+        return self.none()
+
+
 class UserProfile(models.Model):
     """Extended user profile with role information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -27,20 +63,40 @@ class UserProfile(models.Model):
     zipcode = models.CharField(max_length=20, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Lawyers only: matched against CaseRequest.requested_lawyer_type (stored lowercased)
+    specialization = models.CharField(max_length=100, blank=True, null=True)
+    # Lawyers only: assigned pending requests plus approved cases, kept up to date by core.routing
+    open_case_load = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'User Profiles'
+        indexes = [
+            models.Index(fields=['role', 'specialization', 'open_case_load'], name='profile_routing_idx'),
+            models.Index(fields=['role', 'open_case_load'], name='profile_load_idx'),
+            models.Index(fields=['role', 'state', 'city', 'id'], name='profile_directory_idx'),
+            models.Index(fields=['role', 'zipcode'], name='profile_zipcode_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_role_display()}"
 
 
 class CaseRequest(models.Model):
-    """Model for case requests filed by clients"""
-    client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='case_requests')
-    title = models.CharField(max_length=255)
+    """
+    Model for case requests filed by clients
+
+    A request moves through its lifecycle in place: approving or rejecting
+    it is a single UPDATE of the status, lawyer and fee/rejection columns on
+    this row. `Case` and `RejectedCase` are proxies over the approved and
+    rejected rows.
+    """
+    client = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='case_requests',
+        db_index=False,  # covered by caserequest_client_created_idx
+    )
+    title = models.CharField(max_length=255, db_index=True)
     description = models.TextField()
     case_type = models.CharField(max_length=100)  # e.g., Civil, Criminal, Corporate, etc.
     status = models.CharField(max_length=20, choices=CASE_STATUS_CHOICES, default='pending')
@@ -50,49 +106,79 @@ class CaseRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Set by core.routing while pending
+    assigned_lawyer = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_case_requests',
+        db_index=False,  # covered by caserequest_inbox_idx
+    )
+    assigned_at = models.DateTimeField(null=True, blank=True)
+
+    # Set when approved
+    lawyer = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='cases_as_lawyer',
+        db_index=False,  # covered by caserequest_lawyer_created_idx
+    )
+    case_number = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    registration_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    registration_fee_paid = models.BooleanField(default=False)
+    approved_at = models.DateTimeField(null=True, blank=True)
+
+    # Set when rejected
+    rejected_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rejected_cases_as_lawyer',
+        db_index=False,  # covered by caserequest_rejected_idx
+    )
+    rejection_reason = models.TextField(blank=True, null=True)
+    rejected_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CaseRequestQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='caserequest_status_created_idx'),
+            models.Index(fields=['assigned_lawyer', 'status', '-created_at'], name='caserequest_inbox_idx'),
+            # Role scope first, then the core.filters column
+            models.Index(fields=['client', '-created_at'], name='caserequest_client_created_idx'),
+            models.Index(fields=['lawyer', '-created_at'], name='caserequest_lawyer_created_idx'),
+            models.Index(fields=['lawyer', 'amount_involved'], name='caserequest_lawyer_amount_idx'),
+            models.Index(fields=['rejected_by', '-rejected_at'], name='caserequest_rejected_idx'),
+            # Incremental analytics snapshots (core.analytics)
+            models.Index(fields=['updated_at'], name='caserequest_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Case Request: {self.title} - {self.client.username}"
 
 
-class Case(models.Model):
-    """Model for approved cases linked to both client and lawyer"""
-    client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cases_as_client')
-    lawyer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='cases_as_lawyer')
-    case_request = models.OneToOneField(CaseRequest, on_delete=models.CASCADE, related_name='approved_case')
-    case_number = models.CharField(max_length=50, unique=True)
-    title = models.CharField(max_length=255)
-    description = models.TextField()
-    case_type = models.CharField(max_length=100)
-    status = models.CharField(max_length=20, choices=CASE_STATUS_CHOICES, default='approved')
-    documents = models.FileField(upload_to='case_documents/', blank=True, null=True)
-    amount_involved = models.DecimalField(max_digits=15, decimal_places=2)
-    registration_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    registration_fee_paid = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+class CaseManager(models.Manager.from_queryset(CaseQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(status='approved')
+
+
+class Case(CaseRequest):
+    """Approved case requests, linked to both client and lawyer"""
+    objects = CaseManager()
 
     class Meta:
+        proxy = True
         ordering = ['-created_at']
 
     def __str__(self):
         return f"Case #{self.case_number} - {self.client.username}"
 
 
-class RejectedCase(models.Model):
-    """Model for rejected case requests"""
-    client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rejected_cases')
-    case_request = models.OneToOneField(CaseRequest, on_delete=models.CASCADE, related_name='rejection')
-    title = models.CharField(max_length=255)
-    description = models.TextField()
-    case_type = models.CharField(max_length=100)
-    rejection_reason = models.TextField()
-    rejected_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='rejected_cases_as_lawyer')
-    rejected_at = models.DateTimeField(auto_now_add=True)
+class RejectedCaseManager(models.Manager.from_queryset(RejectedCaseQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(status='rejected')
+
+
+class RejectedCase(CaseRequest):
+    """Rejected case requests"""
+    objects = RejectedCaseManager()
 
     class Meta:
+        proxy = True
         ordering = ['-rejected_at']
 
     def __str__(self):
@@ -109,6 +195,9 @@ class CaseNote(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['case', 'created_at'], name='casenote_case_created_idx'),
+        ]
 
     def __str__(self):
         return f"Note on Case #{self.case.case_number}"
@@ -125,9 +214,74 @@ class Payment(models.Model):
     case = models.OneToOneField(Case, on_delete=models.CASCADE, related_name='payment')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
-    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     paid_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"Payment for Case #{self.case.case_number} - {self.status}"
+
+
+class ArchiveSegment(models.Model):
+    """Index entry for a compressed NDJSON file of archived rows"""
+    dataset = models.CharField(max_length=50)
+    path = models.CharField(max_length=500, unique=True)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-start']
+        indexes = [
+            models.Index(fields=['dataset', 'start', 'end'], name='archive_segment_range_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} archive {self.start:%Y-%m-%d} ({self.row_count} rows)"
+
+
+class LawyerLocationCount(models.Model):
+    """Precomputed number of lawyers per (state, city) for the directory facets"""
+    state = models.CharField(max_length=100, blank=True, default='')
+    city = models.CharField(max_length=100, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['state', 'city'], name='lawyer_location_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.city}, {self.state}: {self.count}"
+
+
+class ChangeEvent(models.Model):
+    """Append-only per-user log of changes, read incrementally by clients"""
+    seq = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='change_events', db_index=False)
+    kind = models.CharField(max_length=50)  # e.g. case_request.approved, note.created
+    object_type = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['user', 'seq'], name='changeevent_user_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.kind} {self.object_type}:{self.object_id} for {self.user_id}"
+
+
+class RevokedToken(models.Model):
+    """A refresh token that may no longer be used, until it would have expired anyway"""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at})"
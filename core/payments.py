@@ -0,0 +1,69 @@
+"""
+Async client for the Stripe PaymentIntents API.
+
+Stripe's SDK is synchronous, so under ASGI every call would hold a worker
+thread for the whole provider round trip. This client speaks the same REST
+API over httpx instead. Each call opens and closes its own httpx client: a
+client is bound to the event loop it was first used on, and WSGI
+deployments run each async view on a fresh loop, so a pooled one would
+outlive its loop with its connections still open.
+"""
+from django.conf import settings
+
+from core.lazy import lazy_import
+
+httpx = lazy_import('httpx')
+
+
+class PaymentProviderError(Exception):
+    """The payment provider rejected a request or could not be reached"""
+
+
+def _form(data, prefix=''):
+    """Flatten nested dicts into Stripe's ``key[subkey]=value`` form encoding"""
+    fields = {}
+    for key, value in data.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, dict):
+            fields.update(_form(value, name))
+        else:
+            fields[name] = str(value)
+    return fields
+
+
+class StripeClient:
+    def __init__(self, api_key=None, api_base=None, timeout=None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.timeout = timeout
+
+    def _client(self):
+        return httpx.AsyncClient(
+            base_url=self.api_base or settings.STRIPE_API_BASE,
+            auth=(self.api_key or settings.STRIPE_SECRET_KEY, ''),
+            timeout=self.timeout or settings.PAYMENT_PROVIDER_TIMEOUT,
+        )
+
+    async def _request(self, method, path, data=None):
+        try:
+            async with self._client() as client:
+                response = await client.request(method, f"/v1/{path}", data=_form(data) if data else None)
+            body = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise PaymentProviderError(f"Payment provider unavailable: {e}") from e
+        if response.is_error:
+            raise PaymentProviderError(body.get('error', {}).get('message', f"HTTP {response.status_code}"))
+        return body
+
+    async def create_payment_intent(self, amount, currency, metadata=None):
+        return await self._request('POST', 'payment_intents', {
+            'amount': amount,
+            'currency': currency,
+            'metadata': metadata or {},
+        })
+
+    async def retrieve_payment_intent(self, intent_id):
+        return await self._request('GET', f"payment_intents/{intent_id}")
+
+
+stripe_client = StripeClient()
@@ -40,3 +40,11 @@ class IsLawyerOrReadOnly(permissions.BasePermission):
             return request.user.profile.role == 'lawyer'
         except:
             return False
+
+
+class IsAuthorOrReadOnly(permissions.BasePermission):
+    """Permission for authors to edit/delete only their own notes"""
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return obj.author == request.user
@@ -0,0 +1,222 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+``ReplicaMiddleware`` picks a replica from ``DATABASE_REPLICAS`` for each
+safe-method request (GET, HEAD, OPTIONS) and ``ReplicaRouter`` sends that
+request's reads there; every write, and every read outside such a request
+(unsafe methods, Celery tasks, management commands), uses ``default``.
+
+Reads fall back to the primary when:
+
+* the user wrote within the last ``REPLICA_STICKY_SECONDS``, so they see
+  their own changes; the pin is kept in the default cache, which must be
+  shared (``CACHE_URL``) for it to hold across processes, as the
+  core.E001 system check enforces,
+* the request itself wrote, or is inside a transaction on the primary,
+* every replica lags more than ``REPLICA_MAX_LAG_SECONDS``, or cannot be
+  reached. Lag is measured at most every ``REPLICA_LAG_CHECK_INTERVAL``
+  seconds per process.
+
+Querysets evaluated after the response is returned (streamed exports)
+must be bound with ``.using(read_database(model))`` inside the view.
+"""
+import contextlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PG_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReadState:
+    """Where the current request's reads go"""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+_state = ContextVar('replica_read_state', default=None)
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for REPLICA_STICKY_SECONDS"""
+    cache.set(_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+class LagMonitor:
+    """Per-process cache of each replica's replication lag"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def measure(self, alias):
+        """Seconds the replica is behind, or None if it cannot be queried"""
+        connection = connections[alias]
+        try:
+            if connection.vendor != 'postgresql':
+                # Anything but streaming replication (e.g. local SQLite copies) reports no lag
+                connection.ensure_connection()
+                return 0.0
+            with connection.cursor() as cursor:
+                cursor.execute(PG_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except Exception:
+            logger.warning("Replica %s is unreachable", alias, exc_info=True)
+            return None
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+                return checked[1]
+            # Other threads keep using the previous reading while this one measures
+            self._checked[alias] = (now, checked[1] if checked is not None else None)
+        lag = self.measure(alias)
+        with self._lock:
+            self._checked[alias] = (time.monotonic(), lag)
+        if lag is not None and lag > settings.REPLICA_MAX_LAG_SECONDS:
+            logger.warning("Replica %s is %.1fs behind; reading from the primary", alias, lag)
+        return lag
+
+    def healthy(self):
+        healthy = []
+        for alias in settings.DATABASE_REPLICAS:
+            lag = self.lag(alias)
+            if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+                healthy.append(alias)
+        return healthy
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+lag_monitor = LagMonitor()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects read anywhere can be related
+        replicated = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in replicated and obj2._state.db in replicated:
+            return True
+        return None
+
+
+def read_database(model):
+    """The alias the current request reads ``model`` from"""
+    return ReplicaRouter().db_for_read(model)
+
+
+def _request_user_id(request):
+    """
+    The user making the request, without a query: from the JWT signature,
+    or the session for the admin.
+    """
+    authentication = JWTAuthentication()
+    try:
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token is not None:
+            return authentication.get_validated_token(raw_token)[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    session = getattr(request, 'session', None)
+    return session.get('_auth_user_id') if session is not None else None
+
+
+def _read_state(request, user_id):
+    if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return ReadState(None)
+    if user_id is not None and cache.get(_pin_key(user_id)):
+        return ReadState(None)
+    replicas = lag_monitor.healthy()
+    return ReadState(random.choice(replicas) if replicas else None)
+
+
+def _finish(state, user_id):
+    if state.wrote and user_id is not None:
+        pin_to_primary(user_id)
+
+
+@contextlib.contextmanager
+def routed(request, user_id):
+    """
+    Route the reads inside the block as ReplicaMiddleware routes
+    ``request``'s, e.g. for requests dispatched without the middleware
+    """
+    state = _read_state(request, user_id)
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        _finish(state, user_id)
+
+
+class ReplicaMiddleware:
+    """Routes safe-method requests' reads to a replica; works in both sync and async stacks"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with routed(request, _request_user_id(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        user_id = await sync_to_async(_request_user_id)(request)
+        state = await sync_to_async(_read_state)(request, user_id)
+        token = _state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+            await sync_to_async(_finish)(state, user_id)
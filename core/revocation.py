@@ -0,0 +1,226 @@
+"""
+Refresh-token revocation with a per-process Bloom filter.
+
+Refresh tokens retired by rotation (``BLACKLIST_AFTER_ROTATION``) or
+revoked at logout are recorded as ``RevokedToken`` rows, kept until the
+token would have expired anyway. Every refresh asks whether its token was
+revoked and almost none were, so each process keeps a Bloom filter of the
+revoked JTIs: a miss means not revoked and needs no query, and only a hit
+(a revoked token, or a false positive at about
+``TOKEN_REVOCATION_FILTER_ERROR_RATE``) is confirmed against the table.
+
+The filter picks up the rows revoked since its last sync at most every
+``TOKEN_REVOCATION_SYNC_INTERVAL`` seconds, and is rebuilt from the
+unexpired rows every ``TOKEN_REVOCATION_REBUILD_INTERVAL`` (a Bloom filter
+cannot forget) or once it holds more than it was sized for. Revocations in
+this process are added at once; another process's are seen within a sync
+interval. That lag never lets a rotated token be replayed: revoking inserts
+the JTI under a unique constraint, so of two refreshes with the same token
+only one can rotate it.
+
+Expired rows are deleted by ``purge_revoked_tokens``. Access tokens are
+short-lived and not checked.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from core.models import RevokedToken
+
+# Rows are timestamped just before they commit; each sync re-reads this far
+# back so one that committed late is not skipped
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about ``error_rate`` false positives up to ``capacity``"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """This process's Bloom filter of revoked JTIs, synced from RevokedToken"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._bloom = None
+        self._since = None
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self.checks = Counter()
+
+    @property
+    def entries(self):
+        bloom = self._bloom
+        return bloom.count if bloom is not None else 0
+
+    def _rebuild(self):
+        started = timezone.now()
+        jtis = list(RevokedToken.objects.filter(expires_at__gt=started).values_list('jti', flat=True))
+        bloom = BloomFilter(max(settings.TOKEN_REVOCATION_FILTER_CAPACITY, 2 * len(jtis)),
+                            settings.TOKEN_REVOCATION_FILTER_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._since = started
+        self._built_at = self._synced_at = time.monotonic()
+
+    def _update(self):
+        started = timezone.now()
+        for jti in RevokedToken.objects.filter(revoked_at__gte=self._since - SYNC_OVERLAP).values_list('jti', flat=True):
+            self._bloom.add(jti)
+        self._since = started
+        self._synced_at = time.monotonic()
+
+    def _due(self):
+        return time.monotonic() - self._synced_at >= settings.TOKEN_REVOCATION_SYNC_INTERVAL
+
+    def sync(self):
+        """Build the filter, or bring it up to date when due; threads arriving mid-sync use it as it is"""
+        if self._bloom is None:
+            with self._lock:
+                if self._bloom is None:
+                    self._rebuild()
+            return
+        if not self._due() or not self._lock.acquire(blocking=False):
+            return
+        try:
+            if not self._due():
+                return
+            bloom = self._bloom
+            stale = time.monotonic() - self._built_at >= settings.TOKEN_REVOCATION_REBUILD_INTERVAL
+            if stale or bloom.count > bloom.capacity:
+                self._rebuild()
+            else:
+                self._update()
+        finally:
+            self._lock.release()
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def count(self, result):
+        with self._counter_lock:
+            self.checks[result] += 1
+
+    def is_revoked(self, jti):
+        if not settings.TOKEN_REVOCATION_FILTER:
+            revoked = RevokedToken.objects.filter(jti=jti).exists()
+            self.count('revoked' if revoked else 'clear')
+            return revoked
+        self.sync()
+        if jti not in self._bloom:
+            self.count('clear')
+            return False
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        self.count('revoked' if revoked else 'false_positive')
+        return revoked
+
+    def render(self):
+        """Check counters and the filter size in the Prometheus text format"""
+        lines = [
+            '# HELP token_revocation_checks_total Refresh-token revocation checks by result',
+            '# TYPE token_revocation_checks_total counter',
+        ]
+        with self._counter_lock:
+            for result, value in sorted(self.checks.items()):
+                lines.append(f'token_revocation_checks_total{{result="{result}"}} {value}')
+        lines.extend([
+            "# HELP token_revocation_filter_entries Revoked JTIs in this process's filter",
+            '# TYPE token_revocation_filter_entries gauge',
+            f'token_revocation_filter_entries {self.entries}',
+        ])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._synced_at = 0.0
+        with self._counter_lock:
+            self.checks.clear()
+
+
+revocations = RevocationFilter()
+
+
+def revoke(jti, expires_at):
+    """Record ``jti`` as revoked; False if it already was"""
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        revoked = True
+    except IntegrityError:
+        revoked = False
+    revocations.add(jti)
+    return revoked
+
+
+def purge_revoked_tokens():
+    """Delete the rows of tokens that have expired anyway; returns how many"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh token checked against, and revoked into, the RevokedToken table"""
+
+    def verify(self):
+        super().verify()
+        self.check_blacklist()
+
+    def check_blacklist(self):
+        if revocations.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        if not revoke(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp'])):
+            # Rotated or revoked by another request since this one verified it
+            raise TokenError('Token is blacklisted')
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+
+class TokenBlacklistSerializer(serializers.TokenBlacklistSerializer):
+    token_class = RevocableRefreshToken
@@ -0,0 +1,136 @@
+"""
+Routing of pending case requests to lawyers.
+
+Lawyer profiles are indexed by (role, specialization, open_case_load), so
+the least-loaded lawyers for a requested lawyer type are one index range
+scan. New requests are assigned greedily to the least-loaded lawyer of that
+pool, falling back to the least-loaded lawyer overall when nobody has the
+specialization. Each lawyer's queue is then the indexed inbox query
+``CaseRequest.objects.filter(assigned_lawyer=..., status='pending')``.
+
+Loads are adjusted incrementally with F() updates as requests are assigned,
+decided and deleted. Status edits made outside core.services (e.g. in the
+admin change form) are not tracked; ``recompute_loads`` repairs the drift.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.changes import record_changes
+from core.models import CaseRequest, UserProfile
+
+
+def normalize_specialization(value):
+    return (value or '').strip().lower() or None
+
+
+def candidate_lawyers(lawyer_type, limit=None):
+    """Least-loaded active lawyers for a requested lawyer type, as (load, user id) pairs"""
+    limit = limit or settings.ROUTING_POOL_SIZE
+    lawyers = UserProfile.objects.filter(role='lawyer', user__is_active=True).order_by('open_case_load', 'user_id')
+    specialization = normalize_specialization(lawyer_type)
+    if specialization:
+        pool = list(lawyers.filter(specialization=specialization).values_list('open_case_load', 'user_id')[:limit])
+        if pool:
+            return pool
+    return list(lawyers.values_list('open_case_load', 'user_id')[:limit])
+
+
+def adjust_loads(deltas):
+    """Apply a {lawyer user id: change} mapping to the lawyers' open case loads"""
+    for user_id, delta in deltas.items():
+        if user_id and delta:
+            UserProfile.objects.filter(user_id=user_id).update(
+                open_case_load=Greatest(F('open_case_load') + delta, 0)
+            )
+
+
+def route_case_requests(case_requests):
+    """
+    Assign the unassigned pending requests among ``case_requests`` to lawyers.
+
+    Requests are grouped by requested lawyer type so each group costs one
+    candidate query however large the batch. Returns the number assigned.
+    """
+    by_type = defaultdict(list)
+    for case_request in case_requests:
+        if case_request.status == 'pending' and case_request.assigned_lawyer_id is None:
+            by_type[normalize_specialization(case_request.requested_lawyer_type)].append(case_request)
+
+    now = timezone.now()
+    assigned = []
+    deltas = Counter()
+    for lawyer_type, pending in by_type.items():
+        # A pool at least as large as the group lets a big batch spread over that many lawyers
+        pool = candidate_lawyers(lawyer_type, max(settings.ROUTING_POOL_SIZE, len(pending)))
+        if not pool:
+            continue
+        heapq.heapify(pool)
+        for case_request in pending:
+            load, user_id = heapq.heappop(pool)
+            case_request.assigned_lawyer_id = user_id
+            case_request.assigned_at = now
+            heapq.heappush(pool, (load + 1, user_id))
+            deltas[user_id] += 1
+            assigned.append(case_request)
+
+    if assigned:
+        with transaction.atomic():
+            CaseRequest.objects.bulk_update(assigned, ['assigned_lawyer', 'assigned_at'])
+            adjust_loads(deltas)
+            record_changes('case_request.assigned', [
+                (case_request.pk, [case_request.assigned_lawyer_id], {
+                    'status': case_request.status,
+                    'assigned_lawyer': case_request.assigned_lawyer_id,
+                })
+                for case_request in assigned
+            ])
+    return len(assigned)
+
+
+def route_unassigned(batch_size=None):
+    """Route the pending requests no lawyer could take when they were filed"""
+    batch_size = batch_size or settings.ROUTING_BATCH_SIZE
+    unassigned = CaseRequest.objects.filter(status='pending', assigned_lawyer__isnull=True).only(
+        'id', 'status', 'assigned_lawyer', 'requested_lawyer_type'
+    ).order_by('pk')
+    routed = 0
+    last_id = 0
+    while True:
+        batch = list(unassigned.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return routed
+        last_id = batch[-1].pk
+        routed += route_case_requests(batch)
+
+
+def recompute_loads(lawyers=None):
+    """Recount the open case load of every lawyer (or of ``lawyers``), returning the number corrected"""
+    pending = CaseRequest.objects.filter(status='pending', assigned_lawyer__isnull=False)
+    approved = CaseRequest.objects.filter(status='approved', lawyer__isnull=False)
+    profiles = UserProfile.objects.filter(role='lawyer')
+    if lawyers is not None:
+        pending = pending.filter(assigned_lawyer__in=lawyers)
+        approved = approved.filter(lawyer__in=lawyers)
+        profiles = profiles.filter(user__in=lawyers)
+
+    loads = Counter(dict(
+        pending.values('assigned_lawyer').annotate(count=Count('id')).order_by()
+        .values_list('assigned_lawyer', 'count')
+    ))
+    loads.update(dict(
+        approved.values('lawyer').annotate(count=Count('id')).order_by()
+        .values_list('lawyer', 'count')
+    ))
+
+    corrected = 0
+    for user_id, load in profiles.values_list('user_id', 'open_case_load').iterator():
+        if loads[user_id] != load:
+            UserProfile.objects.filter(user_id=user_id).update(open_case_load=loads[user_id])
+            corrected += 1
+    return corrected
@@ -0,0 +1,199 @@
+"""
+Full-text search over case requests (and the Case/RejectedCase proxies).
+
+PostgreSQL keeps a weighted ``search_vector`` tsvector as a generated column
+with a GIN index; SQLite keeps an external-content FTS5 table in step with
+triggers. Either way the database updates the index on every insert, update
+and delete, including bulk_create and queryset updates. The index covers
+``SEARCH_FIELDS``; views searching other fields, and other databases, fall
+back to DRF's ``SearchFilter``. Every term must match, the last one as a
+prefix so results follow what is being typed, on both databases.
+
+SQLite drops a table's triggers when a migration rebuilds the table, so they
+are re-created after every migrate. On PostgreSQL a migration that changes
+the type of an indexed column has to uninstall and reinstall the index
+around it.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+SEARCH_CONFIG = 'english'
+TABLE = 'core_caserequest'
+FTS_TABLE = 'core_caserequest_fts'
+PG_INDEX = 'caserequest_search_idx'
+# The columns the index covers, as a view's search_fields
+SEARCH_FIELDS = ('case_number', 'title', 'description')
+
+# Case number and title outrank the description
+POSTGRESQL_INSTALL = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(case_number, '') || ' ' || title), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, description), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX {PG_INDEX} ON {TABLE} USING gin (search_vector)",
+]
+POSTGRESQL_UNINSTALL = [
+    f"DROP INDEX IF EXISTS {PG_INDEX}",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_COLUMNS = 'case_number, title, description'
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {SQLITE_COLUMNS})
+        VALUES (new.id, new.case_number, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {SQLITE_COLUMNS})
+        VALUES ('delete', old.id, old.case_number, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {SQLITE_COLUMNS} ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {SQLITE_COLUMNS})
+        VALUES ('delete', old.id, old.case_number, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, {SQLITE_COLUMNS})
+        VALUES (new.id, new.case_number, new.title, new.description);
+    END
+    """,
+]
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {SQLITE_COLUMNS}, content='{TABLE}', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search_index(connection):
+    if connection.vendor == 'postgresql':
+        _execute(connection, POSTGRESQL_INSTALL)
+    elif connection.vendor == 'sqlite':
+        _execute(connection, SQLITE_INSTALL)
+
+
+def uninstall_search_index(connection):
+    if connection.vendor == 'postgresql':
+        _execute(connection, POSTGRESQL_UNINSTALL)
+    elif connection.vendor == 'sqlite':
+        _execute(connection, SQLITE_UNINSTALL)
+
+
+def ensure_triggers(connection):
+    """Re-create SQLite's sync triggers if a table rebuild dropped them"""
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        _execute(connection, SQLITE_TRIGGERS)
+
+
+def reindex(connection):
+    """Rebuild the search index from the table"""
+    if connection.vendor == 'postgresql':
+        # The generated column is always current; only the GIN index can bloat
+        _execute(connection, [f"REINDEX INDEX {PG_INDEX}"])
+    elif connection.vendor == 'sqlite':
+        ensure_triggers(connection)
+        _execute(connection, [
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+        ])
+
+
+def fts5_query(terms):
+    """All terms as quoted FTS5 strings, the last one as a prefix for type-as-you-go"""
+    terms = [re.sub(r'\W+', ' ', term).strip() for term in terms]
+    quoted = [f'"{term}"' for term in terms if term]
+    if quoted:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def tsquery(terms):
+    """
+    All terms as a PostgreSQL tsquery, the words of a term adjacent and the
+    last word a prefix, as ``fts5_query`` matches on SQLite
+    """
+    phrases = [' <-> '.join(f"'{word}'" for word in re.findall(r'\w+', term)) for term in terms]
+    phrases = [phrase for phrase in phrases if phrase]
+    if phrases:
+        phrases[-1] += ':*'
+    return ' & '.join(phrases)
+
+
+def search_queryset(queryset, terms):
+    """
+    Filter a case request queryset to full-text matches of ``terms``,
+    annotated with ``search_rank`` (higher is better), or None if the
+    database has no full-text index.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = tsquery(terms)
+        if not query:
+            return queryset.extra(select={'search_rank': '0'}).none()
+        to_tsquery = "to_tsquery(%s::regconfig, %s)"
+        params = [SEARCH_CONFIG, query]
+        match = RawSQL(f"{TABLE}.search_vector @@ {to_tsquery}", params, output_field=BooleanField())
+        rank = RawSQL(f"ts_rank_cd({TABLE}.search_vector, {to_tsquery})", params, output_field=FloatField())
+        return queryset.filter(match).annotate(search_rank=rank)
+
+    if vendor == 'sqlite':
+        query = fts5_query(terms)
+        if not query:
+            return queryset.extra(select={'search_rank': '0'}).none()
+        # Joining the FTS table runs the MATCH once; bm25() is lower for better
+        # matches, and its column weights follow POSTGRESQL_INSTALL
+        return queryset.extra(
+            select={'search_rank': f"-bm25({FTS_TABLE}, 10.0, 10.0, 1.0)"},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {TABLE}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[query],
+        )
+
+    return None
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter replacement for case request views backed by the full-text
+    index, used when the view's ``search_fields`` are the indexed
+    ``SEARCH_FIELDS``. Results are ranked best first unless the client asks
+    for an explicit ``ordering``, so list it after OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        indexed = sorted(self.get_search_fields(view, request) or ()) == sorted(SEARCH_FIELDS)
+        if not terms or not indexed or queryset.model._meta.db_table != TABLE:
+            return super().filter_queryset(request, queryset, view)
+
+        results = search_queryset(queryset, terms)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return results
+        return results.order_by('-search_rank', *(queryset.query.order_by or queryset.model._meta.ordering))
@@ -1,8 +1,12 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
+from django.conf import settings
 from django.contrib.auth.models import User
 from core.models import (
-    UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment
+    UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment, ChangeEvent
 )
+from core.routing import normalize_specialization
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -14,9 +18,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields = [
             'id', 'user_id', 'username', 'email', 'role', 'phone', 'address',
-            'city', 'state', 'zipcode', 'bio', 'profile_picture', 'created_at', 'updated_at'
+            'city', 'state', 'zipcode', 'bio', 'profile_picture', 'specialization', 'open_case_load',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'open_case_load', 'created_at', 'updated_at']
+
+    def validate_specialization(self, value):
+        return normalize_specialization(value)
+
+
+class LawyerDirectorySerializer(serializers.ModelSerializer):
+    """Public directory entry for a lawyer; contact details stay private"""
+    user_id = serializers.IntegerField(source='user.id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+
+    class Meta:
+        model = UserProfile
+        fields = [
+            'id', 'user_id', 'username', 'first_name', 'last_name', 'specialization',
+            'city', 'state', 'zipcode', 'bio', 'profile_picture'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = fields
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -58,9 +82,10 @@ class CaseRequestSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'client', 'client_name', 'client_email', 'title', 'description',
             'case_type', 'status', 'documents', 'amount_involved', 'requested_lawyer_type',
-            'created_at', 'updated_at'
+            'assigned_lawyer', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'client', 'created_at', 'updated_at']
+        # Status only changes through the approve/reject actions, assignment through routing
+        read_only_fields = ['id', 'client', 'status', 'assigned_lawyer', 'created_at', 'updated_at']
 
 
 class CaseNoteSerializer(serializers.ModelSerializer):
@@ -69,13 +94,15 @@ class CaseNoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = CaseNote
         fields = ['id', 'case', 'author', 'author_name', 'content', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'case', 'author', 'created_at', 'updated_at']
 
 
 class CaseSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.username', read_only=True)
     lawyer_name = serializers.CharField(source='lawyer.username', read_only=True, allow_null=True)
-    notes = CaseNoteSerializer(many=True, read_only=True)
+    case_request = serializers.IntegerField(source='id', read_only=True)
+    # Notes are paginated under /cases/{id}/notes/ rather than embedded
+    notes_url = serializers.SerializerMethodField()
     payment = serializers.SerializerMethodField()
 
     class Meta:
@@ -83,10 +110,17 @@ class CaseSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'client', 'client_name', 'lawyer', 'lawyer_name', 'case_request',
             'case_number', 'title', 'description', 'case_type', 'status', 'documents',
-            'amount_involved', 'registration_fee', 'registration_fee_paid', 'notes', 'payment',
+            'amount_involved', 'registration_fee', 'registration_fee_paid', 'notes_url', 'payment',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'case_number', 'created_at', 'updated_at']
+        # Cases are opened by the approve action and their lifecycle is the services' to change
+        read_only_fields = [
+            'id', 'client', 'lawyer', 'case_number', 'status', 'registration_fee', 'registration_fee_paid',
+            'created_at', 'updated_at'
+        ]
+
+    def get_notes_url(self, obj):
+        return reverse('case-note-list', kwargs={'case_id': obj.id}, request=self.context.get('request'))
 
     def get_payment(self, obj):
         try:
@@ -99,6 +133,7 @@ class CaseSerializer(serializers.ModelSerializer):
 class RejectedCaseSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.username', read_only=True)
     rejected_by_name = serializers.CharField(source='rejected_by.username', read_only=True, allow_null=True)
+    case_request = serializers.IntegerField(source='id', read_only=True)
 
     class Meta:
         model = RejectedCase
@@ -106,7 +141,7 @@ class RejectedCaseSerializer(serializers.ModelSerializer):
             'id', 'client', 'client_name', 'case_request', 'title', 'description',
             'case_type', 'rejection_reason', 'rejected_by', 'rejected_by_name', 'rejected_at'
         ]
-        read_only_fields = ['id', 'rejected_at']
+        read_only_fields = ['id', 'client', 'rejection_reason', 'rejected_by', 'rejected_at']
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -119,3 +154,29 @@ class PaymentSerializer(serializers.ModelSerializer):
             'stripe_payment_intent_id', 'paid_at', 'created_at'
         ]
         read_only_fields = ['id', 'paid_at', 'created_at']
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeEvent
+        fields = ['seq', 'kind', 'object_type', 'object_id', 'data', 'created_at']
+        read_only_fields = fields
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'],
+                                     default='GET')
+    path = serializers.CharField(help_text='e.g. /api/v1/cases/?page=2')
+    body = serializers.JSONField(required=False, default=None)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"A batch takes at most {settings.BATCH_MAX_REQUESTS} requests.")
+        writes = sum(1 for request in value if request['method'] not in SAFE_METHODS)
+        if writes > settings.BATCH_MAX_WRITES:
+            raise serializers.ValidationError(f"A batch takes at most {settings.BATCH_MAX_WRITES} writes.")
+        return value
@@ -0,0 +1,121 @@
+"""
+Case decision workflows shared by the API views and the admin.
+
+Both functions accept a queryset of case requests so a single decision and
+a bulk admin action go through the same code path. A decision is one
+conditional UPDATE of the request row's status/lawyer/fee (or rejection)
+columns; nothing is copied or deleted.
+"""
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.autocomplete import cases_changed
+from core.changes import record_changes
+from core.models import CaseRequest, Case, RejectedCase
+from core.routing import adjust_loads
+from core.tasks import send_case_approved_email, send_case_rejected_email
+
+DEFAULT_REGISTRATION_FEE = Decimal('500.00')
+
+
+def generate_case_number():
+    return f"CASE-{uuid.uuid4().hex[:8].upper()}"
+
+
+def approve_case_requests(case_requests, lawyer, registration_fee=DEFAULT_REGISTRATION_FEE):
+    """Approve the pending case requests in the queryset, returning the approved cases"""
+    assignees = dict(case_requests.filter(status='pending').values_list('id', 'assigned_lawyer_id'))
+    approved_ids = []
+    now = timezone.now()
+    with transaction.atomic():
+        for pk in assignees:
+            # The status condition makes concurrent decisions on the same request safe
+            if CaseRequest.objects.filter(pk=pk, status='pending').update(
+                status='approved',
+                lawyer=lawyer,
+                case_number=generate_case_number(),
+                registration_fee=registration_fee,
+                approved_at=now,
+                updated_at=now,
+            ):
+                approved_ids.append(pk)
+
+        # The approving lawyer takes the case over from whoever it was routed to
+        deltas = Counter()
+        for pk in approved_ids:
+            if assignees[pk] != lawyer.id:
+                deltas[assignees[pk]] -= 1
+                deltas[lawyer.id] += 1
+        adjust_loads(deltas)
+
+        cases = list(Case.objects.filter(pk__in=approved_ids).select_related('client', 'lawyer'))
+        record_changes('case_request.approved', [
+            (case.id, [case.client_id, case.lawyer_id], {
+                'status': case.status,
+                'lawyer': case.lawyer_id,
+                'case_number': case.case_number,
+                'registration_fee': case.registration_fee,
+            })
+            for case in cases
+        ])
+        cases_changed(cases)
+
+        # Send approval emails asynchronously once the decisions are committed
+        for pk in approved_ids:
+            transaction.on_commit(lambda pk=pk: send_case_approved_email.delay(pk))
+
+    return cases
+
+
+def reject_case_requests(case_requests, lawyer, rejection_reason='No reason provided'):
+    """Reject the pending case requests in the queryset, returning the rejected cases"""
+    pending_ids = list(case_requests.filter(status='pending').values_list('id', flat=True))
+    now = timezone.now()
+    with transaction.atomic():
+        CaseRequest.objects.filter(pk__in=pending_ids, status='pending').update(
+            status='rejected',
+            rejected_by=lawyer,
+            rejection_reason=rejection_reason,
+            rejected_at=now,
+            updated_at=now,
+        )
+        rejected_cases = list(
+            RejectedCase.objects.filter(pk__in=pending_ids, rejected_at=now, rejected_by=lawyer)
+            .select_related('client', 'rejected_by')
+        )
+        record_changes('case_request.rejected', [
+            (rejected_case.id, [rejected_case.client_id, rejected_case.rejected_by_id], {
+                'status': rejected_case.status,
+                'rejected_by': rejected_case.rejected_by_id,
+                'rejection_reason': rejected_case.rejection_reason,
+            })
+            for rejected_case in rejected_cases
+        ])
+        deltas = Counter()
+        for rejected_case in rejected_cases:
+            deltas[rejected_case.assigned_lawyer_id] -= 1
+        adjust_loads(deltas)
+
+        # Send rejection emails asynchronously once the decisions are committed
+        for rejected_case in rejected_cases:
+            transaction.on_commit(lambda pk=rejected_case.id: send_case_rejected_email.delay(pk))
+
+    return rejected_cases
+
+
+def complete_payment(payment):
+    """Mark a payment completed and its case's registration fee paid"""
+    now = timezone.now()
+    with transaction.atomic():
+        payment.status = 'completed'
+        payment.paid_at = now
+        payment.save(update_fields=['status', 'paid_at', 'updated_at'])
+        case = payment.case
+        case.registration_fee_paid = True
+        case.updated_at = now
+        case.save(update_fields=['registration_fee_paid', 'updated_at'])
+    return payment
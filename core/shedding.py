@@ -0,0 +1,229 @@
+"""
+Adaptive concurrency limits and load shedding.
+
+Requests are sorted into the route classes of ``LOAD_SHEDDING_CLASSES`` by
+matching each class's ``pattern`` against the path and query string, first
+match wins. Every class has its own limit on requests in flight in this
+process, so a slow class (the lawyers' pending queue, search) can only tie
+up its own share of the worker threads or event loop, and a request over
+its class's limit is answered at once with 503 and ``Retry-After`` instead
+of queueing behind it.
+
+Limits adapt by AIMD: a request that finishes within the class's
+``target_latency`` raises the limit by ``1 / limit`` (about one per full
+window of requests) while the limit is in use, and a slower or failed one
+cuts it by ``LOAD_SHEDDING_BACKOFF``, at most once per target latency so a
+burst of slow responses counts as one signal. Classes marked ``priority``
+(auth and payment confirmation) are never shed adaptively, only at their
+``max_limit``. Classes without a ``max_limit`` (the live-update stream) are
+not limited.
+
+Streamed responses hold their slot until the body has been sent. State is
+per process and shared by its threads; the current limits, requests in
+flight and shed requests are rendered with the other metrics.
+"""
+import math
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+SHED_RESPONSE = {'detail': 'The server is busy; retry later.'}
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit of one route class"""
+
+    def __init__(self, name, pattern, max_limit=None, min_limit=1, initial_limit=None, target_latency=1.0,
+                 priority=False):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max_limit or 0)
+        self.target_latency = target_latency
+        self.priority = priority
+        self.in_flight = 0
+        self.shed = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.max_limit is not None:
+                ceiling = self.max_limit if self.priority else math.floor(self.limit)
+                if self.in_flight >= ceiling:
+                    self.shed += 1
+                    return False
+            self.in_flight += 1
+            return True
+
+    def release(self, seconds, failed=False):
+        with self._lock:
+            in_use = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            if self.max_limit is None:
+                return
+            if failed or seconds > self.target_latency:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * settings.LOAD_SHEDDING_BACKOFF)
+                    self._last_decrease = now
+            elif in_use:
+                # Only evidence from a limit that is actually reached says it can grow
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class Limiters:
+    """This process's limiters, built from LOAD_SHEDDING_CLASSES on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = None
+
+    @property
+    def all(self):
+        if self._limiters is None:
+            with self._lock:
+                if self._limiters is None:
+                    self._limiters = [AdaptiveLimiter(**options) for options in settings.LOAD_SHEDDING_CLASSES]
+        return self._limiters
+
+    def classify(self, request):
+        path = request.path_info
+        query = request.META.get('QUERY_STRING')
+        if query:
+            path = f"{path}?{query}"
+        for limiter in self.all:
+            if limiter.pattern.search(path):
+                return limiter
+        return None
+
+    def render(self):
+        """Limits, requests in flight and shed requests in the Prometheus text format"""
+        gauges = [
+            ('http_concurrency_limit', 'gauge', 'Adaptive concurrency limit by route class', 'limit'),
+            ('http_requests_in_flight', 'gauge', 'Requests in flight by route class', 'in_flight'),
+            ('http_requests_shed_total', 'counter', 'Requests rejected with 503 by route class', 'shed'),
+        ]
+        lines = []
+        for name, kind, help_text, attribute in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for limiter in self.all:
+                if limiter.max_limit is not None:
+                    value = getattr(limiter, attribute)
+                    lines.append(f'{name}{{class="{limiter.name}"}} {value:.2f}' if isinstance(value, float)
+                                 else f'{name}{{class="{limiter.name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._limiters = None
+
+
+limiters = Limiters()
+
+
+def _shed():
+    response = JsonResponse(SHED_RESPONSE, status=503)
+    response['Retry-After'] = str(settings.LOAD_SHEDDING_RETRY_AFTER)
+    return response
+
+
+class _ReleasingContent:
+    """Streamed content that frees its slot once sent, or when the response is closed unsent"""
+
+    def __init__(self, content, release):
+        self._content = content
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._content)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class _AsyncReleasingContent(_ReleasingContent):
+    def __iter__(self):
+        raise TypeError('Iterate asynchronously')
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._content.__anext__()
+        except BaseException:
+            self.close()
+            raise
+
+
+class LoadSheddingMiddleware:
+    """Enforces the route classes' concurrency limits; works in both sync and async stacks"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        limiter = limiters.classify(request) if settings.LOAD_SHEDDING_ENABLED else None
+        if limiter is None:
+            return self.get_response(request)
+        if not limiter.try_acquire():
+            return _shed()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            limiter.release(time.perf_counter() - started, failed=True)
+            raise
+        return self._finish(limiter, response, started)
+
+    async def __acall__(self, request):
+        limiter = limiters.classify(request) if settings.LOAD_SHEDDING_ENABLED else None
+        if limiter is None:
+            return await self.get_response(request)
+        if not limiter.try_acquire():
+            return _shed()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            # Including the client disconnecting (CancelledError)
+            limiter.release(time.perf_counter() - started, failed=True)
+            raise
+        return self._finish(limiter, response, started)
+
+    def _finish(self, limiter, response, started):
+        failed = response.status_code >= 500
+
+        def release():
+            limiter.release(time.perf_counter() - started, failed)
+
+        if not response.streaming:
+            release()
+        elif response.is_async:
+            response.streaming_content = _AsyncReleasingContent(response.streaming_content, release)
+        else:
+            response.streaming_content = _ReleasingContent(response.streaming_content, release)
+        return response
@@ -0,0 +1,201 @@
+"""
+Model signal handlers that append change-feed events and keep the derived
+counters (lawyer loads, directory facet counts) current, plus the Celery
+task signal handlers that feed the task metrics (core.metrics).
+
+Queryset ``update()`` and ``bulk_create()`` bypass these signals, so the
+code paths that use them (core.services, bulk imports, bulk notes) record
+their events explicitly.
+"""
+import time
+
+from celery.signals import before_task_publish, task_prerun, task_postrun, task_retry, task_failure
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+from core.autocomplete import case_deleted, cases_changed
+from core.changes import record_change, case_request_delta, note_delta
+from core.routing import adjust_loads
+from core.metrics import count_task, install_query_wrapper, observe_task
+from core.directory import adjust_location_counts, location_key
+from core.models import UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment
+
+
+def _deleted_directly(instance, origin):
+    """
+    Cascaded deletes are covered by the event of the object deleted first,
+    and may be removing the recipients themselves.
+    """
+    if origin is None:
+        return True
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model._meta.concrete_model is instance._meta.concrete_model
+
+
+def _case_recipients(case_id):
+    return CaseRequest.objects.filter(pk=case_id).values_list('client_id', 'lawyer_id').first() or ()
+
+
+@receiver(post_save, sender=CaseRequest)
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=RejectedCase)
+def case_request_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    kind = 'case_request.created' if created else 'case_request.updated'
+    fields = None
+    if update_fields:
+        fields = [field for field in update_fields if field != 'updated_at']
+    data = case_request_delta(instance, fields)
+    if not created:
+        data.update(registration_fee_paid=instance.registration_fee_paid)
+    recipients = [instance.client_id, instance.assigned_lawyer_id, instance.lawyer_id, instance.rejected_by_id]
+    record_change(kind, instance.pk, recipients, data)
+    cases_changed([instance])
+
+
+@receiver(post_delete, sender=CaseRequest)
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=RejectedCase)
+def case_request_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(instance, origin):
+        return
+    recipients = [instance.client_id, instance.assigned_lawyer_id, instance.lawyer_id, instance.rejected_by_id]
+    record_change('case_request.deleted', instance.pk, recipients)
+
+
+@receiver(post_delete, sender=CaseRequest)
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=RejectedCase)
+def case_request_load_released(sender, instance, **kwargs):
+    case_deleted(instance.pk)
+    if instance.status == 'pending':
+        adjust_loads({instance.assigned_lawyer_id: -1})
+    elif instance.status == 'approved':
+        adjust_loads({instance.lawyer_id: -1})
+
+
+@receiver(post_save, sender=CaseNote)
+def note_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    kind = 'note.created' if created else 'note.updated'
+    record_change(kind, instance.pk, _case_recipients(instance.case_id), note_delta(instance))
+
+
+@receiver(post_delete, sender=CaseNote)
+def note_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(instance, origin):
+        return
+    record_change('note.deleted', instance.pk, _case_recipients(instance.case_id), {'case': instance.case_id})
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.status == 'completed':
+        kind = 'payment.completed'
+    else:
+        kind = 'payment.created' if created else 'payment.updated'
+    data = {
+        'case': instance.case_id,
+        'amount': instance.amount,
+        'status': instance.status,
+        'paid_at': instance.paid_at,
+    }
+    record_change(kind, instance.pk, _case_recipients(instance.case_id), data)
+
+
+LOCATION_FIELDS = {'role', 'state', 'city'}
+
+
+@receiver(post_init, sender=UserProfile)
+def profile_loaded(sender, instance, **kwargs):
+    # Remember which directory facet the stored row counts towards
+    if instance.pk is None:
+        instance._location_key = None
+    elif LOCATION_FIELDS & instance.get_deferred_fields():
+        instance._location_key = 'unknown'
+    else:
+        instance._location_key = location_key(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or instance._location_key == 'unknown':
+        return
+    if update_fields is not None and not LOCATION_FIELDS & set(update_fields):
+        return
+    old_key, new_key = instance._location_key, location_key(instance)
+    if old_key != new_key:
+        deltas = {}
+        if old_key is not None:
+            deltas[old_key] = -1
+        if new_key is not None:
+            deltas[new_key] = 1
+        adjust_location_counts(deltas)
+    instance._location_key = new_key
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    if instance._location_key not in (None, 'unknown'):
+        adjust_location_counts({instance._location_key: -1})
+
+
+@receiver(post_migrate)
+def search_triggers_restored(sender, using, **kwargs):
+    if sender.name == 'core':
+        # A DRF filter backend module (see core.lazy)
+        from core.search import ensure_triggers
+        ensure_triggers(connections[using])
+
+
+@receiver(connection_created)
+def query_metrics_installed(sender, connection, **kwargs):
+    install_query_wrapper(connection)
+
+
+@before_task_publish.connect
+def task_enqueued(headers=None, **kwargs):
+    # Wall clock, as it is read by a worker process, possibly on another host
+    if headers is not None:
+        headers.setdefault('enqueued_at', time.time())
+
+
+@task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    request = task.request
+    request.metrics_started = time.perf_counter()
+    enqueued_at = getattr(request, 'enqueued_at', None)
+    if enqueued_at is None:
+        # Eager tasks are never published
+        return
+    # A countdown or retry delay is not time spent waiting for a worker
+    eta = parse_datetime(request.eta) if isinstance(request.eta, str) else None
+    ready_at = max(enqueued_at, eta.timestamp()) if eta is not None else enqueued_at
+    queue = (request.delivery_info or {}).get('routing_key') or 'unknown'
+    observe_task('celery_task_queue_wait_seconds', max(0.0, time.time() - ready_at), task=task.name, queue=queue)
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = getattr(task.request, 'metrics_started', None)
+    if started is not None:
+        observe_task('celery_task_duration_seconds', time.perf_counter() - started,
+                     task=task.name, state=state or 'UNKNOWN')
+
+
+@task_retry.connect
+def task_retried(sender=None, **kwargs):
+    count_task('celery_task_retries_total', task=sender.name)
+
+
+@task_failure.connect
+def task_failed(sender=None, exception=None, **kwargs):
+    count_task('celery_task_failures_total', task=sender.name, exception=type(exception).__name__)
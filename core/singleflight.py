@@ -0,0 +1,327 @@
+"""
+Request coalescing (single-flight) for expensive identical reads.
+
+Identical concurrent GETs share one computation: the first request for a
+key (the leader) runs the view while later ones (followers) wait for its
+result and answer with a copy of it. The key is the method, host, path and
+sorted query string, the database the request reads from (see
+core.replicas) and a scope:
+
+* ``'user'``: the requesting user, for querysets scoped to them (the
+  default; anything else must return the same data for every caller),
+* ``'role'``: the user's role and staff flag,
+* ``'global'``: every authenticated caller.
+
+Within a process, followers in any thread or event loop join the leader's
+in-flight ``Flight``. With ``SINGLE_FLIGHT_CACHE`` naming a shared cache,
+the leader also holds a lock in it: leaders in other processes that find
+the lock taken poll for the result the holder stores under its lock token,
+and compute it themselves if it does not arrive within
+``SINGLE_FLIGHT_TIMEOUT``. A result is only handed to requests that were
+waiting for it, never cached for later ones.
+
+Only complete responses are shared: DRF ``Response`` data and status, or
+the content of a plain ``HttpResponse``. Decorate handlers that run after
+authentication and permission checks (viewset actions, ``get``), and call
+``acoalesce`` inside async views once they know the user. Requests per
+outcome (``leader``, ``coalesced`` in-process, ``remote`` across processes)
+are counted by name and rendered with the other metrics.
+"""
+import asyncio
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from core.replicas import read_database
+
+
+class Flight:
+    """One in-process computation and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, timeout):
+        if not self.done.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    async def await_(self, timeout):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if not self.done.is_set():
+                self._waiters.append((loop, future))
+            else:
+                future.set_result(None)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class FlightGroup:
+    """This process's in-flight computations by key, and the per-name outcome counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.outcomes = Counter()
+
+    def join(self, key):
+        """(flight, True) for the leader, who must ``leave`` it, or (flight, False) for a follower"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def leave(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(result, error)
+
+    def count(self, name, outcome):
+        with self._lock:
+            self.outcomes[name, outcome] += 1
+
+    def render(self):
+        """Outcome counters in the Prometheus text format"""
+        lines = [
+            '# HELP single_flight_requests_total Requests by coalesced computation and outcome',
+            '# TYPE single_flight_requests_total counter',
+        ]
+        with self._lock:
+            for (name, outcome), value in sorted(self.outcomes.items()):
+                lines.append(f'single_flight_requests_total{{name="{name}",outcome="{outcome}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._flights.clear()
+            self.outcomes.clear()
+
+
+flights = FlightGroup()
+
+
+def request_key(request, scope='user', user=None):
+    """
+    The coalescing key of ``request`` (a Django or DRF request) under
+    ``scope``, for ``user`` or the request's authenticated user
+    """
+    if scope == 'global':
+        scope_key = 'global'
+    else:
+        user = user if user is not None else getattr(request, 'user', None)
+        if scope == 'role':
+            scope_key = f"role:{getattr(getattr(user, 'profile', None), 'role', None)}:{getattr(user, 'is_staff', False)}"
+        else:
+            scope_key = f"user:{getattr(user, 'pk', None)}"
+    request = getattr(request, '_request', request)
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f"{request.method}:{request.get_host()}:{request.path}?{query}:{read_database(None)}:{scope_key}"
+
+
+def _snapshot(response):
+    """A shareable copy of a complete response, or None if it cannot be shared"""
+    if isinstance(response, Response):
+        return ('drf', response.data, response.status_code, dict(response.items()))
+    if isinstance(response, HttpResponse):
+        return ('http', response.content, response.status_code, dict(response.items()))
+    return None
+
+
+def _restore(snapshot):
+    kind, body, status, headers = snapshot
+    if kind == 'drf':
+        return Response(body, status=status, headers=headers)
+    return HttpResponse(body, status=status, headers=headers)
+
+
+def _cache():
+    return caches[settings.SINGLE_FLIGHT_CACHE] if settings.SINGLE_FLIGHT_CACHE else None
+
+
+def _lock_key(key):
+    # Hashed: request keys can exceed memcached's key length and contain spaces
+    return f"single-flight:lock:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+def _result_key(token):
+    return f"single-flight:result:{token}"
+
+
+def _claim(cache, key):
+    """(True, our token) if we took the cross-process lock, else (False, the holder's token)"""
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, settings.SINGLE_FLIGHT_TIMEOUT):
+        return True, token
+    return False, cache.get(_lock_key(key))
+
+
+def _poll(cache, key, token):
+    """(the holder's stored result or None, whether the holder has released the lock)"""
+    result = cache.get(_result_key(token))
+    if result is None and cache.get(_lock_key(key)) != token:
+        # Released between our checks: the result may have just landed
+        result = cache.get(_result_key(token))
+        return result, True
+    return result, False
+
+
+def _publish(cache, key, token, snapshot):
+    try:
+        if snapshot is not None:
+            cache.set(_result_key(token), snapshot, settings.SINGLE_FLIGHT_TIMEOUT)
+    finally:
+        if cache.get(_lock_key(key)) == token:
+            cache.delete(_lock_key(key))
+
+
+def _lead(key, compute):
+    """Run ``compute`` as this process's leader, coalescing across processes if configured"""
+    cache = _cache()
+    if cache is None:
+        return compute(), 'leader'
+    claimed, token = _claim(cache, key)
+    if not claimed and token is not None:
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            snapshot, released = _poll(cache, key, token)
+            if snapshot is not None:
+                return _restore(snapshot), 'remote'
+            if released:
+                break
+    response = compute()
+    if claimed:
+        _publish(cache, key, token, _snapshot(response))
+    return response, 'leader'
+
+
+async def _alead(key, compute):
+    cache = _cache()
+    if cache is None:
+        return await compute(), 'leader'
+    claimed, token = await sync_to_async(_claim)(cache, key)
+    if not claimed and token is not None:
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            snapshot, released = await sync_to_async(_poll)(cache, key, token)
+            if snapshot is not None:
+                return _restore(snapshot), 'remote'
+            if released:
+                break
+    response = await compute()
+    if claimed:
+        await sync_to_async(_publish)(cache, key, token, _snapshot(response))
+    return response, 'leader'
+
+
+def coalesce(name, key, compute):
+    """``compute()``'s response, shared with identical concurrent calls for ``key``"""
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return compute()
+    flight, leader = flights.join(key)
+    if not leader:
+        if flight.wait(settings.SINGLE_FLIGHT_TIMEOUT) and flight.result is not None:
+            flights.count(name, 'coalesced')
+            return _restore(flight.result)
+        # The leader timed out or its response cannot be shared
+        return compute()
+    try:
+        response, outcome = _lead(key, compute)
+    except BaseException as error:
+        flights.leave(key, flight, error=error if isinstance(error, Exception) else None)
+        raise
+    flights.leave(key, flight, result=_snapshot(response))
+    flights.count(name, outcome)
+    return response
+
+
+async def acoalesce(name, key, compute):
+    """``coalesce`` for async views; ``compute`` is a coroutine function"""
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await compute()
+    flight, leader = flights.join(key)
+    if not leader:
+        if await flight.await_(settings.SINGLE_FLIGHT_TIMEOUT) and flight.result is not None:
+            flights.count(name, 'coalesced')
+            return _restore(flight.result)
+        return await compute()
+    try:
+        response, outcome = await _alead(key, compute)
+    except BaseException as error:
+        # Cancellation included, so followers are never left waiting on a dead leader
+        flights.leave(key, flight, error=error if isinstance(error, Exception) else None)
+        raise
+    flights.leave(key, flight, result=_snapshot(response))
+    flights.count(name, outcome)
+    return response
+
+
+def single_flight(scope='user', name=None):
+    """
+    Coalesce identical concurrent GETs to the decorated view or viewset
+    action; other methods pass straight through.
+    """
+    def decorator(view):
+        flight_name = name or view.__qualname__
+
+        def split(args):
+            # Viewset methods take (self, request, ...), view functions (request, ...)
+            return args[1] if len(args) > 1 and hasattr(args[1], 'method') else args[0]
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                request = split(args)
+                if request.method != 'GET':
+                    return await view(*args, **kwargs)
+                return await acoalesce(flight_name, request_key(request, scope), lambda: view(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = split(args)
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            return coalesce(flight_name, request_key(request, scope), lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+"""
+Cold-start measurement of the processes the project runs.
+
+Each target is started in a fresh interpreter, optionally under
+``-X importtime``, whose per-module timings ``parse_importtime`` turns into
+records. Used by ``manage.py import_profile`` and ``manage.py benchmark
+startup``.
+"""
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+TARGETS = {
+    # The system checks, which import the URLconf, models and admin
+    'check': ['manage.py', 'check'],
+    # A WSGI worker up to the point it can route its first request
+    'wsgi': ['-c', 'from lawsuitapp.wsgi import application; '
+                   'from django.urls import get_resolver; get_resolver().url_patterns'],
+    # A Celery worker's app with its task modules loaded
+    'celery': ['-c', 'from lawsuitapp.celery import app; app.loader.import_default_modules()'],
+}
+
+# Modules no target should import until a request or task needs them (see core.lazy)
+DEFERRED_MODULES = ['numpy', 'httpx', 'drf_spectacular.views', 'psycopg_pool']
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    # The record of the module whose import triggered this one
+    parent: 'ImportRecord' = None
+
+    def chain(self):
+        """Module names from the outermost import down to this one"""
+        names = []
+        record = self
+        while record is not None:
+            names.insert(0, record.module)
+            record = record.parent
+        return names
+
+
+def run_target(target, importtime=False):
+    """Start ``target`` in a new interpreter; returns (seconds, stderr)"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += TARGETS[target]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{target} exited with {completed.returncode}: {completed.stderr[-2000:]}")
+    return seconds, completed.stderr
+
+
+def parse_importtime(stderr):
+    """
+    ImportRecords from ``-X importtime`` output. Python prints a module
+    after its children, nested two spaces deeper per level.
+    """
+    records = []
+    orphans = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        head, cumulative_us, name = line.split('|', 2)
+        self_us = head.split(':', 1)[1]
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        record = ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth)
+        # Its children were printed first and are still waiting for a parent
+        while orphans and orphans[-1].depth > depth:
+            orphans.pop().parent = record
+        orphans.append(record)
+        records.append(record)
+    return records
@@ -0,0 +1,275 @@
+"""
+Synthetic production-shaped data for local load testing.
+
+Generates clients and lawyers with locations and specializations, then case
+requests filed over the past ``days`` in batches: each batch is inserted
+with ``bulk_create`` together with the notes and payments of its approved
+cases, so memory stays flat however many millions of rows are asked for.
+Every username starts with ``prefix``, which ``purge`` deletes by.
+
+Rows go straight to the tables: no change events are recorded and lawyer
+loads and directory facets are recomputed once at the end. Timestamps are
+written as generated instead of by ``auto_now``/``auto_now_add``.
+"""
+import contextlib
+import math
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from core.directory import rebuild_location_counts
+from core.models import CaseNote, CaseRequest, Payment, UserProfile
+from core.routing import recompute_loads
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Ananya', 'Arjun', 'Divya', 'Ishaan', 'Kavya', 'Meera', 'Nikhil', 'Priya',
+    'Rahul', 'Riya', 'Rohan', 'Sanjay', 'Shreya', 'Sneha', 'Tanvi', 'Varun', 'Vikram', 'Zoya',
+]
+LAST_NAMES = [
+    'Agarwal', 'Bose', 'Chopra', 'Das', 'Gupta', 'Iyer', 'Joshi', 'Kapoor', 'Khan', 'Menon',
+    'Mehta', 'Nair', 'Patel', 'Rao', 'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma', 'Yadav',
+]
+# (state, cities, zipcode prefix), most populous first so locations are skewed like real traffic
+LOCATIONS = [
+    ('Maharashtra', ['Mumbai', 'Pune', 'Nagpur'], '4'),
+    ('Delhi', ['New Delhi'], '11'),
+    ('Karnataka', ['Bengaluru', 'Mysuru'], '56'),
+    ('Tamil Nadu', ['Chennai', 'Coimbatore'], '6'),
+    ('Telangana', ['Hyderabad'], '50'),
+    ('West Bengal', ['Kolkata'], '7'),
+    ('Gujarat', ['Ahmedabad', 'Surat'], '38'),
+    ('Kerala', ['Kochi', 'Thiruvananthapuram'], '68'),
+]
+# Case type: (share of filings, title subjects)
+CASE_TYPES = {
+    'Civil': (30, ['Breach of contract', 'Recovery of dues', 'Tenancy dispute', 'Defamation claim']),
+    'Family': (20, ['Divorce petition', 'Child custody', 'Maintenance claim', 'Succession dispute']),
+    'Property': (18, ['Title dispute', 'Boundary encroachment', 'Builder delay', 'Partition suit']),
+    'Criminal': (14, ['Bail application', 'Cheque bounce complaint', 'Cyber fraud complaint', 'Anticipatory bail']),
+    'Corporate': (10, ['Shareholder dispute', 'Insolvency claim', 'Vendor arbitration', 'Trademark infringement']),
+    'Tax': (8, ['GST assessment appeal', 'Income tax notice', 'Customs duty appeal', 'Tax refund claim']),
+}
+NOTE_TEMPLATES = [
+    'Uploaded the {document} for review.',
+    'Hearing scheduled for {date}; please confirm availability.',
+    'Received the {document} from the opposing counsel.',
+    'Drafted the response and shared it for comments.',
+    'Client requested an update on the {document}.',
+    'Filed the {document} with the registry.',
+]
+DOCUMENTS = ['affidavit', 'agreement', 'notice', 'invoice copies', 'power of attorney', 'written statement']
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values set on the instances"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Generator:
+    """
+    Inserts one synthetic data set; ``counts`` tallies the rows per model.
+
+    ``approved_ratio`` and ``rejected_ratio`` split the case requests into
+    lifecycle states (the rest stay pending), ``notes_per_case`` is the mean
+    number of notes on an approved case and ``paid_ratio`` the share of
+    approved cases with a payment.
+    """
+
+    def __init__(self, prefix=None, seed=None, days=365, batch_size=5000, password='synthetic-password',
+                 approved_ratio=0.4, rejected_ratio=0.2, notes_per_case=3.0, paid_ratio=0.7):
+        self.prefix = prefix or f"synthetic-{uuid.uuid4().hex[:6]}"
+        self.random = random.Random(seed)
+        self.days = days
+        self.batch_size = batch_size
+        # Hashing is deliberately slow, so every generated user shares one hash
+        self.password_hash = make_password(password)
+        self.approved_ratio = approved_ratio
+        self.rejected_ratio = rejected_ratio
+        self.notes_per_case = notes_per_case
+        self.paid_ratio = paid_ratio
+        self.now = timezone.now()
+        self.counts = {'users': 0, 'case_requests': 0, 'cases': 0, 'rejected_cases': 0, 'notes': 0, 'payments': 0}
+        self._case_types = list(CASE_TYPES)
+        self._case_type_weights = [share for share, _ in CASE_TYPES.values()]
+        self._location_weights = [1 / (rank + 1) for rank in range(len(LOCATIONS))]
+
+    def _past(self, latest=None):
+        """A random moment in the window, skewed towards the present like a growing service"""
+        span = self.days * 86400
+        moment = self.now - timedelta(seconds=span * (1 - math.sqrt(self.random.random())))
+        return moment if latest is None else min(moment, latest)
+
+    def _after(self, moment, min_hours, max_hours):
+        return min(self.now, moment + timedelta(hours=self.random.uniform(min_hours, max_hours)))
+
+    def _profile(self, user, role):
+        state, cities, zip_prefix = self.random.choices(LOCATIONS, self._location_weights)[0]
+        profile = UserProfile(
+            user=user, role=role, state=state, city=self.random.choice(cities),
+            zipcode=zip_prefix + ''.join(self.random.choices('0123456789', k=6 - len(zip_prefix))),
+            phone=f"+91 9{self.random.randint(100_000_000, 999_999_999)}",
+            created_at=user.date_joined, updated_at=user.date_joined,
+        )
+        if role == 'lawyer':
+            profile.specialization = self.random.choices(self._case_types, self._case_type_weights)[0].lower()
+            profile.bio = (
+                f"{self.random.randint(2, 30)} years of practice in {profile.specialization} law "
+                f"before the courts of {profile.city}."
+            )
+        return profile
+
+    def users(self, role, count):
+        """Create ``count`` users of ``role`` with profiles; returns their ids"""
+        ids = []
+        for start in range(0, count, self.batch_size):
+            users = []
+            for i in range(start, min(count, start + self.batch_size)):
+                first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+                username = f"{self.prefix}-{role}-{i}"
+                users.append(User(
+                    username=username, email=f"{username}@example.com", first_name=first, last_name=last,
+                    password=self.password_hash, date_joined=self._past(),
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                # bulk_create only returns primary keys on backends that support RETURNING
+                users = list(User.objects.filter(username__in=[user.username for user in users]).order_by('id'))
+                with explicit_timestamps(UserProfile):
+                    UserProfile.objects.bulk_create([self._profile(user, role) for user in users])
+            ids.extend(user.id for user in users)
+        self.counts['users'] += len(ids)
+        return ids
+
+    def _case_request(self, client_id, lawyer_ids, index):
+        case_type = self.random.choices(self._case_types, self._case_type_weights)[0]
+        created_at = self._past()
+        case_request = CaseRequest(
+            client_id=client_id,
+            title=f"{self.random.choice(CASE_TYPES[case_type][1])} #{index}",
+            description=(
+                f"{case_type} matter filed on {created_at:%d %b %Y}. "
+                f"The client seeks advice on the {self.random.choice(DOCUMENTS)} and next steps."
+            ),
+            case_type=case_type,
+            # Log-normal: most claims are small, a few are very large
+            amount_involved=Decimal(min(round(self.random.lognormvariate(11, 1.5), 2), 10 ** 12)).quantize(Decimal('0.01')),
+            requested_lawyer_type=case_type if self.random.random() < 0.7 else None,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        outcome = self.random.random()
+        lawyer_id = self.random.choice(lawyer_ids)
+        if outcome < self.approved_ratio:
+            case_request.status = 'approved'
+            case_request.lawyer_id = lawyer_id
+            case_request.case_number = f"CASE-{uuid.UUID(int=self.random.getrandbits(128)).hex[:12].upper()}"
+            case_request.registration_fee = Decimal(self.random.choice([500, 1000, 2500, 5000]))
+            case_request.approved_at = case_request.updated_at = self._after(created_at, 1, 21 * 24)
+        elif outcome < self.approved_ratio + self.rejected_ratio:
+            case_request.status = 'rejected'
+            case_request.rejected_by_id = lawyer_id
+            case_request.rejection_reason = self.random.choice([
+                'Outside my area of practice', 'Insufficient documents', 'Conflict of interest', 'Time-barred claim',
+            ])
+            case_request.rejected_at = case_request.updated_at = self._after(created_at, 1, 21 * 24)
+        else:
+            case_request.assigned_lawyer_id = lawyer_id
+            case_request.assigned_at = created_at
+        return case_request
+
+    def _notes_and_payments(self, cases):
+        notes = []
+        payments = []
+        for case in cases:
+            # Roughly Poisson distributed around notes_per_case
+            count = sum(1 for _ in range(int(self.notes_per_case * 2)) if self.random.random() < 0.5)
+            for _ in range(count):
+                created_at = self._after(case.approved_at, 0, 60 * 24)
+                notes.append(CaseNote(
+                    case_id=case.id, author_id=self.random.choice([case.client_id, case.lawyer_id]),
+                    content=self.random.choice(NOTE_TEMPLATES).format(
+                        document=self.random.choice(DOCUMENTS), date=f"{self._after(created_at, 24, 30 * 24):%d %b %Y}"
+                    ),
+                    created_at=created_at, updated_at=created_at,
+                ))
+            if self.random.random() < self.paid_ratio:
+                created_at = self._after(case.approved_at, 0, 7 * 24)
+                status = self.random.choices(['completed', 'pending', 'failed'], [85, 10, 5])[0]
+                payments.append(Payment(
+                    case_id=case.id, amount=case.registration_fee, status=status,
+                    stripe_payment_intent_id=f"pi_{uuid.UUID(int=self.random.getrandbits(128)).hex[:24]}",
+                    paid_at=created_at if status == 'completed' else None,
+                    created_at=created_at, updated_at=created_at,
+                ))
+        CaseNote.objects.bulk_create(notes)
+        Payment.objects.bulk_create(payments)
+        paid = [payment.case_id for payment in payments if payment.status == 'completed']
+        CaseRequest.objects.filter(id__in=paid).update(registration_fee_paid=True)
+        self.counts['notes'] += len(notes)
+        self.counts['payments'] += len(payments)
+
+    def case_requests(self, client_ids, lawyer_ids, count, progress=None):
+        """File ``count`` case requests spread over the clients, in batches"""
+        for start in range(0, count, self.batch_size):
+            batch = [
+                self._case_request(self.random.choice(client_ids), lawyer_ids, i)
+                for i in range(start, min(count, start + self.batch_size))
+            ]
+            with transaction.atomic(), explicit_timestamps(CaseRequest, CaseNote, Payment):
+                CaseRequest.objects.bulk_create(batch)
+                cases = [case_request for case_request in batch if case_request.status == 'approved']
+                if cases and cases[0].pk is None:
+                    ids = dict(CaseRequest.objects.filter(
+                        case_number__in=[case.case_number for case in cases]
+                    ).values_list('case_number', 'id'))
+                    for case in cases:
+                        case.id = ids[case.case_number]
+                self._notes_and_payments(cases)
+            self.counts['case_requests'] += len(batch)
+            self.counts['cases'] += len(cases)
+            self.counts['rejected_cases'] += sum(1 for case_request in batch if case_request.status == 'rejected')
+            if progress is not None:
+                progress(self.counts)
+
+    def generate(self, clients, lawyers, case_requests, progress=None):
+        client_ids = self.users('client', clients)
+        lawyer_ids = self.users('lawyer', lawyers)
+        self.case_requests(client_ids, lawyer_ids, case_requests, progress)
+        recompute_loads()
+        rebuild_location_counts()
+        return self.counts
+
+
+def purge(prefix, batch_size=1000):
+    """Delete the users generated with ``prefix`` and everything they filed; returns the number of users"""
+    users = User.objects.filter(username__startswith=f"{prefix}-").order_by().values_list('id', flat=True)
+    deleted = 0
+    while True:
+        ids = list(users[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            CaseRequest.objects.filter(client_id__in=ids).delete()
+            User.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+    recompute_loads()
+    rebuild_location_counts()
+    return deleted
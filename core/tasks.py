@@ -1,14 +1,33 @@
-from celery import shared_task
+import time
+
+from celery import current_task, shared_task
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from core.models import Case, RejectedCase
+from core.analytics import DATASETS, snapshot_dataset
+from core.changes import compact_events, purge_events
+from core.metrics import observe_task
+from core.routing import route_unassigned
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _send_mail(**kwargs):
+    """send_mail, timed into the celery_smtp_send_seconds metric"""
+    task = current_task.name if current_task else 'none'
+    outcome = 'failed'
+    started = time.perf_counter()
+    try:
+        sent = send_mail(**kwargs)
+        outcome = 'sent'
+        return sent
+    finally:
+        observe_task('celery_smtp_send_seconds', time.perf_counter() - started, task=task, outcome=outcome)
+
+
 @shared_task
 def send_case_approved_email(case_id):
     """Send email to client when case is approved"""
@@ -43,7 +62,7 @@ def send_case_approved_email(case_id):
         
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        _send_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -92,7 +111,7 @@ def send_case_rejected_email(rejected_case_id):
         
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        _send_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -138,7 +157,7 @@ def send_payment_reminder_email(case_id):
             
             plain_message = strip_tags(html_message)
             
-            send_mail(
+            _send_mail(
                 subject=subject,
                 message=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
@@ -151,3 +170,46 @@ def send_payment_reminder_email(case_id):
     
     except Exception as e:
         logger.error(f"Error sending payment reminder for case {case_id}: {str(e)}")
+
+
+@shared_task
+def archive_old_rows():
+    """Move rows past the hot window into archive segments"""
+    # Segments hold the rows serialized as the API renders them (see core.lazy)
+    from core.archive import ARCHIVES, archive_dataset
+
+    for dataset in ARCHIVES:
+        moved = archive_dataset(dataset)
+        logger.info(f"Archived {moved} {dataset} rows")
+
+
+@shared_task
+def compact_change_events():
+    """Purge change events past retention and merge older events per object"""
+    purged = purge_events()
+    compacted = compact_events()
+    logger.info(f"Purged {purged} change events, compacted away {compacted}")
+
+
+@shared_task
+def route_unassigned_requests():
+    """Assign pending case requests that no lawyer could take when filed"""
+    routed = route_unassigned()
+    logger.info(f"Routed {routed} unassigned case requests")
+
+
+@shared_task
+def refresh_analytics_snapshots():
+    """Merge rows changed since the last snapshot into the analytics snapshots"""
+    for dataset in DATASETS:
+        read, total = snapshot_dataset(dataset)
+        logger.info(f"Analytics snapshot {dataset}: read {read} rows, {total} in total")
+
+
+@shared_task
+def purge_revoked_tokens():
+    """Delete revoked refresh tokens that have expired anyway"""
+    # Builds on simplejwt (see core.lazy)
+    from core.revocation import purge_revoked_tokens as purge
+
+    logger.info(f"Purged {purge()} expired revoked tokens")
@@ -1,3 +1,1061 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from core.analytics import _refresh_lock, load_snapshot, snapshot_dataset
+from core.archive import archive_dataset, read_archive
+from core.benchmarks.filters import plan_checks
+from core.changes import compact_events, purge_events, record_change
+from core.checks import check_replica_pin_cache
+from core.events import InProcessHub, event_payload, event_stream, format_event, publish_events
+from core.models import (
+    ArchiveSegment, Case, CaseNote, CaseRequest, ChangeEvent, Payment, RevokedToken, UserProfile,
+)
+from core.payments import PaymentProviderError, StripeClient
+from core.replicas import ReplicaMiddleware, lag_monitor, routed
+from core.revocation import revocations, revoke
+from core.routing import route_case_requests, route_unassigned
+from core.search import FullTextSearchFilter, fts5_query, tsquery
+from core.services import approve_case_requests, reject_case_requests
+from core.shedding import SHED_RESPONSE, AdaptiveLimiter, LoadSheddingMiddleware, limiters
+from core.singleflight import _claim, _publish, _snapshot, flights, request_key, single_flight
+
+
+def make_user(username, role, **profile):
+    user = User.objects.create_user(username=username, password='password', email=f"{username}@example.com")
+    UserProfile.objects.create(user=user, role=role, **profile)
+    return user
+
+
+def make_case_request(client, **fields):
+    fields.setdefault('title', 'Boundary dispute')
+    fields.setdefault('description', 'The neighbour moved the fence')
+    fields.setdefault('case_type', 'Civil')
+    fields.setdefault('amount_involved', '25000.00')
+    fields.setdefault('requested_lawyer_type', 'Civil')
+    return CaseRequest.objects.create(client=client, **fields)
+
+
+class CaseLifecycleTests(TestCase):
+    """Cases change status only through the approve/reject actions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+        cls.case = approve_case_requests(
+            CaseRequest.objects.filter(pk=make_case_request(cls.client_user).pk), cls.lawyer
+        )[0]
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def test_case_cannot_be_moved_back_to_pending(self):
+        response = self.api.patch(f"/api/v1/cases/{self.case.pk}/",
+                                  {'status': 'pending', 'registration_fee_paid': True}, format='json')
+        self.assertEqual(response.status_code, 405)
+        case = Case.objects.get(pk=self.case.pk)
+        self.assertEqual(case.status, 'approved')
+        self.assertFalse(case.registration_fee_paid)
+
+    def test_case_cannot_be_created_directly(self):
+        response = self.api.post('/api/v1/cases/', {
+            'title': 'Forged', 'description': 'Never approved', 'case_type': 'Civil',
+            'amount_involved': '1.00', 'status': 'approved', 'lawyer': self.lawyer.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(CaseRequest.objects.filter(title='Forged').exists())
+
+
+class AdminQueryCountTests(TestCase):
+    """Admin changelists and bulk actions run a fixed number of queries however many rows they show"""
+    CHANGELISTS = {
+        '/admin/core/userprofile/': 4,
+        '/admin/core/caserequest/': 5,
+        '/admin/core/case/': 5,
+        '/admin/core/payment/': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.client_user = make_user('client', 'client')
+        cls.lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+        cls.seed(10)
+
+    @classmethod
+    def seed(cls, count):
+        """``count`` more requests, half of them approved with a payment"""
+        ids = [make_case_request(cls.client_user).pk for _ in range(count)]
+        for case in approve_case_requests(CaseRequest.objects.filter(pk__in=ids[::2]), cls.lawyer):
+            Payment.objects.create(case=case, amount=case.registration_fee)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertChangelists(self):
+        for url, expected in self.CHANGELISTS.items():
+            with self.subTest(url=url), self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_changelists(self):
+        self.assertChangelists()
+        self.seed(40)
+        self.assertChangelists()
+
+    def pending(self, count):
+        return list(CaseRequest.objects.filter(status='pending').values_list('pk', flat=True)[:count])
+
+    def test_approve_selected(self):
+        for count in (1, 4):
+            ids = self.pending(count)
+            # One conditional UPDATE per request, for its own case number
+            with self.subTest(count=count), self.assertNumQueries(9 + count):
+                self.client.post('/admin/core/caserequest/', {'action': 'approve_selected', '_selected_action': ids})
+            self.assertEqual(Case.objects.filter(pk__in=ids).count(), count)
+
+    def test_reject_selected(self):
+        for count in (1, 4):
+            ids = self.pending(count)
+            with self.subTest(count=count), self.assertNumQueries(9):
+                self.client.post('/admin/core/caserequest/', {'action': 'reject_selected', '_selected_action': ids})
+            self.assertEqual(CaseRequest.objects.filter(pk__in=ids, status='rejected').count(), count)
+
+
+class FilterTests(TestCase):
+    """The list filters return only matching rows the requesting role may see, through indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.other_client = make_user('other-client', 'client')
+        cls.lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+        cls.other_lawyer = make_user('other-lawyer', 'lawyer', specialization='tax')
+        now = timezone.now()
+
+        cls.small = make_case_request(cls.client_user, case_type='Civil', amount_involved='1000.00',
+                                      assigned_lawyer=cls.lawyer)
+        cls.large = make_case_request(cls.client_user, case_type='Family', amount_involved='90000.00',
+                                      assigned_lawyer=cls.lawyer)
+        cls.old = make_case_request(cls.client_user, case_type='Civil', assigned_lawyer=cls.other_lawyer)
+        CaseRequest.objects.filter(pk=cls.old.pk).update(created_at=now - timedelta(days=60))
+        cls.foreign = make_case_request(cls.other_client, case_type='Civil', assigned_lawyer=cls.lawyer)
+
+        cls.case = approve_case_requests(CaseRequest.objects.filter(pk=make_case_request(
+            cls.client_user, case_type='Tax', amount_involved='3000.00').pk), cls.lawyer)[0]
+        cls.other_case = approve_case_requests(CaseRequest.objects.filter(pk=make_case_request(
+            cls.client_user, case_type='Tax', amount_involved='3000.00').pk), cls.other_lawyer)[0]
+        cls.rejected = reject_case_requests(CaseRequest.objects.filter(pk=make_case_request(
+            cls.client_user).pk), cls.lawyer)[0]
+        cls.payment = Payment.objects.create(case=cls.case, amount=Decimal('500.00'), status='completed', paid_at=now)
+        Payment.objects.create(case=cls.other_case, amount=Decimal('500.00'))
+
+    def ids(self, user, path):
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_case_requests_for_client(self):
+        self.assertEqual(self.ids(self.client_user, '/api/v1/case-requests/?case_type=Civil&status=pending'),
+                         {self.small.pk, self.old.pk})
+        self.assertEqual(self.ids(self.client_user, '/api/v1/case-requests/?amount_involved_min=50000'),
+                         {self.large.pk})
+        month_ago = (timezone.now() - timedelta(days=30)).date().isoformat()
+        self.assertNotIn(self.old.pk, self.ids(self.client_user, f"/api/v1/case-requests/?created_at_after={month_ago}"))
+
+    def test_case_requests_for_lawyer(self):
+        # The inbox: pending requests routed to the lawyer, whoever filed them
+        self.assertEqual(self.ids(self.lawyer, '/api/v1/case-requests/?case_type=Civil'),
+                         {self.small.pk, self.foreign.pk})
+        self.assertEqual(self.ids(self.other_lawyer, '/api/v1/case-requests/?case_type=Civil,Family'),
+                         {self.old.pk})
+
+    def test_cases(self):
+        self.assertEqual(self.ids(self.client_user, f"/api/v1/cases/?lawyer={self.other_lawyer.pk}"),
+                         {self.other_case.pk})
+        self.assertEqual(self.ids(self.lawyer, '/api/v1/cases/?amount_involved_min=2000&amount_involved_max=4000'),
+                         {self.case.pk})
+        self.assertEqual(self.ids(self.lawyer, '/api/v1/cases/?registration_fee_paid=true'), set())
+        self.assertEqual(self.ids(self.other_lawyer, '/api/v1/cases/?case_type=Civil'), set())
+
+    def test_rejected_cases(self):
+        self.assertEqual(self.ids(self.lawyer, '/api/v1/rejected-cases/?case_type=Civil'), {self.rejected.pk})
+        self.assertEqual(self.ids(self.other_lawyer, '/api/v1/rejected-cases/'), set())
+
+    def test_payments(self):
+        week_ago = (timezone.now() - timedelta(days=7)).date().isoformat()
+        self.assertEqual(self.ids(self.lawyer, f"/api/v1/payments/?paid_at_after={week_ago}"), {self.payment.pk})
+        self.assertEqual(self.ids(self.client_user, '/api/v1/payments/?status=completed'), {self.payment.pk})
+
+    def test_plans_use_indexes(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The test tables are tiny; make the planner show what it would use at scale
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f"No plan expectations for {connection.vendor}")
+        for name, filterset_class, scoped, params, expected in plan_checks(self.client_user, self.lawyer):
+            with self.subTest(name):
+                filterset = filterset_class(params, queryset=scoped)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                plan = filterset.qs.explain()
+                self.assertTrue(any(index in plan for index in expected), plan)
+
+
+class SearchTests(TestCase):
+    """Search goes through the full-text index only for the fields it covers, prefix-matching the last term"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.fence = make_case_request(cls.client_user, title='Boundary dispute')
+        cls.lease = make_case_request(cls.client_user, title='Lease renewal', description='Landlord refuses to renew')
+        lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+        cls.case = approve_case_requests(CaseRequest.objects.filter(pk=make_case_request(
+            cls.client_user, title='Unpaid invoice', description='The neighbour never paid').pk), lawyer)[0]
+
+    def ids(self, path):
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        response = api.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_queries(self):
+        self.assertEqual(fts5_query(['boundary', "neighbour's fen"]), '"boundary" "neighbour s fen"*')
+        self.assertEqual(tsquery(['boundary', "neighbour's fen"]), "'boundary' & 'neighbour' <-> 's' <-> 'fen':*")
+        self.assertEqual(tsquery(['--']), '')
+
+    def test_search(self):
+        self.assertEqual(self.ids('/api/v1/case-requests/?search=fen'), {self.fence.pk})
+        self.assertEqual(self.ids('/api/v1/case-requests/?search=landlord%20ren'), {self.lease.pk})
+        # Cases search their descriptions too, and find themselves by case number
+        self.assertEqual(self.ids('/api/v1/cases/?search=neighbour'), {self.case.pk})
+        self.assertEqual(self.ids(f"/api/v1/cases/?search={self.case.case_number}"), {self.case.pk})
+
+    def test_other_fields_fall_back(self):
+        view = mock.Mock(search_fields=['title'])
+        request = Request(APIRequestFactory().get('/', {'search': 'fence'}))
+        with mock.patch('core.search.search_queryset') as search:
+            results = FullTextSearchFilter().filter_queryset(request, CaseRequest.objects.all(), view)
+            self.assertFalse(search.called)
+        # The description mentions the fence, the title does not
+        self.assertEqual(list(results), [])
+
+
+class ArchiveReadTests(TestCase):
+    """Listings reaching the archive read only the segments their page needs, in the listing's order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+        cls.case = approve_case_requests(
+            CaseRequest.objects.filter(pk=make_case_request(cls.client_user).pk), cls.lawyer
+        )[0]
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        archive_settings = override_settings(ARCHIVE_ROOT=root.name, ARCHIVE_AFTER_DAYS=365)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+        self.api = APIClient()
+        self.api.force_authenticate(self.lawyer)
+
+    def age(self, queryset, field, days):
+        """Backdate each row of ``queryset`` by ``days`` and then a day more per row, oldest last"""
+        now = timezone.now()
+        for offset, pk in enumerate(queryset.order_by('pk').values_list('pk', flat=True)):
+            queryset.filter(pk=pk).update(**{field: now - timedelta(days=days + offset)})
+
+    def test_segments_are_complete_gzip_files(self):
+        reject_case_requests(CaseRequest.objects.filter(pk=make_case_request(self.client_user).pk), self.lawyer)
+        self.age(CaseRequest.objects.filter(status='rejected'), 'rejected_at', 400)
+        self.assertEqual(archive_dataset('rejected-cases'), 1)
+        segment = ArchiveSegment.objects.get()
+        with gzip.open(segment.path, 'rt') as source:
+            self.assertEqual(len(source.readlines()), 1)
+        self.assertEqual(os.listdir(os.path.dirname(segment.path)), [os.path.basename(segment.path)])
+
+    def test_rejected_cases_page_across_hot_and_archived_rows(self):
+        ids = [make_case_request(self.client_user).pk for _ in range(15)]
+        reject_case_requests(CaseRequest.objects.filter(pk__in=ids), self.lawyer)
+        # Ten archived, one day apart each; five hot
+        self.age(CaseRequest.objects.filter(pk__in=ids[5:]), 'rejected_at', 400)
+        self.age(CaseRequest.objects.filter(pk__in=ids[:5]), 'rejected_at', 1)
+        self.assertEqual(archive_dataset('rejected-cases'), 10)
+        self.assertEqual(ArchiveSegment.objects.count(), 10)
+
+        rows = []
+        url = '/api/v1/rejected-cases/?include_archived=true&page_size=4'
+        while url:
+            body = self.api.get(url).json()
+            self.assertNotIn('count', body)
+            rows += body['results']
+            url = body['next']
+        self.assertEqual([row['id'] for row in rows], ids)
+
+        with mock.patch('core.archive.gzip.open', wraps=gzip.open) as opened:
+            body = self.api.get('/api/v1/rejected-cases/?include_archived=true&page=2&page_size=4').json()
+        self.assertEqual([row['id'] for row in body['results']], ids[4:8])
+        # The last hot row, then the three newest archived days and the one past the page's end
+        self.assertEqual(opened.call_count, 4)
+
+    def test_filtered_archive_requests_are_refused(self):
+        for query in ('case_type=Civil', 'search=fence', 'ordering=rejected_at'):
+            with self.subTest(query):
+                response = self.api.get(f"/api/v1/rejected-cases/?include_archived=true&{query}")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.api.get('/api/v1/rejected-cases/?case_type=Civil').status_code, 200)
+
+    def test_notes_since_an_archived_time_come_oldest_first(self):
+        notes = CaseNote.objects.bulk_create(
+            CaseNote(case=self.case, author=self.lawyer, content=f"Note {i}") for i in range(6)
+        )
+        # Notes 0-3 archived, 400-403 days old; 4 and 5 hot
+        self.age(CaseNote.objects.filter(pk__in=[note.pk for note in notes[:4]]), 'created_at', 400)
+        self.age(CaseNote.objects.filter(pk__in=[note.pk for note in notes[4:]]), 'created_at', 1)
+        self.assertEqual(archive_dataset('case-notes'), 4)
+
+        since = (timezone.now() - timedelta(days=402)).isoformat()
+        response = self.api.get(f"/api/v1/cases/{self.case.pk}/notes/", {'since': since})
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = [notes[i].pk for i in (1, 0, 5, 4)]
+        self.assertEqual([row['id'] for row in response.json()['results']], expected)
+
+    def test_read_archive_stops_at_the_rows_consumed(self):
+        ids = [make_case_request(self.client_user).pk for _ in range(3)]
+        reject_case_requests(CaseRequest.objects.filter(pk__in=ids), self.lawyer)
+        self.age(CaseRequest.objects.filter(pk__in=ids), 'rejected_at', 400)
+        archive_dataset('rejected-cases')
+        with mock.patch('core.archive.gzip.open', wraps=gzip.open) as opened:
+            rows = read_archive('rejected-cases', oldest_first=True)
+            self.assertEqual(next(rows)['id'], ids[-1])
+            rows.close()
+        self.assertEqual(opened.call_count, 1)
+
+
+class BatchTests(TestCase):
+    """Batched sub-requests are held to the same limits and query budgets as separate ones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        for _ in range(5):
+            make_case_request(cls.client_user)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def batch(self, *paths):
+        response = self.api.post('/api/v1/batch/', {'requests': [{'path': path} for path in paths]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['responses']
+
+    def test_streamed_routes_are_refused_before_running(self):
+        with mock.patch('core.views.export_response') as export:
+            responses = self.batch('/api/v1/case-requests/export/?export_format=csv', '/api/v1/changes/stream/')
+        self.assertEqual([item['status'] for item in responses], [400, 400])
+        export.assert_not_called()
+
+    def test_my_cases_loads_clients_with_their_requests(self):
+        make_case_request(self.client_user)
+        with self.assertNumQueries(1):
+            self.api.get('/api/v1/case-requests/my_cases/')
+
+
+class StripeClientTests(TestCase):
+    """Provider calls close their connections on every event loop they run on"""
+
+    def setUp(self):
+        self.clients = []
+        self.stripe = StripeClient(api_key='sk_test', api_base='https://stripe.test')
+
+        def handler(request):
+            if request.url.path.endswith('/missing'):
+                return httpx.Response(404, json={'error': {'message': 'No such payment_intent'}})
+            return httpx.Response(200, json={'id': 'pi_1', 'status': 'succeeded'})
+
+        def client():
+            self.clients.append(httpx.AsyncClient(base_url='https://stripe.test', transport=httpx.MockTransport(handler)))
+            return self.clients[-1]
+
+        patcher = mock.patch.object(self.stripe, '_client', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_each_call_closes_its_client(self):
+        # Each asyncio.run is a fresh loop, as each async view is under WSGI
+        for _ in range(2):
+            intent = asyncio.run(self.stripe.retrieve_payment_intent('pi_1'))
+            self.assertEqual(intent['status'], 'succeeded')
+        with self.assertRaisesMessage(PaymentProviderError, 'No such payment_intent'):
+            asyncio.run(self.stripe.retrieve_payment_intent('missing'))
+        self.assertEqual(len(self.clients), 3)
+        self.assertTrue(all(client.is_closed for client in self.clients))
+
+
+class AnalyticsSnapshotTests(TestCase):
+    """Refreshes neither pull columns out from under readers nor interleave"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        make_case_request(cls.client_user)
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        analytics_settings = override_settings(ANALYTICS_ROOT=root.name)
+        analytics_settings.enable()
+        self.addCleanup(analytics_settings.disable)
+
+    def generations(self):
+        dataset = os.path.join(self.root, 'case-requests')
+        return sorted(entry for entry in os.listdir(dataset) if os.path.isdir(os.path.join(dataset, entry)))
+
+    def test_readers_keep_their_generation(self):
+        snapshot_dataset('case-requests')
+        held = load_snapshot('case-requests')
+        make_case_request(self.client_user)
+        snapshot_dataset('case-requests')
+        # The generation a reader may have just found in meta.json is kept...
+        self.assertIn(held.meta['generation'], self.generations())
+        make_case_request(self.client_user)
+        snapshot_dataset('case-requests')
+        self.assertEqual(len(self.generations()), 2)
+        # ...and one loaded earlier still reads after its files are gone
+        self.assertNotIn(held.meta['generation'], self.generations())
+        self.assertEqual(len(held['case_type']), 1)
+        self.assertEqual(load_snapshot('case-requests').rows, 3)
+
+    def test_refreshes_wait_for_the_lock(self):
+        with mock.patch('core.analytics._snapshot_dataset', return_value=(0, 0)) as refresh:
+            # As another process's refresh would hold it
+            with _refresh_lock(os.path.join(self.root, 'case-requests')):
+                refreshing = threading.Thread(target=snapshot_dataset, args=('case-requests',))
+                refreshing.start()
+                refreshing.join(0.2)
+                self.assertTrue(refreshing.is_alive())
+                refresh.assert_not_called()
+            refreshing.join()
+        refresh.assert_called_once()
+
+
+class ReplicaCacheCheckTests(TestCase):
+    """Replicas are refused a cache that each process keeps to itself"""
+    LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    SHARED = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}}
+
+    def test_check(self):
+        for replicas, caches, errors in (([], self.LOCAL, []), (['replica_1'], self.LOCAL, ['core.E001']),
+                                         (['replica_1'], self.SHARED, [])):
+            with self.subTest(replicas=replicas, caches=caches), \
+                    override_settings(DATABASE_REPLICAS=replicas, CACHES=caches):
+                self.assertEqual([error.id for error in check_replica_pin_cache(None)], errors)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Safe-method reads go to a healthy replica unless the user just wrote; writes always go to the primary"""
+    REPLICA = 'test_replica'
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor != 'sqlite':
+            raise unittest.SkipTest('The replica is a copy of the SQLite test database')
+        # A copy of the test database taken before any test writes, so what a request
+        # counts shows where its reads went
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        name = os.path.join(cls.replica_dir.name, 'replica.sqlite3')
+        connection.ensure_connection()
+        with contextlib.closing(sqlite3.connect(name)) as replica:
+            connection.connection.backup(replica)
+        connections.settings[cls.REPLICA] = {**connection.settings_dict, 'NAME': name}
+        # Declared only now that the alias exists, so the runner does not try to create it
+        cls.databases = {'default', cls.REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.settings[cls.REPLICA]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        replicas = override_settings(DATABASE_REPLICAS=[self.REPLICA])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        # Reads inside a transaction stay on the primary, so no TestCase
+        self.client_user = make_user('client', 'client')
+        self.other_client = make_user('other-client', 'client')
+        make_case_request(self.client_user)
+        cache.clear()
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+
+    def request(self, user, method='get', write=False):
+        """What ``user`` counts through the middleware, after filing a request if ``write``"""
+        def view(request):
+            if write:
+                make_case_request(user)
+            return HttpResponse(CaseRequest.objects.count())
+
+        token = AccessToken.for_user(user)
+        request = getattr(RequestFactory(), method)('/', HTTP_AUTHORIZATION=f"Bearer {token}")
+        return int(ReplicaMiddleware(view)(request).content)
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.request(self.client_user), 0)
+        # Unsafe methods read from the primary
+        self.assertEqual(self.request(self.client_user, method='post'), 1)
+        with routed(RequestFactory().get('/'), None):
+            self.assertEqual(CaseRequest.objects.db, self.REPLICA)
+        self.assertEqual(CaseRequest.objects.db, 'default')
+
+    def test_write_pins_user_to_primary(self):
+        # The write lands on the primary, and the request's later reads follow it
+        self.assertEqual(self.request(self.client_user, write=True), 2)
+        self.assertEqual(CaseRequest.objects.using('default').count(), 2)
+        self.assertEqual(CaseRequest.objects.using(self.REPLICA).count(), 0)
+
+        self.assertEqual(self.request(self.client_user), 2)
+        self.assertEqual(self.request(self.other_client), 0)
+        later = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.request(self.client_user), 0)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch.object(lag_monitor, 'measure', return_value=settings.REPLICA_MAX_LAG_SECONDS + 1), \
+                self.assertLogs('core.replicas', 'WARNING'):
+            self.assertEqual(self.request(self.client_user), 1)
+        # Unreachable
+        lag_monitor.reset()
+        with mock.patch.object(lag_monitor, 'measure', return_value=None):
+            self.assertEqual(self.request(self.client_user), 1)
+        lag_monitor.reset()
+        with mock.patch.object(lag_monitor, 'measure', return_value=settings.REPLICA_MAX_LAG_SECONDS):
+            self.assertEqual(self.request(self.client_user), 0)
+
+
+class TokenRevocationTests(TestCase):
+    """A refresh token works once: rotation and logout revoke it, checked through the Bloom filter"""
+    REFRESH = '/api/v1/auth/token/refresh/'
+    BLACKLIST = '/api/v1/auth/token/blacklist/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+
+    def setUp(self):
+        revocations.reset()
+        self.addCleanup(revocations.reset)
+        self.refresh = str(RefreshToken.for_user(self.client_user))
+
+    def post(self, path, refresh):
+        return APIClient().post(path, {'refresh': refresh}, format='json')
+
+    def test_rotated_token_rejected_on_reuse(self):
+        response = self.post(self.REFRESH, self.refresh)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.post(self.REFRESH, self.refresh).status_code, 401)
+        # The token it was rotated into still works
+        self.assertEqual(self.post(self.REFRESH, response.json()['refresh']).status_code, 200)
+
+    def test_blacklist_revokes(self):
+        self.assertEqual(self.post(self.BLACKLIST, self.refresh).status_code, 200)
+        jti = RefreshToken(self.refresh, verify=False)['jti']
+        self.assertTrue(RevokedToken.objects.filter(jti=jti).exists())
+        self.assertEqual(self.post(self.REFRESH, self.refresh).status_code, 401)
+
+    def test_concurrent_rotations(self):
+        # Both requests pass the check, as when another process's filter has not synced yet;
+        # the unique insert lets only one of them rotate the token
+        with mock.patch.object(revocations, 'is_revoked', return_value=False):
+            statuses = sorted(self.post(self.REFRESH, self.refresh).status_code for _ in range(2))
+        self.assertEqual(statuses, [200, 401])
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+    def test_filter_confirms_hits_only(self):
+        revoked = RefreshToken.for_user(self.client_user)
+        revoke(revoked['jti'], timezone.now() + timedelta(days=1))
+        revocations.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(revocations.is_revoked(RefreshToken.for_user(self.client_user)['jti']))
+        with self.assertNumQueries(1):
+            self.assertTrue(revocations.is_revoked(revoked['jti']))
+        self.assertEqual(revocations.checks, {'clear': 1, 'revoked': 1})
+
+
+@override_settings(LOAD_SHEDDING_BACKOFF=0.5)
+class LoadSheddingTests(TestCase):
+    """Each route class admits requests up to its adaptive limit and sheds the rest with 503"""
+
+    def setUp(self):
+        limiters.reset()
+        self.addCleanup(limiters.reset)
+
+    def limiter(self, **options):
+        options = {'max_limit': 4, 'initial_limit': 2, 'target_latency': 0.5, **options}
+        return AdaptiveLimiter('test', r'^/', **options)
+
+    def test_acquire_and_release(self):
+        limiter = self.limiter()
+        self.assertEqual([limiter.try_acquire() for _ in range(3)], [True, True, False])
+        self.assertEqual((limiter.in_flight, limiter.shed), (2, 1))
+        limiter.release(0.1)
+        self.assertTrue(limiter.try_acquire())
+
+        # Priority classes ignore the adaptive limit up to max_limit
+        priority = self.limiter(initial_limit=1, priority=True)
+        self.assertEqual([priority.try_acquire() for _ in range(5)], [True] * 4 + [False])
+
+    def test_aimd(self):
+        limiter = self.limiter()
+        limiter.try_acquire()
+        limiter.try_acquire()
+        limiter.release(0.1)
+        self.assertEqual(limiter.limit, 2.5)
+        # A fast response while the limit is barely used is no evidence it can grow
+        limiter.release(0.1)
+        self.assertEqual(limiter.limit, 2.5)
+
+        for _ in range(2):
+            limiter.try_acquire()
+        limiter.release(1.0)
+        self.assertEqual(limiter.limit, 1.25)
+        # A burst of slow or failed responses is one signal per target latency
+        limiter.release(0.1, failed=True)
+        self.assertEqual(limiter.limit, 1.25)
+        limiter.try_acquire()
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 1):
+            limiter.release(0.1, failed=True)
+        self.assertEqual(limiter.limit, limiter.min_limit)
+
+    def test_shed_response(self):
+        user = make_user('client', 'client')
+        api = APIClient()
+        api.force_authenticate(user)
+        limiter = limiters.classify(RequestFactory().get('/api/v1/case-requests/'))
+        self.assertEqual(limiter.name, 'list')
+        while limiter.try_acquire():
+            pass
+
+        response = api.get('/api/v1/case-requests/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.LOAD_SHEDDING_RETRY_AFTER))
+        self.assertEqual(response.json(), SHED_RESPONSE)
+        # Other classes are unaffected
+        self.assertEqual(api.get('/api/v1/payments/1/').status_code, 404)
+
+        limiter.release(0.1)
+        self.assertEqual(api.get('/api/v1/case-requests/').status_code, 200)
+
+    def test_streams_hold_their_slot(self):
+        middleware = LoadSheddingMiddleware(lambda request: StreamingHttpResponse(iter(['a', 'b'])))
+        limiter = limiters.classify(RequestFactory().get('/api/v1/cases/export/'))
+
+        response = middleware(RequestFactory().get('/api/v1/cases/export/'))
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(b''.join(response), b'ab')
+        self.assertEqual(limiter.in_flight, 0)
+
+        # A client that disconnects mid-stream
+        response = middleware(RequestFactory().get('/api/v1/cases/export/'))
+        next(iter(response))
+        response.close()
+        self.assertEqual(limiter.in_flight, 0)
+        response.close()
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_async_streams_hold_their_slot(self):
+        async def content():
+            yield 'a'
+            yield 'b'
+
+        async def view(request):
+            return StreamingHttpResponse(content())
+
+        async def stream():
+            response = await LoadSheddingMiddleware(view)(RequestFactory().get('/api/v1/cases/export/'))
+            in_flight = limiter.in_flight
+            return in_flight, [chunk async for chunk in response]
+
+        limiter = limiters.classify(RequestFactory().get('/api/v1/cases/export/'))
+        self.assertEqual(asyncio.run(stream()), (1, [b'a', b'b']))
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class SingleFlightTests(TestCase):
+    """Identical concurrent GETs run the view once and share its response, never across users"""
+
+    def setUp(self):
+        flights.reset()
+        self.addCleanup(flights.reset)
+        self.calls = []
+        self.proceed = threading.Event()
+
+        @single_flight(name='test')
+        def view(request):
+            self.calls.append(request.user.pk)
+            self.proceed.wait(5)
+            return HttpResponse(f"user {request.user.pk}")
+
+        self.view = view
+
+    def get(self, user_id):
+        request = RequestFactory().get('/api/v1/cases/?page=1')
+        request.user = User(pk=user_id)
+        return self.view(request)
+
+    def concurrently(self, user_ids):
+        """Responses to ``user_ids``' requests made at once, the view held until every request has joined"""
+        responses = [None] * len(user_ids)
+
+        def run(index, user_id):
+            responses[index] = self.get(user_id)
+
+        with mock.patch.object(flights, 'join', wraps=flights.join) as join:
+            threads = [threading.Thread(target=run, args=item) for item in enumerate(user_ids)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while join.call_count < len(user_ids) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.proceed.set()
+            for thread in threads:
+                thread.join()
+        return [response.content.decode() for response in responses]
+
+    def test_identical_requests_coalesce(self):
+        self.assertEqual(self.concurrently([1] * 4), ['user 1'] * 4)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(flights.outcomes, {('test', 'leader'): 1, ('test', 'coalesced'): 3})
+
+    def test_users_do_not_share(self):
+        self.assertEqual(self.concurrently([1, 2, 1, 2]), ['user 1', 'user 2', 'user 1', 'user 2'])
+        self.assertEqual(sorted(self.calls), [1, 2])
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'flights': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'flights'}},
+        SINGLE_FLIGHT_CACHE='flights', SINGLE_FLIGHT_TIMEOUT=0.5, SINGLE_FLIGHT_POLL_INTERVAL=0.01,
+    )
+    def test_across_processes(self):
+        self.proceed.set()
+        request = RequestFactory().get('/api/v1/cases/?page=1')
+        request.user = User(pk=1)
+        key = request_key(request)
+        flights_cache = caches['flights']
+
+        # Another process leads and publishes its response while this one polls
+        claimed, token = _claim(flights_cache, key)
+        self.assertTrue(claimed)
+        publisher = threading.Timer(0.05, _publish, (flights_cache, key, token, _snapshot(HttpResponse('remote'))))
+        publisher.start()
+        self.assertEqual(self.get(1).content, b'remote')
+        publisher.join()
+        self.assertEqual(self.calls, [])
+
+        # Another process holds the lock past the timeout: compute it here
+        _claim(flights_cache, key)
+        self.assertEqual(self.get(1).content, b'user 1')
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(flights.outcomes, {('test', 'remote'): 1, ('test', 'leader'): 1})
+
+
+class EventStreamTests(TestCase):
+    """Streams replay what a reconnecting client missed, then deliver live events until they fall behind"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        other = make_user('other-client', 'client')
+
+        def event(user, kind='note.created'):
+            return ChangeEvent.objects.create(user=user, kind=kind, object_type=kind.split('.')[0], object_id=1)
+
+        cls.events = [event(cls.client_user) for _ in range(3)]
+        event(cls.client_user, 'case_request.updated')
+        event(other)
+
+    def setUp(self):
+        self.hub = InProcessHub()
+
+    def stream(self, last_event_id=None, **options):
+        return event_stream(self.client_user.pk, last_event_id, hub=self.hub, max_seconds=5, **options)
+
+    def frames(self, *events):
+        return [format_event(event_payload(event)) for event in events]
+
+    async def take(self, stream, count):
+        return [await anext(stream) for _ in range(count)]
+
+    async def test_replay_then_live(self):
+        stream = self.stream(last_event_id=self.events[0].seq)
+        self.assertEqual(await anext(stream), f"retry: {settings.SSE_RETRY_MS}\n\n")
+        self.assertEqual(self.hub.connection_count(), 1)
+        # Only the user's streamed events after the given id
+        self.assertEqual(await self.take(stream, 2), self.frames(*self.events[1:]))
+
+        # Published again live, as when it committed while replaying, it is not repeated
+        seq = self.events[-1].seq
+        unstreamed = ChangeEvent(seq=seq + 1, user=self.client_user, kind='case_request.updated',
+                                 object_type='case_request', object_id=1)
+        live = ChangeEvent(seq=seq + 2, user=self.client_user, kind='payment.completed', object_type='payment',
+                           object_id=1)
+        with mock.patch('core.events.get_hub', return_value=self.hub):
+            publish_events([self.events[-1], unstreamed, live])
+        self.assertEqual(await anext(stream), self.frames(live)[0])
+
+        await stream.aclose()
+        self.assertEqual(self.hub.connection_count(), 0)
+
+    async def test_heartbeat(self):
+        stream = self.stream(heartbeat=0.01)
+        await anext(stream)
+        self.assertEqual(await anext(stream), ': heartbeat\n\n')
+        await stream.aclose()
+
+    @override_settings(SSE_BUFFER_SIZE=2)
+    async def test_overflow_closes_stream(self):
+        stream = self.stream()
+        await anext(stream)
+        for event in self.events:
+            self.hub.publish(self.client_user.pk, event_payload(event))
+
+        # The stream ends once its buffer overflows, rather than holding a backlog
+        self.assertEqual([frame async for frame in stream], self.frames(self.events[0]))
+        self.assertEqual(self.hub.connection_count(), 0)
+
+        # The client reconnects from the last event it received
+        stream = self.stream(last_event_id=self.events[0].seq)
+        self.assertEqual((await self.take(stream, 3))[1:], self.frames(*self.events[1:]))
+        await stream.aclose()
+
+
+class ChangeFeedTests(TestCase):
+    """The change feed returns the caller's events after a cursor, compacted and purged with age"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.other_client = make_user('other-client', 'client')
+        cls.case_request = make_case_request(cls.client_user)
+        cls.other_request = make_case_request(cls.other_client)
+
+    def feed(self, after):
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        response = api.get(f"/api/v1/changes/?after={after}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def age(self, events, **delta):
+        ChangeEvent.objects.filter(seq__in=[event.seq for event in events]).update(
+            created_at=timezone.now() - timedelta(**delta))
+
+    def test_events_after_cursor(self):
+        cursor = self.feed(0)['last_seq']
+        for case_request in (self.case_request, self.other_request):
+            case_request.title = 'Fence moved again'
+            case_request.save(update_fields=['title', 'updated_at'])
+
+        feed = self.feed(cursor)
+        self.assertEqual([(event['kind'], event['object_id'], event['data']) for event in feed['events']],
+                         [('case_request.updated', self.case_request.pk,
+                           {'title': 'Fence moved again', 'registration_fee_paid': False})])
+        self.assertEqual(feed['last_seq'], feed['events'][0]['seq'])
+        self.assertFalse(feed['resync_required'])
+        self.assertEqual(self.feed(feed['last_seq'])['events'], [])
+
+    def test_compaction_keeps_latest_event(self):
+        user_ids = [self.client_user.pk]
+        old = [record_change('case_request.updated', 1001, user_ids, {'title': 'First', 'status': 'pending'}),
+               record_change('case_request.updated', 1001, user_ids, {'title': 'Second'})]
+        deleted = [record_change('note.created', 1002, user_ids, {'content': 'Hello'}),
+                   record_change('note.deleted', 1002, user_ids, {'case': 1})]
+        recent = record_change('case_request.updated', 1001, user_ids, {'title': 'Third'})
+        self.age([event for events in old + deleted for event in events],
+                 hours=settings.CHANGE_EVENT_COMPACT_AFTER_HOURS + 1)
+
+        self.assertEqual(compact_events(), 2)
+        events = list(ChangeEvent.objects.filter(object_id__in=[1001, 1002], user=self.client_user))
+        self.assertEqual([(event.seq, event.data) for event in events], [
+            (old[-1][0].seq, {'title': 'Second', 'status': 'pending'}),
+            (deleted[-1][0].seq, {'case': 1}),
+            (recent[0].seq, {'title': 'Third'}),
+        ])
+
+    def test_purged_cursor_needs_resync(self):
+        cursor = self.feed(0)['last_seq']
+        stale = record_change('case_request.updated', self.case_request.pk, [self.client_user.pk], {'title': 'Old'})
+        record_change('case_request.updated', self.case_request.pk, [self.client_user.pk], {'title': 'New'})
+        expired = list(ChangeEvent.objects.filter(seq__lte=stale[0].seq))
+        self.age(expired, days=settings.CHANGE_EVENT_RETENTION_DAYS + 1)
+
+        self.assertEqual(purge_events(), len(expired))
+        self.assertEqual(ChangeEvent.objects.order_by('seq').first().seq, stale[0].seq + 1)
+        # A client that saw the purged events can carry on; one that had not must reload
+        self.assertFalse(self.feed(stale[0].seq)['resync_required'])
+        feed = self.feed(cursor)
+        self.assertTrue(feed['resync_required'])
+        self.assertEqual([event['data'] for event in feed['events']], [{'title': 'New'}])
+        self.assertFalse(self.feed(0)['resync_required'])
+
+
+class RoutingTests(TestCase):
+    """Requests go to the least-loaded lawyer of the requested specialization, and loads follow decisions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = make_user('client', 'client')
+        cls.busy = make_user('busy', 'lawyer', specialization='civil', open_case_load=2)
+        cls.free = make_user('free', 'lawyer', specialization='civil')
+        cls.tax = make_user('tax', 'lawyer', specialization='tax')
+
+    def loads(self):
+        return dict(UserProfile.objects.filter(role='lawyer').values_list('user__username', 'open_case_load'))
+
+    def assignees(self, case_requests):
+        names = dict(User.objects.values_list('pk', 'username'))
+        return [names.get(case_request.assigned_lawyer_id) for case_request in
+                CaseRequest.objects.filter(pk__in=[case_request.pk for case_request in case_requests]).order_by('pk')]
+
+    def test_least_loaded_specialist(self):
+        case_requests = [make_case_request(self.client_user) for _ in range(3)]
+        self.assertEqual(route_case_requests(case_requests), 3)
+        self.assertEqual(self.assignees(case_requests), ['free', 'free', 'busy'])
+        # Nobody practises maritime law: the least-loaded lawyer overall takes it
+        case_requests.append(make_case_request(self.client_user, requested_lawyer_type='Maritime'))
+        self.assertEqual(route_case_requests(case_requests), 1)
+        self.assertEqual(self.assignees(case_requests)[-1], 'tax')
+        self.assertEqual(self.loads(), {'busy': 3, 'free': 2, 'tax': 1})
+
+    def test_filed_requests_are_routed(self):
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        response = api.post('/api/v1/case-requests/', {
+            'title': 'Unpaid invoice', 'description': 'The neighbour never paid', 'case_type': 'Tax',
+            'amount_involved': '1000.00', 'requested_lawyer_type': 'Tax',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(CaseRequest.objects.get(pk=response.json()['id']).assigned_lawyer, self.tax)
+        self.assertEqual(self.loads()['tax'], 1)
+
+    def test_loads_follow_decisions(self):
+        case_requests = [make_case_request(self.client_user) for _ in range(3)]
+        route_case_requests(case_requests)
+        self.assertEqual(self.loads(), {'busy': 3, 'free': 2, 'tax': 0})
+
+        # Approved cases stay on the approving lawyer's load; rejected ones leave the assignee's
+        approve_case_requests(CaseRequest.objects.filter(pk=case_requests[0].pk), self.tax)
+        self.assertEqual(self.loads(), {'busy': 3, 'free': 1, 'tax': 1})
+        approve_case_requests(CaseRequest.objects.filter(pk=case_requests[2].pk), self.busy)
+        self.assertEqual(self.loads(), {'busy': 3, 'free': 1, 'tax': 1})
+        reject_case_requests(CaseRequest.objects.filter(pk=case_requests[1].pk), self.free)
+        self.assertEqual(self.loads(), {'busy': 3, 'free': 0, 'tax': 1})
+
+    def test_sweeper_routes_unassigned(self):
+        UserProfile.objects.filter(role='lawyer').update(role='client')
+        case_requests = [make_case_request(self.client_user) for _ in range(3)]
+        self.assertEqual(route_case_requests(case_requests), 0)
+
+        UserProfile.objects.filter(user=self.free).update(role='lawyer')
+        self.assertEqual(route_unassigned(batch_size=2), 3)
+        self.assertEqual(self.assignees(case_requests), ['free'] * 3)
+        self.assertEqual(route_unassigned(), 0)
+
+    def test_migration_routes_existing_requests(self):
+        approve_case_requests(CaseRequest.objects.filter(pk=make_case_request(self.client_user).pk), self.busy)
+        make_case_request(self.client_user, assigned_lawyer=self.busy)
+        case_requests = [make_case_request(self.client_user, requested_lawyer_type=lawyer_type)
+                         for lawyer_type in ('Civil', 'Civil', 'Maritime', 'Tax')]
+        # Loads as they were before routing existed
+        UserProfile.objects.update(open_case_load=0)
+
+        migration = importlib.import_module('core.migrations.0013_route_existing_requests')
+        migration.route_existing_requests(django_apps, None)
+        self.assertEqual(self.assignees(case_requests), ['free', 'free', 'tax', 'tax'])
+        self.assertEqual(self.loads(), {'busy': 2, 'free': 2, 'tax': 2})
+
+
+@override_settings(IMPORT_BATCH_SIZE=2)
+class ImportTests(TestCase):
+    """Imports file the valid rows in batches, routed and in the change feed, and report the rest by row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.alice = make_user('alice', 'client')
+        cls.bob = make_user('bob', 'client')
+        cls.lawyer = make_user('lawyer', 'lawyer', specialization='civil')
+
+    def test_mixed_file(self):
+        rows = [
+            ['alice', 'Boundary dispute', '25000.00'],
+            ['bob', 'Unpaid invoice', '1000.00'],
+            ['nobody', 'Lease renewal', '1000.00'],
+            ['alice', 'Lease renewal', 'lots'],
+            ['alice', 'Noise complaint', '500.00'],
+        ]
+        lines = ['client,title,description,case_type,amount_involved,requested_lawyer_type']
+        lines += [f"{client},{title},Imported,Civil,{amount},Civil" for client, title, amount in rows]
+        upload = SimpleUploadedFile('requests.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        api = APIClient()
+        api.force_authenticate(self.staff)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api.post('/api/v1/case-requests/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()
+        self.assertEqual((result['created'], result['failed']), (3, 2))
+        self.assertEqual([(error['row'], list(error['errors'])) for error in result['errors']],
+                         [(3, ['client']), (4, ['amount_involved'])])
+        # Clients are resolved with one query per batch of IMPORT_BATCH_SIZE rows
+        lookups = [query for query in queries if 'FROM "auth_user"' in query['sql'] and '"username" IN' in query['sql']]
+        self.assertEqual(len(lookups), 3)
+
+        imported = CaseRequest.objects.filter(description='Imported').order_by('pk')
+        self.assertEqual([(case_request.client.username, case_request.title) for case_request in imported],
+                         [('alice', 'Boundary dispute'), ('bob', 'Unpaid invoice'), ('alice', 'Noise complaint')])
+        self.assertEqual({case_request.assigned_lawyer for case_request in imported}, {self.lawyer})
+        self.assertEqual(UserProfile.objects.get(user=self.lawyer).open_case_load, 3)
+
+        events = ChangeEvent.objects.filter(object_id__in=[case_request.pk for case_request in imported])
+        self.assertEqual(sorted(events.values_list('user__username', 'kind')), sorted(
+            [('alice', 'case_request.created')] * 2 + [('bob', 'case_request.created')]
+            + [('lawyer', 'case_request.assigned')] * 3
+        ))
@@ -1,32 +1,62 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenObtainPairView, TokenRefreshView
+from core.lazy import lazy_view
 from core.views import (
-    UserRegistrationView, UserProfileView, CaseRequestViewSet,
-    CaseViewSet, RejectedCaseViewSet, CaseNoteViewSet, PaymentViewSet
+    UserRegistrationView, CaseRequestViewSet,
+    CaseViewSet, RejectedCaseViewSet, CaseNoteViewSet, PaymentViewSet, LawyerDirectoryViewSet, ChangeFeedView, change_stream,
+    AnalyticsReportView, BatchView, profile_view, case_list, case_request_list, create_payment_intent, confirm_payment
 )
 
 router = DefaultRouter()
 router.register(r'case-requests', CaseRequestViewSet, basename='case-request')
 router.register(r'cases', CaseViewSet, basename='case')
 router.register(r'rejected-cases', RejectedCaseViewSet, basename='rejected-case')
-router.register(r'case-notes', CaseNoteViewSet, basename='case-note')
 router.register(r'payments', PaymentViewSet, basename='payment')
+router.register(r'lawyers', LawyerDirectoryViewSet, basename='lawyer')
+
+case_note_list = CaseNoteViewSet.as_view({'get': 'list', 'post': 'create'})
+case_note_bulk = CaseNoteViewSet.as_view({'post': 'bulk_create'})
+case_note_detail = CaseNoteViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+})
 
 urlpatterns = [
     # Authentication
     path('auth/register/', UserRegistrationView.as_view(), name='register'),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
 
     # User Profile
-    path('profile/', UserProfileView.as_view(), name='user_profile'),
+    path('profile/', profile_view, name='user_profile'),
+
+    # Async fast paths, ahead of the router routes they serve
+    path('cases/', case_list, name='case-list-async'),
+    path('case-requests/', case_request_list, name='case-request-list-async'),
+    path('payments/<int:pk>/create_payment_intent/', create_payment_intent, name='payment-create-payment-intent'),
+    path('payments/<int:pk>/confirm_payment/', confirm_payment, name='payment-confirm-payment'),
+
+    # Case notes, nested under their case
+    path('cases/<int:case_id>/notes/', case_note_list, name='case-note-list'),
+    path('cases/<int:case_id>/notes/bulk/', case_note_bulk, name='case-note-bulk'),
+    path('cases/<int:case_id>/notes/<int:pk>/', case_note_detail, name='case-note-detail'),
+
+    # Incremental sync
+    path('changes/', ChangeFeedView.as_view(), name='changes'),
+    path('changes/stream/', change_stream, name='change-stream'),
+
+    # Reporting
+    path('reports/analytics/', AnalyticsReportView.as_view(), name='analytics-report'),
+
+    # Several requests in one round trip
+    path('batch/', BatchView.as_view(), name='batch'),
 
     # API Routes
     path('', include(router.urls)),
 
     # API Documentation
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    # The schema generator is only imported when the docs are requested
+    path('schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+    path('docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
 ]
@@ -1,26 +1,51 @@
-from rest_framework import viewsets, status, generics
+from rest_framework import viewsets, status, generics, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-import uuid
-import stripe
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 from core.models import (
-    UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment, User
+    UserProfile, CaseRequest, Case, RejectedCase, CaseNote, Payment, ChangeEvent, User
 )
 from core.serializers import (
     UserSerializer, UserRegistrationSerializer, UserProfileSerializer,
-    CaseRequestSerializer, CaseSerializer, RejectedCaseSerializer, CaseNoteSerializer, PaymentSerializer
+    CaseRequestSerializer, CaseSerializer, RejectedCaseSerializer, CaseNoteSerializer, PaymentSerializer,
+    ChangeEventSerializer, LawyerDirectorySerializer, BatchSerializer
 )
-from core.permissions import IsClient, IsLawyer, IsClientOrReadOnly, IsLawyerOrReadOnly
-from core.tasks import send_case_approved_email, send_case_rejected_email, send_payment_reminder_email
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from core.permissions import IsClient, IsLawyer, IsClientOrReadOnly, IsLawyerOrReadOnly, IsAuthorOrReadOnly
+from core.pagination import ArchivePagination, CaseNoteCursorPagination, LawyerDirectoryPagination
+from core.replicas import read_database
+from core.singleflight import acoalesce, request_key, single_flight
+from core.analytics import report as analytics_report
+from core.archive import ARCHIVES, ArchivedResults, archive_cutoff, parse_timestamp, read_archive
+from core.autocomplete import autocomplete_index
+from core.batch import run_batch
+from core.changes import record_changes, note_delta, resync_required
+from core.events import event_stream
+from core.directory import facet_counts, prefix_range
+from core.filters import CaseRequestFilter, CaseFilter, RejectedCaseFilter, PaymentFilter
+from core.routing import route_case_requests
+from core.search import FullTextSearchFilter
+from core.services import DEFAULT_REGISTRATION_FEE, approve_case_requests, reject_case_requests, complete_payment
+from core.payments import PaymentProviderError, stripe_client
+from core.exports import EXPORT_FORMATS, export_response
+from core.imports import IMPORT_FORMATS, guess_format, read_records, import_case_requests
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -38,7 +63,118 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user.profile
 
 
-class CaseRequestViewSet(viewsets.ModelViewSet):
+class ExportMixin:
+    """Adds a streaming ``export`` action honoring the viewset's scoping and filters"""
+    export_name = None
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export the filtered queryset as CSV or NDJSON"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        # Streamed after the response leaves the replica middleware, so bind the database now
+        queryset = queryset.using(read_database(queryset.model))
+        return export_response(queryset, self.export_name, export_format)
+
+
+class ArchiveReadMixin:
+    """
+    Transparently includes archived rows in list responses
+    - `?<time field>_after=<date|datetime>` older than the hot window reads the archive too
+    - `?include_archived=true` reads the whole archive
+    - `?<time field>_before=<date|datetime>` bounds the window on both sides
+    Archived rows follow the hot rows, newest first, or precede them when the
+    listing runs oldest first. They are stored serialized, so they can be
+    narrowed by time and role scope only: other filters, search and
+    orderings are refused on listings that reach the archive.
+    Subclasses set `archive_dataset` and define `archive_predicate()`, which
+    returns a function accepting the archived rows the user may see.
+    """
+    archive_dataset = None
+    archive_pagination_class = ArchivePagination
+    # Query parameters, besides the time window, that archived listings honour
+    archive_query_params = ('include_archived', 'page', 'page_size')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.archive_dataset not in ARCHIVES:
+            raise ImproperlyConfigured(f"{cls.__name__}.archive_dataset must be one of: {', '.join(ARCHIVES)}")
+        if not callable(getattr(cls, 'archive_predicate', None)):
+            raise ImproperlyConfigured(f"{cls.__name__} must define archive_predicate() to scope its archived rows")
+
+    def get_archive_window(self):
+        """Return (reaches archive, since, until) for the current request"""
+        time_field = ARCHIVES[self.archive_dataset].time_field
+        since, until = (self.get_archive_bound(f'{time_field}_{side}') for side in ('after', 'before'))
+        if self.request.query_params.get('include_archived') == 'true':
+            return True, since, until
+        return since is not None and since < archive_cutoff(), since, until
+
+    def get_archive_bound(self, param):
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        bound = parse_timestamp(value)
+        if bound is None:
+            raise serializers.ValidationError({param: 'Enter a valid date or datetime.'})
+        return bound
+
+    def archive_oldest_first(self):
+        """Whether the listing runs oldest first"""
+        return False
+
+    def check_archive_query(self):
+        time_field = ARCHIVES[self.archive_dataset].time_field
+        allowed = {*self.archive_query_params, f'{time_field}_after', f'{time_field}_before'}
+        refused = sorted(param for param in self.request.query_params if param not in allowed)
+        if refused:
+            raise serializers.ValidationError({
+                param: f"Archived rows can only be narrowed by {time_field}; "
+                       f"drop this or keep {time_field}_after within the last {settings.ARCHIVE_AFTER_DAYS} days."
+                for param in refused
+            })
+
+    def list(self, request, *args, **kwargs):
+        reaches_archive, since, until = self.get_archive_window()
+        if not reaches_archive:
+            return super().list(request, *args, **kwargs)
+        self.check_archive_query()
+
+        time_field = ARCHIVES[self.archive_dataset].time_field
+        oldest_first = self.archive_oldest_first()
+        queryset = self.filter_queryset(self.get_queryset())
+        if since is not None:
+            queryset = queryset.filter(**{f'{time_field}__gte': since})
+        if until is not None:
+            queryset = queryset.filter(**{f'{time_field}__lte': until})
+        queryset = queryset.order_by(*((time_field, 'id') if oldest_first else (f'-{time_field}', '-id')))
+        predicate = self.archive_predicate()
+        results = ArchivedResults(
+            queryset,
+            lambda: read_archive(self.archive_dataset, start=since, end=until,
+                                 predicate=predicate, oldest_first=oldest_first),
+            oldest_first=oldest_first,
+        )
+
+        # Cursor pagination needs a queryset and page numbers need a count, so archived listings page without one
+        if self.paginator is not None and not isinstance(self.paginator, self.archive_pagination_class):
+            self._paginator = self.archive_pagination_class()
+        page = self.paginate_queryset(results)
+        rows = page if page is not None else list(results)
+        hot = [row for row in rows if not isinstance(row, dict)]
+        serialized = iter(self.get_serializer(hot, many=True).data)
+        data = [row if isinstance(row, dict) else next(serialized) for row in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class CaseRequestViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for case requests
     - Clients can create case requests
@@ -46,21 +182,19 @@ class CaseRequestViewSet(viewsets.ModelViewSet):
     """
     serializer_class = CaseRequestSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'case_type']
-    search_fields = ['title', 'description']
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
+    filterset_class = CaseRequestFilter
+    search_fields = ['case_number', 'title', 'description']
     ordering_fields = ['created_at', 'amount_involved']
     ordering = ['-created_at']
+    export_name = 'case-requests'
 
     def get_queryset(self):
-        user = self.request.user
-        if user.profile.role == 'client':
-            # Clients see only their own case requests
-            return CaseRequest.objects.filter(client=user)
-        elif user.profile.role == 'lawyer':
-            # Lawyers see all case requests with pending status
-            return CaseRequest.objects.filter(status='pending')
-        return CaseRequest.objects.none()
+        return CaseRequest.objects.for_user(self.request.user).select_related('client')
+
+    @single_flight()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         if self.request.user.profile.role != 'client':
@@ -68,37 +202,86 @@ class CaseRequestViewSet(viewsets.ModelViewSet):
                 {'error': 'Only clients can file cases'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer.save(client=self.request.user)
+        with transaction.atomic():
+            case_request = serializer.save(client=self.request.user)
+            route_case_requests([case_request])
 
     @action(detail=False, methods=['get'], permission_classes=[IsClient])
     def my_cases(self, request):
         """Get all case requests for current client"""
-        case_requests = CaseRequest.objects.filter(client=request.user)
+        case_requests = CaseRequest.objects.filter(client=request.user).select_related('client')
         serializer = self.get_serializer(case_requests, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_requests(self, request):
+        """
+        Bulk import case requests from an uploaded CSV or NDJSON file
+        - Clients import requests filed for themselves
+        - Staff import on behalf of clients named in a `client` column
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file upload is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.is_staff:
+            client = None
+        elif request.user.profile.role == 'client':
+            client = request.user
+        else:
+            return Response(
+                {'error': 'Only clients and staff can import case requests'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        import_format = request.data.get('import_format') or guess_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {'error': f"import_format must be one of: {', '.join(IMPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = import_case_requests(read_records(upload.file, import_format), client=client)
+        return Response(result)
+
 
-class CaseViewSet(viewsets.ModelViewSet):
+class CaseViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for approved cases
     - Clients can view their approved cases
     - Lawyers can view cases assigned to them
+    - Cases are only opened and closed through approve_case/reject_case
     """
     serializer_class = CaseSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status']
-    search_fields = ['title', 'case_number']
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
+    filterset_class = CaseFilter
+    search_fields = ['case_number', 'title', 'description']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    export_name = 'cases'
 
     def get_queryset(self):
-        user = self.request.user
-        if user.profile.role == 'client':
-            return Case.objects.filter(client=user)
-        elif user.profile.role == 'lawyer':
-            return Case.objects.filter(lawyer=user)
-        return Case.objects.none()
+        return Case.objects.for_user(self.request.user).select_related('client', 'lawyer', 'payment')
+
+    @single_flight()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], filter_backends=[], pagination_class=None)
+    def autocomplete(self, request):
+        """Case number and title suggestions for a search box, `?q=<prefix>&limit=<n>`"""
+        try:
+            limit = int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_LIMIT))
+
+        matches = autocomplete_index.suggest(request.user, request.query_params.get('q', ''), limit)
+        return Response([
+            {'id': case_id, 'case_number': case_number, 'title': title}
+            for case_id, case_number, title in matches
+        ])
 
     @action(detail=True, methods=['post'], permission_classes=[IsLawyer])
     def approve_case(self, request, pk=None):
@@ -111,34 +294,18 @@ class CaseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create a new Case record
-        case_number = f"CASE-{uuid.uuid4().hex[:8].upper()}"
-        registration_fee = request.data.get('registration_fee', 500.00)
-        
-        case = Case.objects.create(
-            client=case_request.client,
-            lawyer=request.user,
-            case_request=case_request,
-            case_number=case_number,
-            title=case_request.title,
-            description=case_request.description,
-            case_type=case_request.case_type,
-            documents=case_request.documents,
-            amount_involved=case_request.amount_involved,
-            registration_fee=registration_fee
+        registration_fee = request.data.get('registration_fee', DEFAULT_REGISTRATION_FEE)
+        cases = approve_case_requests(
+            CaseRequest.objects.filter(pk=case_request.pk), request.user, registration_fee
         )
+        if not cases:
+            # Decided by someone else in the meantime
+            return Response(
+                {'error': 'Only pending case requests can be approved'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Update case request status
-        case_request.status = 'approved'
-        case_request.save()
-
-        # Send approval email asynchronously
-        send_case_approved_email.delay(case.id)
-
-        # Delete case request
-        case_request.delete()
-
-        serializer = CaseSerializer(case)
+        serializer = CaseSerializer(cases[0])
         return Response(
             {'message': 'Case approved successfully', 'case': serializer.data},
             status=status.HTTP_201_CREATED
@@ -156,72 +323,135 @@ class CaseViewSet(viewsets.ModelViewSet):
             )
 
         rejection_reason = request.data.get('rejection_reason', 'No reason provided')
-
-        # Create rejected case record
-        rejected_case = RejectedCase.objects.create(
-            client=case_request.client,
-            case_request=case_request,
-            title=case_request.title,
-            description=case_request.description,
-            case_type=case_request.case_type,
-            rejection_reason=rejection_reason,
-            rejected_by=request.user
+        rejected_cases = reject_case_requests(
+            CaseRequest.objects.filter(pk=case_request.pk), request.user, rejection_reason
         )
+        if not rejected_cases:
+            # Decided by someone else in the meantime
+            return Response(
+                {'error': 'Only pending case requests can be rejected'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Update case request status
-        case_request.status = 'rejected'
-        case_request.save()
-
-        # Send rejection email asynchronously
-        send_case_rejected_email.delay(rejected_case.id)
-
-        # Delete case request
-        case_request.delete()
-
-        serializer = RejectedCaseSerializer(rejected_case)
+        serializer = RejectedCaseSerializer(rejected_cases[0])
         return Response(
             {'message': 'Case rejected successfully', 'rejected_case': serializer.data},
             status=status.HTTP_201_CREATED
         )
 
 
-class RejectedCaseViewSet(viewsets.ReadOnlyModelViewSet):
+class RejectedCaseViewSet(ArchiveReadMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing rejected cases"""
     serializer_class = RejectedCaseSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    search_fields = ['title', 'description']
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
+    filterset_class = RejectedCaseFilter
+    search_fields = ['case_number', 'title', 'description']
     ordering_fields = ['rejected_at']
     ordering = ['-rejected_at']
+    export_name = 'rejected-cases'
+    archive_dataset = 'rejected-cases'
 
     def get_queryset(self):
+        return RejectedCase.objects.for_user(self.request.user).select_related('client', 'rejected_by')
+
+    def archive_predicate(self):
         user = self.request.user
         if user.profile.role == 'client':
-            return RejectedCase.objects.filter(client=user)
+            return lambda row: row['client'] == user.id
         elif user.profile.role == 'lawyer':
-            return RejectedCase.objects.filter(rejected_by=user)
-        return RejectedCase.objects.none()
+            return lambda row: row['rejected_by'] == user.id
+        return lambda row: False
 
 
-class CaseNoteViewSet(viewsets.ModelViewSet):
-    """ViewSet for case notes"""
+class CaseNoteViewSet(ArchiveReadMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for notes nested under a case (/cases/{case_id}/notes/)
+    - Only the case's client and lawyer can read or add notes
+    - `?since=<timestamp|note id>` returns only newer notes, oldest first
+    """
     serializer_class = CaseNoteSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = CaseNoteCursorPagination
+    archive_dataset = 'case-notes'
+
+    def get_case(self):
+        if not hasattr(self, '_case'):
+            user = self.request.user
+            cases = Case.objects.filter(Q(client=user) | Q(lawyer=user))
+            self._case = get_object_or_404(cases, id=self.kwargs.get('case_id'))
+        return self._case
+
+    def get_since(self):
+        """Parse `since` into a timestamp or a note id"""
+        value = self.request.query_params.get('since')
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        since = parse_timestamp(value)
+        if since is None:
+            raise serializers.ValidationError({'since': 'Enter a timestamp or a note id.'})
+        return since
 
     def get_queryset(self):
-        case_id = self.kwargs.get('case_id')
-        return CaseNote.objects.filter(case_id=case_id)
+        queryset = CaseNote.objects.filter(case=self.get_case()).select_related('author')
+        since = self.get_since()
+        if isinstance(since, int):
+            queryset = queryset.filter(id__gt=since)
+        elif since is not None:
+            queryset = queryset.filter(created_at__gt=since)
+        return queryset
+
+    archive_query_params = ArchiveReadMixin.archive_query_params + ('since',)
+
+    def get_archive_window(self):
+        since = self.get_since()
+        if since is not None and not isinstance(since, int):
+            return since < archive_cutoff(), since, None
+        return super().get_archive_window()
+
+    def archive_oldest_first(self):
+        # As CaseNoteCursorPagination orders incremental syncs
+        return bool(self.request.query_params.get('since'))
+
+    def archive_predicate(self):
+        case_id = self.get_case().id
+        since = self.get_since()
+        if isinstance(since, int):
+            return lambda row: row['case'] == case_id and row['id'] > since
+        return lambda row: row['case'] == case_id
 
     def perform_create(self, serializer):
-        case_id = self.kwargs.get('case_id')
-        case = get_object_or_404(Case, id=case_id)
-        serializer.save(author=self.request.user, case=case)
+        serializer.save(author=self.request.user, case=self.get_case())
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request, case_id=None):
+        """Add several notes to the case in one request"""
+        if not isinstance(request.data, list) or len(request.data) > settings.NOTES_BULK_MAX:
+            return Response(
+                {'error': f"Send a list of at most {settings.NOTES_BULK_MAX} notes"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        case = self.get_case()
+        with transaction.atomic():
+            notes = CaseNote.objects.bulk_create([
+                CaseNote(case=case, author=request.user, **data)
+                for data in serializer.validated_data
+            ])
+            record_changes('note.created', [
+                (note.pk, [case.client_id, case.lawyer_id], note_delta(note)) for note in notes
+            ])
+        return Response(self.get_serializer(notes, many=True).data, status=status.HTTP_201_CREATED)
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
     """ViewSet for handling payments"""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    filterset_class = PaymentFilter
 
     def get_queryset(self):
         user = self.request.user
@@ -231,57 +461,312 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Payment.objects.filter(case__lawyer=user)
         return Payment.objects.none()
 
-    @action(detail=True, methods=['post'], permission_classes=[IsClient])
-    def create_payment_intent(self, request, pk=None):
-        """Create a Stripe payment intent"""
-        payment = get_object_or_404(Payment, pk=pk)
 
-        if payment.case.client != request.user:
-            return Response(
-                {'error': 'Unauthorized'},
-                status=status.HTTP_403_FORBIDDEN
-            )
+class LawyerDirectoryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Directory of active lawyers
+    - Filter by `state`, `city`, `specialization` and `zipcode` prefix
+    - `search` matches words in the lawyer's bio
+    - `facets` returns lawyer counts by state and city
+    """
+    serializer_class = LawyerDirectorySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LawyerDirectoryPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_fields = ['state', 'city', 'specialization']
+    search_fields = ['bio']
 
+    def get_queryset(self):
+        queryset = UserProfile.objects.filter(role='lawyer', user__is_active=True).select_related('user')
+        zipcode = self.request.query_params.get('zipcode')
+        if zipcode:
+            lower, upper = prefix_range(zipcode)
+            queryset = queryset.filter(zipcode__gte=lower, zipcode__lt=upper)
+        return queryset
+
+    @single_flight(scope='global')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], filter_backends=[], pagination_class=None)
+    def facets(self, request):
+        """Lawyer counts by state and city"""
+        return Response(facet_counts())
+
+
+class AnalyticsReportView(generics.GenericAPIView):
+    """
+    Finance report over the analytics snapshots (staff only)
+    - `?since=<date|datetime>` / `?until=` bound the case requests' creation time
+    """
+    permission_classes = [IsAdminUser]
+
+    @single_flight(scope='global')
+    def get(self, request):
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_timestamp(value)
+                if bounds[name] is None:
+                    return Response({'error': f"{name} must be a date or datetime"}, status=status.HTTP_400_BAD_REQUEST)
+        results = analytics_report(**bounds)
+        if results is None:
+            return Response({'error': 'No analytics snapshot yet'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(results)
+
+
+class ChangeFeedView(generics.GenericAPIView):
+    """
+    Incremental sync feed of the current user's change events
+    - `?after=<seq>` returns events with a larger sequence number, oldest first
+    - `resync_required` means events after `after` were purged and a full reload is needed
+    """
+    serializer_class = ChangeEventSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
         try:
-            intent = stripe.PaymentIntent.create(
-                amount=int(payment.amount * 100),  # Amount in cents
-                currency='inr',
-                metadata={'payment_id': payment.id, 'case_number': payment.case.case_number}
-            )
-            payment.stripe_payment_intent_id = intent.id
-            payment.save()
-            return Response({
-                'client_secret': intent.client_secret,
-                'payment_intent_id': intent.id
-            })
-        except stripe.error.StripeError as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            after = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.CHANGE_FEED_PAGE_SIZE))
+
+        events = list(ChangeEvent.objects.filter(user=request.user, seq__gt=after).order_by('seq')[:limit + 1])
+        has_more = len(events) > limit
+        events = events[:limit]
+        return Response({
+            'events': self.get_serializer(events, many=True).data,
+            'last_seq': events[-1].seq if events else after,
+            'has_more': has_more,
+            'resync_required': resync_required(after),
+        })
+
+
+class BatchView(generics.GenericAPIView):
+    """
+    Run several API requests in one round trip, authenticated once
+    - `requests`: up to BATCH_MAX_REQUESTS `{"method", "path", "body"}` objects, at most BATCH_MAX_WRITES of them writes
+    - answers `responses`, one `{"status", "headers", "body"}` per request, in order
+    - consecutive reads run concurrently; writes run one at a time, in order, each committed on its own
+    """
+    serializer_class = BatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'responses': run_batch(request, serializer.validated_data['requests'])})
+
+
+async def _authenticate(request, allow_query_token=False):
+    """
+    Resolve the JWT user of a plain async view, with its profile loaded.
+
+    Browsers' EventSource cannot send headers, so streams may also pass the
+    access token as ``?token=``. Sub-requests of a batch arrive with the
+    batch's user already resolved.
+    """
+    user = getattr(request, '_force_auth_user', None)
+    if user is not None:
+        return user
+    authentication = JWTAuthentication()
+    try:
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token is None and allow_query_token:
+            raw_token = request.GET.get('token')
+        if raw_token is None:
+            return None
+        token = authentication.get_validated_token(raw_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return await User.objects.select_related('profile').filter(
+        pk=token[jwt_settings.USER_ID_CLAIM], is_active=True
+    ).afirst()
+
 
-    @action(detail=True, methods=['post'])
-    def confirm_payment(self, request, pk=None):
-        """Confirm payment after Stripe processing"""
-        payment = get_object_or_404(Payment, pk=pk)
+def _json(data, status_code=200):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
 
+
+def async_csrf_exempt(view):
+    """csrf_exempt for async views; Django 4.2's decorator wraps them in a sync function"""
+    view.csrf_exempt = True
+    return view
+
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+PERMISSION_DENIED = {'detail': 'You do not have permission to perform this action.'}
+NOT_FOUND = {'detail': 'Not found.'}
+
+
+async def change_stream(request):
+    """
+    Server-sent events stream of the current user's live case updates
+    - Pushes case_request.approved/rejected, payment.completed and note.created events
+    - Resumes after the `Last-Event-ID` header (or `?last_event_id=`) from the change feed
+    - Requires an ASGI server; under WSGI the stream would be buffered
+    """
+    user = await _authenticate(request, allow_query_token=True)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if last_event_id is not None:
         try:
-            intent = stripe.PaymentIntent.retrieve(payment.stripe_payment_intent_id)
-            
-            if intent.status == 'succeeded':
-                payment.status = 'completed'
-                payment.paid_at = timezone.now()
-                payment.case.registration_fee_paid = True
-                payment.case.save()
-                payment.save()
-                return Response({'message': 'Payment confirmed successfully'})
-            else:
-                return Response(
-                    {'error': 'Payment not completed'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except stripe.error.StripeError as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return _json({'error': 'Last-Event-ID must be an integer'}, status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(event_stream(user.id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Async views
+#
+# Plain Django async views for the I/O-bound endpoints, so that under ASGI a
+# slow payment provider or database round trip waits on the event loop
+# instead of holding a thread. Writes and filtered reads that need the full
+# DRF machinery fall through to the synchronous views.
+
+_profile_view = UserProfileView.as_view()
+_case_list_view = CaseViewSet.as_view({'get': 'list'})
+_case_request_list_view = CaseRequestViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+@async_csrf_exempt
+async def profile_view(request):
+    """Get the current user's profile; updates go through UserProfileView"""
+    if request.method != 'GET':
+        return await sync_to_async(_profile_view)(request)
+    user = await _authenticate(request)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+    profile = getattr(user, 'profile', None)
+    if profile is None:
+        return _json(NOT_FOUND, status.HTTP_404_NOT_FOUND)
+    return _json(UserProfileSerializer(profile, context={'request': request}).data)
+
+
+async def _list_page(request, queryset, serializer_class):
+    """One page of ``queryset`` in PageNumberPagination's response format"""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page = int(request.GET.get('page', 1))
+        if page < 1:
+            raise ValueError
+    except ValueError:
+        return _json({'detail': 'Invalid page.'}, status.HTTP_404_NOT_FOUND)
+
+    count = await queryset.acount()
+    if page > 1 and (page - 1) * page_size >= count:
+        return _json({'detail': 'Invalid page.'}, status.HTTP_404_NOT_FOUND)
+    offset = (page - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    previous_url = None
+    if page > 1:
+        previous_url = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+    return _json({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if offset + page_size < count else None,
+        'previous': previous_url,
+        'results': serializer_class(objects, many=True, context={'request': request}).data,
+    })
+
+
+@async_csrf_exempt
+async def case_list(request):
+    """List the current user's cases; filtered/searched lists go through CaseViewSet"""
+    if request.method != 'GET' or set(request.GET) - {'page'}:
+        return await sync_to_async(_case_list_view)(request)
+    user = await _authenticate(request)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+    queryset = Case.objects.for_user(user).select_related('client', 'lawyer', 'payment').order_by('-created_at', '-id')
+    return await acoalesce('case_list', request_key(request, user=user),
+                           lambda: _list_page(request, queryset, CaseSerializer))
+
+
+@async_csrf_exempt
+async def case_request_list(request):
+    """List case requests; filtered/searched lists go through CaseRequestViewSet"""
+    if request.method != 'GET' or set(request.GET) - {'page'}:
+        return await sync_to_async(_case_request_list_view)(request)
+    user = await _authenticate(request)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+    queryset = CaseRequest.objects.for_user(user).select_related('client').order_by('-created_at', '-id')
+    # Lawyers' inboxes are scoped to them, so requests coalesce per user
+    return await acoalesce('case_request_list', request_key(request, user=user),
+                           lambda: _list_page(request, queryset, CaseRequestSerializer))
+
+
+@async_csrf_exempt
+async def create_payment_intent(request, pk):
+    """Create a Stripe payment intent for the client's payment"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await _authenticate(request)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+    if user.profile.role != 'client':
+        return _json(PERMISSION_DENIED, status.HTTP_403_FORBIDDEN)
+
+    payment = await Payment.objects.select_related('case').filter(pk=pk).afirst()
+    if payment is None:
+        return _json(NOT_FOUND, status.HTTP_404_NOT_FOUND)
+    if payment.case.client_id != user.id:
+        return _json({'error': 'Unauthorized'}, status.HTTP_403_FORBIDDEN)
+
+    try:
+        intent = await stripe_client.create_payment_intent(
+            amount=int(payment.amount * 100),  # Amount in cents
+            currency='inr',
+            metadata={'payment_id': payment.id, 'case_number': payment.case.case_number},
+        )
+    except PaymentProviderError as e:
+        return _json({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    payment.stripe_payment_intent_id = intent['id']
+    await payment.asave(update_fields=['stripe_payment_intent_id', 'updated_at'])
+    return _json({
+        'client_secret': intent['client_secret'],
+        'payment_intent_id': intent['id']
+    })
+
+
+@async_csrf_exempt
+async def confirm_payment(request, pk):
+    """Confirm payment after Stripe processing"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await _authenticate(request)
+    if user is None:
+        return _json(NOT_AUTHENTICATED, status.HTTP_401_UNAUTHORIZED)
+
+    payment = await Payment.objects.select_related('case').filter(
+        Q(case__client=user) | Q(case__lawyer=user), pk=pk
+    ).afirst()
+    if payment is None:
+        return _json(NOT_FOUND, status.HTTP_404_NOT_FOUND)
+    if payment.status == 'completed':
+        return _json({'message': 'Payment confirmed successfully'})
+    if not payment.stripe_payment_intent_id:
+        return _json({'error': 'Payment not completed'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        intent = await stripe_client.retrieve_payment_intent(payment.stripe_payment_intent_id)
+    except PaymentProviderError as e:
+        return _json({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    if intent['status'] != 'succeeded':
+        return _json({'error': 'Payment not completed'}, status.HTTP_400_BAD_REQUEST)
+    await sync_to_async(complete_payment)(payment)
+    return _json({'message': 'Payment confirmed successfully'})
@@ -2,6 +2,9 @@ import os
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lawsuitapp.settings')
+# Workers would otherwise run the system checks, importing the URLconf and every
+# view, on each start; `manage.py check` covers them at deploy time
+os.environ.setdefault('CELERY_SKIP_CHECKS', 'true')
 
 app = Celery('lawsuitapp')
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -26,12 +26,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.PerformanceMiddleware',
+    'core.shedding.LoadSheddingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,17 +59,64 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'lawsuitapp.wsgi.application'
 
+# Database Connection Configuration
+# WSGI and Celery workers keep each thread's connection open for DB_CONN_MAX_AGE
+# seconds (0: close after every request/task), checked before reuse.
+# Under ASGI every request runs its sync code on a new thread, so persistent
+# connections pile up; set DB_POOL to hand out connections from a per-process
+# psycopg_pool pool (core.db.postgresql) instead.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=20, cast=int)
+# Seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+
 DATABASES = {
     'default': {
-        'ENGINE': config('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': config('DB_ENGINE', default='core.db.postgresql'),
         'NAME': config('DB_NAME', default='lawsuit_db'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD', default='password'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            'pool': {'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT},
+        } if DB_POOL else {},
     }
 }
 
+# Read Replica Configuration
+# Comma-separated replicas of the default database: host or host:port
+# (for SQLite, database files). Safe-method requests read from them.
+for index, replica in enumerate(filter(None, config('DB_REPLICAS', default='').split(',')), start=1):
+    if 'sqlite' in DATABASES['default']['ENGINE']:
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica_')]
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write (pinned in the default cache)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=2, cast=float)
+
+# Cache Configuration
+# Shared across processes with CACHE_URL (redis://host:port/db), which DATABASE_REPLICAS
+# requires (core.checks); per process otherwise
+CACHE_URL = config('CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -104,6 +154,113 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Export Configuration
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=1000, cast=int)
+
+# Archive Configuration
+# Rejected cases and case notes older than ARCHIVE_AFTER_DAYS move to gzipped NDJSON segments
+ARCHIVE_ROOT = config('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=365, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=10000, cast=int)
+# How often celery beat archives the rows that have left the hot window
+ARCHIVE_INTERVAL = config('ARCHIVE_INTERVAL', default=86400, cast=int)
+
+# Case Notes Configuration
+NOTES_BULK_MAX = config('NOTES_BULK_MAX', default=100, cast=int)
+
+# Change Feed Configuration
+CHANGE_EVENT_RETENTION_DAYS = config('CHANGE_EVENT_RETENTION_DAYS', default=30, cast=int)
+# Events older than this are merged into one event per object
+CHANGE_EVENT_COMPACT_AFTER_HOURS = config('CHANGE_EVENT_COMPACT_AFTER_HOURS', default=24, cast=int)
+CHANGE_FEED_PAGE_SIZE = config('CHANGE_FEED_PAGE_SIZE', default=500, cast=int)
+# How often celery beat purges and compacts change events
+CHANGE_EVENT_COMPACT_INTERVAL = config('CHANGE_EVENT_COMPACT_INTERVAL', default=3600, cast=int)
+
+# Routing Configuration
+# Least-loaded matching lawyers considered per batch of new case requests
+ROUTING_POOL_SIZE = config('ROUTING_POOL_SIZE', default=50, cast=int)
+ROUTING_BATCH_SIZE = config('ROUTING_BATCH_SIZE', default=1000, cast=int)
+# How often celery beat routes the pending requests no lawyer could take when filed
+ROUTING_SWEEP_INTERVAL = config('ROUTING_SWEEP_INTERVAL', default=300, cast=int)
+
+# Lawyer Directory Configuration
+DIRECTORY_FACETS_CACHE_SECONDS = config('DIRECTORY_FACETS_CACHE_SECONDS', default=300, cast=int)
+
+# Performance Metrics Configuration
+# A statement run this many times in one request is logged as a likely N+1
+METRICS_DUPLICATE_QUERY_THRESHOLD = config('METRICS_DUPLICATE_QUERY_THRESHOLD', default=5, cast=int)
+# Addresses allowed to scrape /metrics
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1').split(',')
+
+# Load Shedding Configuration
+# Per-process concurrency limits by route class (core.shedding); the first class whose
+# pattern matches the path and query string applies, and unmatched requests are not limited.
+# Keep the slow classes' limits below the WSGI worker's thread count so they cannot take every thread
+LOAD_SHEDDING_ENABLED = config('LOAD_SHEDDING_ENABLED', default=True, cast=bool)
+LOAD_SHEDDING_RETRY_AFTER = config('LOAD_SHEDDING_RETRY_AFTER', default=1, cast=int)
+# Share of the limit kept after a response slower than its class's target latency
+LOAD_SHEDDING_BACKOFF = config('LOAD_SHEDDING_BACKOFF', default=0.9, cast=float)
+LOAD_SHEDDING_CLASSES = [
+    # Long-lived streams are bounded by SSE_MAX_STREAM_SECONDS, not a concurrency limit
+    {'name': 'stream', 'pattern': r'^/api/v1/changes/stream/'},
+    # Never shed adaptively, only at max_limit
+    {'name': 'critical', 'pattern': r'^/api/v1/(auth/|payments/\d+/confirm_payment/)',
+     'max_limit': 200, 'target_latency': 1.0, 'priority': True},
+    {'name': 'search', 'pattern': r'^/api/v1/[\w-]+/(autocomplete/)?\?(.*&)?(search|q)=',
+     'max_limit': 16, 'initial_limit': 4, 'target_latency': 0.5},
+    {'name': 'export', 'pattern': r'^/api/v1/[\w-]+/export/',
+     'max_limit': 4, 'initial_limit': 2, 'target_latency': 30.0},
+    {'name': 'list', 'pattern': r'^/api/v1/(case-requests|cases|rejected-cases|payments|lawyers|changes)/(\?|$)',
+     'max_limit': 32, 'initial_limit': 8, 'target_latency': 0.5},
+    {'name': 'default', 'pattern': r'^/api/', 'max_limit': 64, 'initial_limit': 32, 'target_latency': 1.0},
+]
+
+# Single-Flight Configuration
+# Identical concurrent GETs share one computation (core.singleflight); name a shared
+# cache (e.g. Redis) in SINGLE_FLIGHT_CACHE to coalesce across processes too
+SINGLE_FLIGHT_ENABLED = config('SINGLE_FLIGHT_ENABLED', default=True, cast=bool)
+SINGLE_FLIGHT_CACHE = config('SINGLE_FLIGHT_CACHE', default='')
+# Longest a follower waits for the leader before computing the result itself
+SINGLE_FLIGHT_TIMEOUT = config('SINGLE_FLIGHT_TIMEOUT', default=10, cast=float)
+SINGLE_FLIGHT_POLL_INTERVAL = config('SINGLE_FLIGHT_POLL_INTERVAL', default=0.02, cast=float)
+
+# Batch Configuration
+# POST /api/v1/batch/ (core.batch); each pool thread keeps a database connection of its own
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+BATCH_MAX_WRITES = config('BATCH_MAX_WRITES', default=5, cast=int)
+# Threads per process running batched reads concurrently, shared by every batch
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=4, cast=int)
+
+# Analytics Configuration
+# Columnar snapshots for the finance report, refreshed incrementally by updated_at
+ANALYTICS_ROOT = config('ANALYTICS_ROOT', default=str(BASE_DIR / 'analytics'))
+ANALYTICS_CHUNK_SIZE = config('ANALYTICS_CHUNK_SIZE', default=20000, cast=int)
+# Re-read rows updated this long before the last watermark, for late-committing transactions
+ANALYTICS_WATERMARK_OVERLAP = config('ANALYTICS_WATERMARK_OVERLAP', default=300, cast=int)
+# How often celery beat refreshes the snapshots; the report is at most this stale
+ANALYTICS_REFRESH_INTERVAL = config('ANALYTICS_REFRESH_INTERVAL', default=600, cast=int)
+
+# Autocomplete Configuration
+# Per-process prefix indexes: users kept, seconds before a copy is rebuilt, suggestions returned
+AUTOCOMPLETE_MAX_USERS = config('AUTOCOMPLETE_MAX_USERS', default=1000, cast=int)
+AUTOCOMPLETE_INDEX_TTL = config('AUTOCOMPLETE_INDEX_TTL', default=300, cast=int)
+AUTOCOMPLETE_LIMIT = config('AUTOCOMPLETE_LIMIT', default=10, cast=int)
+
+# Live Updates Configuration
+# core.events.InProcessHub for a single process, core.events.RedisHub across workers/nodes
+EVENT_HUB_BACKEND = config('EVENT_HUB_BACKEND', default='core.events.InProcessHub')
+EVENT_HUB_REDIS_URL = config('EVENT_HUB_REDIS_URL', default='redis://localhost:6379/1')
+SSE_HEARTBEAT_SECONDS = config('SSE_HEARTBEAT_SECONDS', default=15, cast=int)
+# Events buffered per open stream before it is closed and must resume with Last-Event-ID
+SSE_BUFFER_SIZE = config('SSE_BUFFER_SIZE', default=100, cast=int)
+SSE_MAX_STREAM_SECONDS = config('SSE_MAX_STREAM_SECONDS', default=3600, cast=int)
+SSE_RETRY_MS = config('SSE_RETRY_MS', default=3000, cast=int)
+
+# Admin Configuration
+# Changelists above this many rows show the planner's estimate instead of COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = config('ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -112,8 +269,23 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
+    'TOKEN_REFRESH_SERIALIZER': 'core.revocation.TokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'core.revocation.TokenBlacklistSerializer',
 }
 
+# Token Revocation Configuration
+# Revoked refresh tokens are kept in core.models.RevokedToken; each process checks a Bloom
+# filter of them first (core.revocation), so only filter hits query the table
+TOKEN_REVOCATION_FILTER = config('TOKEN_REVOCATION_FILTER', default=True, cast=bool)
+TOKEN_REVOCATION_FILTER_CAPACITY = config('TOKEN_REVOCATION_FILTER_CAPACITY', default=100000, cast=int)
+TOKEN_REVOCATION_FILTER_ERROR_RATE = config('TOKEN_REVOCATION_FILTER_ERROR_RATE', default=0.001, cast=float)
+# Longest another process's revocation goes unseen by this process's filter
+TOKEN_REVOCATION_SYNC_INTERVAL = config('TOKEN_REVOCATION_SYNC_INTERVAL', default=5, cast=float)
+# Rebuilt from the unexpired rows this often, dropping expired JTIs
+TOKEN_REVOCATION_REBUILD_INTERVAL = config('TOKEN_REVOCATION_REBUILD_INTERVAL', default=3600, cast=float)
+# How often celery beat deletes revoked tokens that have expired
+TOKEN_REVOCATION_PURGE_INTERVAL = config('TOKEN_REVOCATION_PURGE_INTERVAL', default=3600, cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -122,6 +294,34 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_ALWAYS_EAGER = True
+# Periodic maintenance, run by `celery -A lawsuitapp beat`
+CELERY_BEAT_SCHEDULE = {
+    'route-unassigned-requests': {
+        'task': 'core.tasks.route_unassigned_requests',
+        'schedule': timedelta(seconds=ROUTING_SWEEP_INTERVAL),
+    },
+    'compact-change-events': {
+        'task': 'core.tasks.compact_change_events',
+        'schedule': timedelta(seconds=CHANGE_EVENT_COMPACT_INTERVAL),
+    },
+    'archive-old-rows': {
+        'task': 'core.tasks.archive_old_rows',
+        'schedule': timedelta(seconds=ARCHIVE_INTERVAL),
+    },
+    'refresh-analytics-snapshots': {
+        'task': 'core.tasks.refresh_analytics_snapshots',
+        'schedule': timedelta(seconds=ANALYTICS_REFRESH_INTERVAL),
+    },
+    'purge-revoked-tokens': {
+        'task': 'core.tasks.purge_revoked_tokens',
+        'schedule': timedelta(seconds=TOKEN_REVOCATION_PURGE_INTERVAL),
+    },
+}
+
+# Task Metrics Configuration
+# core.metrics.LocalTaskMetrics per process (eager tasks), core.metrics.RedisTaskMetrics across workers
+TASK_METRICS_BACKEND = config('TASK_METRICS_BACKEND', default='core.metrics.LocalTaskMetrics')
+TASK_METRICS_REDIS_URL = config('TASK_METRICS_REDIS_URL', default='redis://localhost:6379/1')
 
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
@@ -135,6 +335,8 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@lawsuitmanage
 # Stripe Configuration
 STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
+PAYMENT_PROVIDER_TIMEOUT = config('PAYMENT_PROVIDER_TIMEOUT', default=10, cast=float)
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://127.0.0.1:3000').split(',')